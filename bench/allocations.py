@@ -0,0 +1,136 @@
+"""
+Measures the memory blocks each parser allocates per token with tracemalloc, counts its ParseResult objects per
+token, and times the parse.
+
+    python bench/allocations.py [--baseline REVISION] [FILE.jgl ...]
+
+Without files, a generated program is used. Each parse is traced from a snapshot taken before it to one taken
+after it: the blocks still allocated after it are the tree it built, and the peak covers everything alive at
+once during it, like exceptions, results and the nodes of subtrees being built. With --baseline, the same
+measurements are also made on a git revision, like the one before the result-free parser, and printed first
+"""
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import tracemalloc
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import fastlexer
+import parser
+import result
+
+FUNCTION = """
+func f{i}(a: int, xs: [int]) -> int {{
+    var total: int = 0;
+    for (var k: int = 0; k < 10; k = k + 1) {{
+        total = total + xs(k) * (a - k) / 2;
+        if total > 100 && !(a == 3) {{ break; }}
+    }}
+    while a >= 0 {{ a = a - 1; }}
+    foreach (x in [1, 2, 3 + a, -a]) {{ total = total + x; }}
+    if a < 0 {{ return -1; }} elseif a == 0 {{ return 0; }} else {{ return f{i}(a - 1, xs); }}
+}}
+"""
+PARSERS = [getattr(parser, name) for name in ("Parser", "StackParser") if hasattr(parser, name)]
+
+def sample_program(functions: int = 500) -> str:
+    return "".join(FUNCTION.format(i=i) for i in range(functions))
+
+def count_results(parse) -> int:
+    "Calls parse, and returns how many ParseResult objects were created during the call"
+    count = 0
+    init = result.ParseResult.__init__
+    def counting_init(self):
+        nonlocal count
+        count += 1
+        init(self)
+    result.ParseResult.__init__ = counting_init
+    try:
+        parse()
+    finally:
+        result.ParseResult.__init__ = init
+    return count
+
+def traced_blocks(parse) -> tuple[int, int]:
+    """
+    Calls parse under tracemalloc, and returns the number of blocks allocated during the call that are still
+    allocated after it, and the most bytes allocated at once during it
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        kept = parse() # Kept alive until the second snapshot, so the tree is counted
+        peak = tracemalloc.get_traced_memory()[1] - start
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    blocks = sum(stat.count_diff for stat in after.filter_traces(ignored).compare_to(before.filter_traces(ignored), "filename"))
+    del kept
+    return (blocks, peak)
+
+def best_time(parse, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def measure_revision(revision: str, paths: list[str]):
+    "Runs this script on the tree of a git revision, which prints its rows labelled with the revision"
+    archive = subprocess.run(["git", "-C", ROOT, "archive", revision], capture_output=True, check=True).stdout
+    with tempfile.TemporaryDirectory() as tree:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(tree, filter="data")
+        os.makedirs(os.path.join(tree, "bench"), exist_ok=True)
+        script = os.path.join(tree, "bench", "allocations.py")
+        shutil.copy(os.path.abspath(__file__), script) # Older revisions may not have this script, or not this version
+        paths = [os.path.abspath(path) for path in paths]
+        subprocess.run([sys.executable, script, "--label", revision, *paths], check=True)
+
+def main(args: list[str]):
+    label = "current"
+    baseline = None
+    while args and args[0] in ("--baseline", "--label"):
+        if len(args) < 2:
+            sys.exit(f"Expected a revision after {args[0]}")
+        if args[0] == "--baseline":
+            baseline = args[1]
+        else:
+            label = args[1]
+        args = args[2:]
+    if label == "current":
+        print(
+            f"{'revision':12} {'file':24} {'parser':12} {'tokens':>8} {'results/token':>14} {'kept blocks/token':>18} "
+            f"{'peak bytes/token':>17} {'us/token':>9}"
+        )
+    if baseline is not None:
+        measure_revision(baseline, args)
+    sources = [(path, open(path).read()) for path in args] or [("<generated>", sample_program())]
+    for name, text in sources:
+        tokens, error = fastlexer.FastLexer(text).lex_text()
+        if error:
+            print(f"{name}: {error}")
+            continue
+        for parser_class in PARSERS:
+            parse = lambda: parser_class(tokens).parse()
+            results = count_results(parse)
+            blocks, peak = traced_blocks(parse)
+            seconds = best_time(parse)
+            print(
+                f"{label[-12:]:12} {name[-24:]:24} {parser_class.__name__:12} {len(tokens):8} "
+                f"{results / len(tokens):14.3f} {blocks / len(tokens):18.3f} {peak / len(tokens):17.1f} "
+                f"{seconds / len(tokens) * 1e6:9.2f}"
+            )
+    sys.stdout.flush()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
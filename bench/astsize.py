@@ -0,0 +1,57 @@
+"""
+Measures the memory held by parsed trees, in bytes per thousand lines of source and per node.
+
+    python bench/astsize.py [--size N] [--seed N] [FILE.jgl ...]
+
+Without files, each input class of corpus.py is used. The source is lexed and parsed with tracemalloc running,
+then the tokens are dropped, so what remains is the tree and every object it keeps alive, like names and literals
+"""
+import gc
+import os
+import sys
+import tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastlexer import FastLexer
+from parser import StackParser
+from timings import Timings
+import corpus
+
+def tree_size(text: str) -> tuple[int, int]:
+    "Returns the bytes held by the tree of text, and its number of nodes"
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tokens, _ = FastLexer(text).lex_all()
+        tree, _ = StackParser(tokens).parse_all()
+        del tokens
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    timings = Timings()
+    timings.count_nodes(tree)
+    return (size, timings.nodes or 0)
+
+def main(args: list[str]):
+    size, seed = 100_000, 0
+    paths = []
+    i = 0
+    while i < len(args):
+        if args[i] in ("--size", "--seed") and i + 1 < len(args):
+            if args[i] == "--size":
+                size = int(args[i + 1])
+            else:
+                seed = int(args[i + 1])
+            i += 2
+        else:
+            paths.append(args[i])
+            i += 1
+    sources = [(path, open(path).read()) for path in paths] or [(kind, corpus.generate(kind, size, seed)) for kind in corpus.GENERATORS]
+    print(f"{'input':24} {'lines':>7} {'nodes':>8} {'tree KiB':>10} {'bytes/KLOC':>11} {'bytes/node':>11}")
+    for name, text in sources:
+        lines = text.count("\n") + 1
+        size_, nodes = tree_size(text)
+        print(f"{name[-24:]:24} {lines:7} {nodes:8} {size_ / 1024:10.1f} {size_ * 1000 / lines:11,.0f} {size_ / max(nodes, 1):11.1f}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,196 @@
+"""
+Generates .jgl programs for benchmarks. Each input class stresses one part of the lexer or parser, and the same
+class, size and seed always give the same program.
+
+    python bench/corpus.py CLASS [SIZE] [SEED] > program.jgl
+
+SIZE is the approximate length in characters. CLASS is one of the keys of GENERATORS
+"""
+import random
+import sys
+from typing import Callable
+
+NAMES = ["a", "b", "count", "total", "xs", "ys", "index", "value", "result", "_tmp", "left_1", "right_2"]
+TYPES = ["int", "float", "bool", "char", "str", "[int]", "[float]", "[[int]]", "[str]"]
+BINARY = ["+", "-", "*", "/", "==", "<", ">", "<=", ">=", "&&", "||", "&", "|", "^"]
+
+class Writer:
+    "Collects generated text until it reaches a size"
+    def __init__(self, size: int, seed: int):
+        self.random = random.Random(seed)
+        self.size = size
+        self.parts: list[str] = []
+        self.length = 0
+        self.functions = 0
+    def add(self, text: str):
+        self.parts.append(text)
+        self.length += len(text)
+    def full(self) -> bool:
+        return self.length >= self.size
+    def text(self) -> str:
+        return "".join(self.parts)
+    def function(self, body: str, args: int = 2) -> str:
+        "Wraps statements in a new function"
+        self.functions += 1
+        r = self.random
+        params = ", ".join(f"{r.choice(NAMES)}{i}: {r.choice(TYPES)}" for i in range(args))
+        return f"func f{self.functions}({params}) -> {r.choice(TYPES)} {{\n{body}}}\n\n"
+
+    def literal(self) -> str:
+        r = self.random
+        choice = r.randrange(7)
+        if choice == 0:
+            return str(r.randrange(100000))
+        elif choice == 1:
+            return f"{r.randrange(1000)}.{r.randrange(100)}"
+        elif choice == 2:
+            return r.choice(["true", "false"])
+        elif choice == 3:
+            return f"'{r.choice('abcxyz')}'"
+        elif choice == 4:
+            return '"' + "".join(r.choice("abcdef ghij") for _ in range(r.randrange(1, 12))) + '"'
+        return r.choice(NAMES)
+    def expression(self, depth: int = 0) -> str:
+        "A random expression with calls, unary operators and parentheses"
+        r = self.random
+        operands = [self.operand(depth) for _ in range(r.randint(1, 4))]
+        return " ".join(operand if i == 0 else f"{r.choice(BINARY)} {operand}" for i, operand in enumerate(operands))
+    def operand(self, depth: int) -> str:
+        r = self.random
+        choice = r.randrange(10) if depth < 3 else 9
+        if choice == 0:
+            return f"({self.expression(depth + 1)})"
+        elif choice == 1:
+            return f"{r.choice(NAMES)}({', '.join(self.expression(depth + 1) for _ in range(r.randrange(3)))})"
+        elif choice == 2:
+            return f"{r.choice('-!~')}{self.literal() if r.randrange(2) else f'({self.expression(depth + 1)})'}"
+        elif choice == 3:
+            return f"[{', '.join(self.expression(depth + 1) for _ in range(r.randint(1, 3)))}]"
+        return self.literal()
+    def statement(self, indent: str, depth: int = 0, in_loop: bool = False) -> str:
+        "A random statement, with nested blocks up to a few levels deep"
+        r = self.random
+        choice = r.randrange(12) if depth < 3 else r.randrange(4)
+        inner = indent + "    "
+        if choice == 0:
+            return f"{indent}var {r.choice(NAMES)}: {r.choice(TYPES)} = {self.expression()};\n"
+        elif choice == 1:
+            return f"{indent}{r.choice(NAMES)} = {self.expression()};\n"
+        elif choice == 2:
+            return f"{indent}return {self.expression()};\n"
+        elif choice == 3:
+            if in_loop:
+                return f"{indent}{r.choice(['break', 'continue'])};\n"
+            return f"{indent}{r.choice(NAMES)}({self.expression()});\n"
+        elif choice in (4, 5):
+            out = f"{indent}if {self.expression()} {{\n{self.block(inner, depth, in_loop)}{indent}}}"
+            for _ in range(r.randrange(3)):
+                out += f" elseif {self.expression()} {{\n{self.block(inner, depth, in_loop)}{indent}}}"
+            if r.randrange(2):
+                out += f" else {{\n{self.block(inner, depth, in_loop)}{indent}}}"
+            return out + "\n"
+        elif choice == 6:
+            return f"{indent}while {self.expression()} {{\n{self.block(inner, depth, True)}{indent}}}\n"
+        elif choice == 7:
+            name = r.choice(NAMES)
+            return f"{indent}for (var {name}: int = 0; {name} < {r.randrange(100)}; {name} = {name} + 1) {{\n{self.block(inner, depth, True)}{indent}}}\n"
+        elif choice == 8:
+            # The parser does not count foreach as a loop for break and continue
+            return f"{indent}foreach ({r.choice(NAMES)} in {self.operand(1)}) {{\n{self.block(inner, depth, in_loop)}{indent}}}\n"
+        elif choice == 9:
+            return f"{indent}// {self.words(r.randint(3, 10))}\n"
+        return f"{indent}{self.expression()};\n"
+    def block(self, indent: str, depth: int, in_loop: bool) -> str:
+        return "".join(self.statement(indent, depth + 1, in_loop) for _ in range(self.random.randint(1, 4)))
+    def words(self, count: int) -> str:
+        return " ".join(self.random.choice(NAMES + ["the", "of", "and", "todo", "fix"]) for _ in range(count))
+
+def functions(w: Writer):
+    "Many realistic functions with every kind of statement"
+    while not w.full():
+        w.add(w.function("".join(w.statement("    ") for _ in range(w.random.randint(2, 12))), w.random.randint(0, 4)))
+
+def expressions(w: Writer):
+    "Long chains of binary operators, a few hundred operands per statement"
+    while not w.full():
+        body = ""
+        for _ in range(4):
+            terms = [w.operand(2) for _ in range(w.random.randint(100, 400))]
+            body += "    return " + " ".join(term if i == 0 else f"{w.random.choice(BINARY)} {term}" for i, term in enumerate(terms)) + ";\n"
+        w.add(w.function(body))
+
+def nesting(w: Writer):
+    "Deeply nested blocks, if/elseif chains and parentheses"
+    r = w.random
+    while not w.full():
+        depth = r.randint(50, 200)
+        kind = r.randrange(3)
+        if kind == 0:
+            body = "".join(f"if {r.choice(NAMES)} {{\n" for _ in range(depth)) + "return 1;\n" + "}\n" * depth
+        elif kind == 1:
+            body = "if a { return 0; }" + "".join(f" elseif {r.choice(NAMES)} == {i} {{ return {i}; }}" for i in range(depth)) + " else { return 1; }\n"
+        else:
+            body = "return " + "(" * depth + r.choice(NAMES) + " + 1)" * depth + ";\n"
+        w.add(w.function(body))
+
+def arrays(w: Writer):
+    "Large array literals, flat and nested"
+    r = w.random
+    while not w.full():
+        flat = ", ".join(str(r.randrange(1000)) for _ in range(r.randint(500, 2000)))
+        nested = ", ".join("[" + ", ".join(f"{r.randrange(100)}.{r.randrange(10)}" for _ in range(r.randint(5, 20))) + "]" for _ in range(r.randint(50, 200)))
+        w.add(w.function(f"    var xs: [int] = [{flat}];\n    var ys: [[float]] = [{nested}];\n    return xs;\n"))
+
+PIECES = ["abc", "defgh", " ", "ij", "klmnop ", "\\n", "\\t", '\\"', "\\\\"] # Pieces of string literals, with escapes
+def strings(w: Writer):
+    "Long string literals with escapes"
+    r = w.random
+    while not w.full():
+        body = ""
+        for _ in range(r.randint(2, 8)):
+            text = "".join(r.choice(PIECES) for _ in range(r.randint(50, 1000)))
+            body += f'    var s: str = "{text}";\n'
+        w.add(w.function(body + "    return s;\n"))
+
+def comments(w: Writer):
+    "Code where most of the text is line and block comments"
+    r = w.random
+    while not w.full():
+        body = ""
+        for _ in range(r.randint(5, 20)):
+            if r.randrange(2):
+                body += "    // " + w.words(r.randint(10, 40)) + "\n"
+            else:
+                body += "    /* " + "\n     * ".join(w.words(r.randint(5, 15)) for _ in range(r.randint(2, 12))) + "\n     */\n"
+            body += w.statement("    ", 2)
+        w.add(w.function(body))
+
+def mixed(w: Writer):
+    "A realistic mix: mostly ordinary functions, with some of every other class"
+    others = [expressions, nesting, arrays, strings, comments]
+    while not w.full():
+        size = w.size
+        w.size = w.length + 2000
+        (functions if w.random.randrange(4) else w.random.choice(others))(w)
+        w.size = size
+
+GENERATORS: dict[str, Callable[[Writer], None]] = {
+    "functions": functions,
+    "expressions": expressions,
+    "nesting": nesting,
+    "arrays": arrays,
+    "strings": strings,
+    "comments": comments,
+    "mixed": mixed,
+}
+
+def generate(kind: str, size: int = 100_000, seed: int = 0) -> str:
+    "Returns a program of the given input class of about size characters"
+    writer = Writer(size, seed)
+    GENERATORS[kind](writer)
+    return writer.text()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in GENERATORS:
+        sys.exit("usage: corpus.py [" + "|".join(GENERATORS) + "] [SIZE] [SEED]")
+    sys.stdout.write(generate(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 100_000, int(sys.argv[3]) if len(sys.argv) > 3 else 0))
@@ -0,0 +1,271 @@
+"""
+Compares the closure compiler of evaluator.py and the bytecode VM of vm.py against a straightforward tree walker on
+a few programs, checking that all three print the same output and return the same result.
+
+    python bench/evaluate.py [--repeat N] [FILE.jgl ...]
+
+Without files, the programs in PROGRAMS are used. The tree walker finds the code for each node with a chain of
+isinstance checks every time it runs it, looks variables up by name in a dictionary per block, and raises
+exceptions for break, continue and return
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import nodes as n
+import types_
+import evaluator
+import bytecode
+import vm
+from operators import Operator
+from fastlexer import FastLexer
+from parser import StackParser
+from pos import LineIndex
+
+PROGRAMS = {
+    "calls": """
+func fib(n: int) -> int {
+    if n < 2 { return n; }
+    return fib(n - 1) + fib(n - 2);
+}
+func main() -> int { return fib(22); }
+""",
+    "loops": """
+func main() -> int {
+    var total: int = 0;
+    for (var i: int = 0; i < 300; i = i + 1) {
+        var j: int = 0;
+        while j < 300 {
+            j = j + 1;
+            if (i ^ j) & 7 == 0 { continue; }
+            total = total + i * j / 3;
+        }
+        if total > 1000000000 { break; }
+    }
+    return total;
+}
+""",
+    "counting": """
+func main() -> int {
+    var total: int = 0;
+    for (var i: int = 0; i < 300000; i = i + 1) {
+        if i & 3 == 0 { continue; }
+        total = total + i / 7;
+    }
+    return total;
+}
+""",
+    "arrays": """
+func range(n: int) -> [int] {
+    var xs: [int];
+    for (var i: int = 0; i < n; i = i + 1) { xs = xs + [i]; }
+    return xs;
+}
+func main() -> int {
+    var xs: [int] = range(500);
+    var total: int = 0;
+    for (var k: int = 0; k < 200; k = k + 1) {
+        foreach (x in xs) {
+            if x > k { total = total + xs(x - k); }
+        }
+    }
+    print(len(xs), xs(499));
+    return total;
+}
+""",
+    "strings": """
+func vowels(s: str) -> int {
+    var count: int = 0;
+    foreach (c in s) {
+        if c == 'a' || c == 'e' || c == 'i' || c == 'o' || c == 'u' { count = count + 1; }
+    }
+    return count;
+}
+func main() -> int {
+    var text: str = "";
+    for (var i: int = 0; i < 200; i = i + 1) { text = text + "the quick brown fox\\n"; }
+    var total: int = 0;
+    for (var i: int = 0; i < 40; i = i + 1) { total = total + vowels(text); }
+    print(len(text), text(4));
+    return total;
+}
+""",
+}
+
+class Break(Exception):
+    pass
+class Continue(Exception):
+    pass
+class Return(Exception):
+    def __init__(self, value):
+        self.value = value
+
+class TreeWalker:
+    "Runs a tree by walking it, with the same results as evaluator.Program"
+    def __init__(self, tree: n.BlockNode):
+        self.functions = {node.name: node for node in tree.nodes}
+
+    def run(self, arguments: list[str]):
+        main = self.functions["main"]
+        return self.call(main, [arguments] if main.args else [])
+    def call(self, function: n.FuncDeclNode, arguments: list):
+        scopes = [dict(zip(function.args, arguments))]
+        try:
+            self.execute(function.body, scopes)
+        except Return as result:
+            return result.value
+        return None
+
+    def lookup(self, name: str, scopes: list[dict]) -> dict:
+        for scope in reversed(scopes):
+            if name in scope:
+                return scope
+        raise NameError(name)
+
+    def execute(self, node: n.Node, scopes: list[dict]):
+        if isinstance(node, n.BlockNode):
+            scopes.append({})
+            try:
+                for statement in node.nodes:
+                    self.execute(statement, scopes)
+            finally:
+                scopes.pop()
+        elif isinstance(node, n.VarDeclareNode):
+            if node.value is not None:
+                value = self.evaluate(node.value, scopes)
+            elif isinstance(node.var_type.value, types_.ArrayType):
+                value = []
+            else:
+                value = evaluator.DEFAULTS[node.var_type.value]
+            scopes[-1][node.var_name] = value
+        elif isinstance(node, n.IfNode):
+            for case in [node] + node.alternate_cases:
+                if self.evaluate(case.condition, scopes):
+                    self.execute(case.success, scopes)
+                    return
+            if node.failure is not None:
+                self.execute(node.failure, scopes)
+        elif isinstance(node, n.WhileNode):
+            while self.evaluate(node.cond, scopes):
+                try:
+                    self.execute(node.block, scopes)
+                except Break:
+                    break
+                except Continue:
+                    pass
+        elif isinstance(node, n.ForNode):
+            scopes.append({})
+            try:
+                if node.init is not None:
+                    self.execute(node.init, scopes)
+                while node.cond is None or self.evaluate(node.cond, scopes):
+                    try:
+                        self.execute(node.block, scopes)
+                    except Break:
+                        break
+                    except Continue:
+                        pass
+                    if node.iter is not None:
+                        self.execute(node.iter, scopes)
+            finally:
+                scopes.pop()
+        elif isinstance(node, n.ForEachNode):
+            for value in self.evaluate(node.container, scopes):
+                scopes.append({node.var_name: value})
+                try:
+                    self.execute(node.block, scopes)
+                except Break:
+                    break
+                except Continue:
+                    pass
+                finally:
+                    scopes.pop()
+        elif isinstance(node, n.ReturnNode):
+            raise Return(None if node.value is None else self.evaluate(node.value, scopes))
+        elif isinstance(node, n.BreakNode):
+            raise Break()
+        elif isinstance(node, n.ContinueNode):
+            raise Continue()
+        else:
+            self.evaluate(node, scopes)
+
+    def evaluate(self, node: n.Node, scopes: list[dict]):
+        if isinstance(node, (n.IntNode, n.FloatNode, n.BoolNode, n.CharNode)):
+            return node.value
+        elif isinstance(node, n.StringNode):
+            return evaluator.unescape(node.value)
+        elif isinstance(node, n.VarNode):
+            for scope in reversed(scopes):
+                if node.var_name in scope:
+                    return scope[node.var_name]
+            return self.functions.get(node.var_name) or evaluator.BUILTINS[node.var_name][0]
+        elif isinstance(node, n.VarAssignNode):
+            value = self.evaluate(node.value, scopes)
+            self.lookup(node.var_name, scopes)[node.var_name] = value
+            return value
+        elif isinstance(node, n.BinaryOpNode):
+            if node.operator is Operator.LOGIC_AND:
+                return bool(self.evaluate(node.left, scopes) and self.evaluate(node.right, scopes))
+            elif node.operator is Operator.LOGIC_OR:
+                return bool(self.evaluate(node.left, scopes) or self.evaluate(node.right, scopes))
+            return evaluator.BINARY[node.operator](self.evaluate(node.left, scopes), self.evaluate(node.right, scopes))
+        elif isinstance(node, n.UnaryOpNode):
+            return evaluator.UNARY[node.operator](self.evaluate(node.value, scopes))
+        elif isinstance(node, n.ArrayNode):
+            return [self.evaluate(element, scopes) for element in node.elements]
+        elif isinstance(node, n.CallNode):
+            target = self.evaluate(node.node, scopes)
+            arguments = [self.evaluate(argument, scopes) for argument in node.arguments]
+            if isinstance(target, n.FuncDeclNode):
+                return self.call(target, arguments)
+            elif isinstance(target, (list, str)):
+                return target[arguments[0]]
+            return target(*arguments)
+        raise TypeError(f"Cannot evaluate {type(node).__name__}")
+
+def best_time(run, repeat: int) -> tuple[float, object, str]:
+    "Returns the best time of run, with its result and what it printed"
+    best = float("inf")
+    for _ in range(repeat):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            start = time.perf_counter()
+            result = run()
+            best = min(best, time.perf_counter() - start)
+    return (best, result, out.getvalue())
+
+def main(args: list[str]):
+    repeat = 3
+    if len(args) >= 2 and args[0] == "--repeat":
+        repeat = int(args[1])
+        args = args[2:]
+    sources = [(path, open(path).read()) for path in args] or list(PROGRAMS.items())
+    print(f"{'program':24} {'tree walker ms':>15} {'closures ms':>12} {'speedup':>8} {'bytecode ms':>12} {'speedup':>8}")
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, evaluator.RECURSION_LIMIT))
+    for name, text in sources:
+        tokens, lexer_errors = FastLexer(text).lex_all()
+        tree, parser_errors = StackParser(tokens).parse_all()
+        if lexer_errors or parser_errors:
+            sys.exit(f"{name} has errors: {(lexer_errors or parser_errors)[0].value}")
+        program = evaluator.Program(tree)
+        code, errors = bytecode.compile_tree(tree)
+        if program.errors or errors:
+            sys.exit(f"{name} has errors: {(program.errors or errors)[0].value}")
+        machine = vm.VM(code, LineIndex(text))
+        walker = TreeWalker(tree)
+        walked, walked_result, walked_output = best_time(lambda: walker.run([]), repeat)
+        compiled, compiled_result, compiled_output = best_time(lambda: program.run([]), repeat)
+        ran, ran_result, ran_output = best_time(lambda: machine.run([]), repeat)
+        if not (walked_result, walked_output) == (compiled_result, compiled_output) == (ran_result, ran_output):
+            sys.exit(f"{name}: the tree walker returned {walked_result!r}, the closures {compiled_result!r} and the bytecode {ran_result!r}")
+        print(
+            f"{name[-24:]:24} {walked * 1000:15.1f} {compiled * 1000:12.1f} {walked / compiled:7.2f}x "
+            f"{ran * 1000:12.1f} {walked / ran:7.2f}x"
+        )
+    sys.setrecursionlimit(limit)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
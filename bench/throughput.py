@@ -0,0 +1,174 @@
+"""
+Measures lexer and parser throughput, peak memory and node counts on each input class of corpus.py, and compares
+the results against a saved baseline.
+
+    python bench/throughput.py run [--size N] [--seed N] [--repeat N] [--output BASELINE.json]
+    python bench/throughput.py compare BASELINE.json CURRENT.json [--threshold 0.1]
+
+compare exits with status 1 if the throughput of any lexer or parser on any input class dropped by more than the
+threshold, a fraction of the baseline. Only compare results measured on the same machine
+"""
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lexer import Lexer
+from fastlexer import FastLexer
+from parser import Parser, StackParser
+from timings import Timings
+import corpus
+
+LEXERS = {"lexer": Lexer, "fastlexer": FastLexer}
+PARSERS = {"parser": Parser, "stackparser": StackParser}
+FORMAT = 1 # Changed when the layout of the results changes
+
+def best_time(run, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def peak_memory(run) -> int:
+    "Most bytes allocated at once while run is called"
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def measure(stage: str, name: str, run, text: str, tokens: int, repeat: int) -> dict:
+    "Times run, which lexes or parses text, and returns its result record. A parser too deep for the stack gives no numbers"
+    record = {"stage": stage, "name": name, "chars": len(text), "tokens": tokens}
+    try:
+        seconds = best_time(run, repeat)
+    except RecursionError:
+        return record | {"error": "RecursionError"}
+    return record | {
+        "seconds": seconds,
+        "tokens_per_second": tokens / seconds,
+        "mb_per_second": len(text) / seconds / 1e6,
+        "peak": peak_memory(run),
+    }
+
+def run_input(kind: str, size: int, seed: int, repeat: int) -> list[dict]:
+    text = corpus.generate(kind, size, seed)
+    tokens, errors = FastLexer(text).lex_all()
+    if errors:
+        raise ValueError(f"Generated {kind} program has lexer errors: {errors[0]}")
+    records = []
+    for name, lexer_class in LEXERS.items():
+        records.append(measure("lex", name, lambda: lexer_class(text).lex_all(), text, len(tokens), repeat))
+    for name, parser_class in PARSERS.items():
+        record = measure("parse", name, lambda: parser_class(tokens).parse_all(), text, len(tokens), repeat)
+        if "error" not in record:
+            timings = Timings()
+            timings.count_nodes(parser_class(tokens).parse_all()[0])
+            record["nodes"] = timings.nodes
+        records.append(record)
+    for record in records:
+        record["input"] = kind
+    return records
+
+def run(args: list[str]):
+    options = {"--size": "100000", "--seed": "0", "--repeat": "5", "--output": None}
+    args = parse_options(args, options)
+    if args:
+        raise ValueError(f"Unexpected argument: {args[0]}")
+    size, seed, repeat = int(options["--size"]), int(options["--seed"]), int(options["--repeat"])
+    results = {
+        "format": FORMAT,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "size": size,
+        "seed": seed,
+        "repeat": repeat,
+        "results": [],
+    }
+    print(f"{'input':12} {'stage':6} {'name':12} {'tokens':>8} {'nodes':>8} {'tokens/s':>11} {'MB/s':>7} {'peak KiB':>10}")
+    for kind in corpus.GENERATORS:
+        for record in run_input(kind, size, seed, repeat):
+            results["results"].append(record)
+            if "error" in record:
+                print(f"{kind:12} {record['stage']:6} {record['name']:12} {record['tokens']:8} {record['error']}")
+                continue
+            print(
+                f"{kind:12} {record['stage']:6} {record['name']:12} {record['tokens']:8} {record.get('nodes', ''):>8} "
+                f"{record['tokens_per_second']:11,.0f} {record['mb_per_second']:7.2f} {record['peak'] / 1024:10.1f}"
+            )
+    if options["--output"] is not None:
+        with open(options["--output"], "w") as file:
+            json.dump(results, file, indent=1)
+
+def compare(args: list[str]) -> int:
+    options = {"--threshold": "0.1"}
+    args = parse_options(args, options)
+    if len(args) != 2:
+        raise ValueError("compare needs a baseline and a current result file")
+    threshold = float(options["--threshold"])
+    baseline, current = (load(path) for path in args)
+    if (baseline["size"], baseline["seed"]) != (current["size"], current["seed"]):
+        print("warning: the results were measured on different inputs", file=sys.stderr)
+    before = {(record["input"], record["stage"], record["name"]): record for record in baseline["results"]}
+    regressions = 0
+    print(f"{'input':12} {'stage':6} {'name':12} {'baseline/s':>11} {'current/s':>11} {'change':>8} {'peak':>8}")
+    for record in current["results"]:
+        key = (record["input"], record["stage"], record["name"])
+        old = before.get(key)
+        if old is None or "error" in old or "error" in record:
+            status = "new" if old is None else record.get("error") or old["error"]
+            print(f"{key[0]:12} {key[1]:6} {key[2]:12} {status}")
+            continue
+        change = record["tokens_per_second"] / old["tokens_per_second"] - 1
+        peak = record["peak"] / old["peak"] - 1 if old["peak"] else 0.0
+        regressed = change < -threshold
+        regressions += regressed
+        print(
+            f"{key[0]:12} {key[1]:6} {key[2]:12} {old['tokens_per_second']:11,.0f} {record['tokens_per_second']:11,.0f} "
+            f"{change:+8.1%} {peak:+8.1%}" + ("  REGRESSION" if regressed else "")
+        )
+    if regressions:
+        print(f"{regressions} regression{'s' if regressions != 1 else ''} beyond {threshold:.0%}")
+        return 1
+    return 0
+
+def load(path: str) -> dict:
+    with open(path) as file:
+        results = json.load(file)
+    if results.get("format") != FORMAT:
+        raise ValueError(f"{path} is not a result file of this version")
+    return results
+
+def parse_options(args: list[str], options: dict[str, str | None]) -> list[str]:
+    "Sets the options found in args, which all take a value, and returns the other arguments"
+    rest = []
+    i = 0
+    while i < len(args):
+        if args[i] in options:
+            if i + 1 >= len(args):
+                raise ValueError(f"Missing value for {args[i]}")
+            options[args[i]] = args[i + 1]
+            i += 2
+        else:
+            rest.append(args[i])
+            i += 1
+    return rest
+
+def main(args: list[str]) -> int:
+    if not args or args[0] not in ("run", "compare"):
+        sys.exit(__doc__)
+    try:
+        if args[0] == "run":
+            run(args[1:])
+            return 0
+        return compare(args[1:])
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,626 @@
+import hashlib
+import marshal
+import os
+import tempfile
+from array import array
+from typing import TextIO
+import nodes as n
+import types_
+import evaluator
+import constants as c
+from operators import Operator
+from error import Error
+from pos import LineIndex, Position
+from visitor import dispatch_table, postorder
+
+# Opcodes. Each instruction is its opcode followed by OPERANDS[opcode] ints in the code array. Slots are indexes into
+# the frame of the running function, constants into the constant pool, and targets are code positions to jump to.
+# The VM tests opcodes in this order, so the most frequent come first
+LOAD = 0 # slot: push a variable
+CONST = 1 # constant: push a constant
+BINARY_LOCAL_CONST = 2 # operator, slot, constant: push a variable combined with a constant, like i < 10
+JUMP_UNLESS_LOCAL_CONST = 3 # operator, slot, constant, target: jump unless a variable combined with a constant is true
+JUMP_IF_LOCAL_CONST = 4 # operator, slot, constant, target: jump if a variable combined with a constant is true
+SET_LOCAL_CONST = 5 # operator, slot, constant, slot: store a variable combined with a constant, like i = i + 1
+JUMP_IF_FALSE = 6 # target: pop a value and jump if it is false
+JUMP_IF_TRUE = 7 # target: pop a value and jump if it is true
+STORE = 8 # slot: pop a value into a variable
+BINARY = 9 # operator: pop two values and push them combined
+BINARY_LOCAL_LOCAL = 10 # operator, slot, slot: push two variables combined
+BINARY_CONST = 11 # operator, constant: replace the top value with it combined with a constant
+JUMP = 12 # target
+CALL = 13 # function, count: call a function of the program with the count values on top of the stack
+RETURN = 14 # pop a value and return it
+FOR_ITER = 15 # slot, target: store the next item of the iterator on top into a variable, or pop it and jump if done
+POP = 16
+CALL_VALUE = 17 # count: call the value below count arguments, which indexes arrays and strings
+ASSIGN = 18 # slot: store the top value into a variable, leaving it on the stack
+UNARY = 19 # operator: replace the top value with the operator applied to it
+CALL_BUILTIN = 20 # builtin, count
+ARRAY = 21 # count: pop count values and push them as an array
+FUNCTION = 22 # function: push a function of the program as a value
+BUILTIN = 23 # builtin: push a builtin function as a value
+GET_ITER = 24 # replace the array or string on top with an iterator over it
+RETURN_NONE = 25
+
+NAMES = [
+    "LOAD", "CONST", "BINARY_LOCAL_CONST", "JUMP_UNLESS_LOCAL_CONST", "JUMP_IF_LOCAL_CONST", "SET_LOCAL_CONST",
+    "JUMP_IF_FALSE", "JUMP_IF_TRUE", "STORE", "BINARY", "BINARY_LOCAL_LOCAL", "BINARY_CONST", "JUMP", "CALL", "RETURN",
+    "FOR_ITER", "POP", "CALL_VALUE", "ASSIGN", "UNARY", "CALL_BUILTIN", "ARRAY", "FUNCTION", "BUILTIN", "GET_ITER",
+    "RETURN_NONE",
+]
+OPERANDS = [1, 1, 3, 4, 4, 4, 1, 1, 1, 1, 3, 2, 1, 2, 0, 2, 0, 1, 1, 1, 2, 1, 1, 1, 0, 0]
+JUMPS = {JUMP_IF_FALSE: 0, JUMP_IF_TRUE: 0, JUMP: 0, FOR_ITER: 1, JUMP_UNLESS_LOCAL_CONST: 3, JUMP_IF_LOCAL_CONST: 3} # The operand of each jump that is its target
+BUILTIN_NAMES = list(evaluator.BUILTINS) # Builtins are numbered in this order
+# The function of each operator, by the operator's value, which is how instructions name operators
+OPERATOR_FUNCTIONS: list = [None] * (len(Operator) + 1)
+for operator_, function in (evaluator.BINARY | evaluator.UNARY).items():
+    OPERATOR_FUNCTIONS[operator_.value] = function
+FORMAT = 2 # Changed when the layout of the bytecode or of cache files changes
+MAGIC = b"JGLB" # Unlike columnar.MAGIC and the magics of writers.py, so each kind of file is told apart by its header
+
+class Function:
+    """
+    A compiled function: its code starts at entry, and its frame has size slots, with the arguments first. names
+    holds the name of each slot, for the disassembler
+    """
+    __slots__ = ("name", "arity", "entry", "size", "names")
+    def __init__(self, name: str, arity: int, entry: int = 0, size: int = 0, names: list[str] | None = None):
+        self.name = name
+        self.arity = arity
+        self.entry = entry
+        self.size = size
+        self.names = names if names is not None else []
+    def __repr__(self):
+        return f"<function {self.name}>"
+
+class Program:
+    """
+    A program compiled to bytecode. The code of every function is in one array of opcodes and operands. spans
+    holds (position, start, end) for each instruction that can fail at run time, with the source offsets of the node
+    it came from, so errors can point into the source. starts is the line table: (position, start) for the first
+    instruction of each statement and loop condition, with the source offset it begins at
+    """
+    def __init__(self, code: array, constants: list, functions: list[Function], main: int, spans: array, starts: array):
+        self.code = code
+        self.constants = constants
+        self.functions = functions
+        self.main = main
+        self.spans = spans
+        self.starts = starts
+
+    def span(self, position: int) -> tuple[int, int]:
+        "Returns the source offsets of the instruction at position"
+        spans = self.spans
+        for i in range(0, len(spans), 3):
+            if spans[i] == position:
+                return (spans[i + 1], spans[i + 2])
+        return (0, 0)
+    def error(self, position: int, message: str, lines: LineIndex) -> Error:
+        start, end = self.span(position)
+        return Error(message, lines.position(start), lines.position(end))
+
+    def dump(self) -> bytes:
+        functions = tuple((f.name, f.arity, f.entry, f.size, tuple(f.names)) for f in self.functions)
+        return marshal.dumps((self.code.tobytes(), tuple(self.constants), functions, self.main, self.spans.tobytes(), self.starts.tobytes()))
+    @classmethod
+    def load(cls, data: bytes) -> "Program":
+        code, constants, functions, main, spans, starts = marshal.loads(data)
+        return cls(
+            array("i", code), list(constants),
+            [Function(name, arity, entry, size, list(names)) for name, arity, entry, size, names in functions],
+            main, array("i", spans), array("i", starts),
+        )
+
+class Compiler:
+    """
+    Lowers a tree to bytecode. Expressions leave their value on the VM's stack, and statements leave the stack as it
+    was. Conditions of if and loops compile to jumps rather than values, so && and || cost no more than the jumps
+    they take. Loops test their condition at the bottom, so each iteration takes one jump. break and continue are
+    jumps patched once their loop is compiled. Errors are collected in errors, like evaluator.Compiler does
+    """
+    def __init__(self):
+        self.errors: list[Error] = []
+        self.code = array("i")
+        self.spans = array("i")
+        self.starts = array("i")
+        self.constants: list = []
+        self.constant_index: dict[tuple, int] = {} # Keyed by type and repr, since 1, 1.0 and true are equal in Python
+        self.functions: list[Function] = []
+        self.function_index: dict[str, int] = {}
+        self.function: Function | None = None
+        self.scopes: list[dict[str, int]] = []
+        self.loops: list[tuple[list[int], list[int]]] = [] # The break and continue jumps of each enclosing loop
+        self.folds: dict[n.Node, tuple] = {} # What folded returns, for the nodes of the function being compiled
+
+    def compile(self, tree: n.BlockNode | None) -> Program:
+        declarations = tree.nodes if tree is not None else []
+        bodies = []
+        for node in declarations:
+            if node.name in self.function_index:
+                self.error(node, f"Function {node.name} is already declared")
+                continue
+            self.function_index[node.name] = len(self.functions)
+            self.functions.append(Function(node.name, len(node.args)))
+            bodies.append(node)
+        for function, node in zip(self.functions, bodies):
+            self.function = function
+            function.entry = len(self.code)
+            self.scopes = [{}]
+            self.loops = []
+            self.folds = fold(node.body)
+            for name in node.args:
+                self.declare(name)
+            try:
+                self.statement(node.body)
+            except RecursionError:
+                self.error(node, f"Function {node.name} is nested too deeply to compile")
+            self.emit(RETURN_NONE)
+        self.function = None
+        self.thread_jumps()
+        main = self.function_index.get("main")
+        if main is None:
+            self.errors.append(Error("No main function", Position(0, 0, 0), Position(0, 0, 0)))
+        elif self.functions[main].arity > 1:
+            self.error(bodies[main], "main takes no arguments, or one [str] for the command line arguments")
+        return Program(self.code, self.constants, self.functions, main if main is not None else -1, self.spans, self.starts)
+
+    def error(self, node: n.Node, message: str):
+        self.errors.append(Error(message, node.pos_start, node.pos_end))
+    def emit(self, opcode: int, *operands: int, node: n.Node | None = None) -> int:
+        "Appends an instruction, and returns its position. Passing node records where its errors point"
+        position = len(self.code)
+        if node is not None:
+            self.spans.extend((position, node.start, node.end))
+        self.code.append(opcode)
+        self.code.extend(operands)
+        return position
+    def jump(self, opcode: int, *operands: int, node: n.Node | None = None) -> int:
+        "Appends a jump whose target is patched later, and returns the position of its target"
+        self.emit(opcode, *operands, -1, node=node)
+        return len(self.code) - 1
+    def patch(self, sites: list[int], target: int | None = None):
+        "Points the jumps whose targets are at sites to target, or to the next instruction"
+        target = len(self.code) if target is None else target
+        for site in sites:
+            self.code[site] = target
+    def thread_jumps(self):
+        "Points jumps that land on an unconditional jump to where that one goes, like the jumps of break and if chains"
+        code = self.code
+        position = 0
+        while position < len(code):
+            opcode = code[position]
+            if opcode in JUMPS:
+                site = position + 1 + JUMPS[opcode]
+                target = code[site]
+                for _ in range(8): # Bounded, so jumps to themselves stay as they are
+                    if code[target] != JUMP or code[target + 1] == target:
+                        break
+                    target = code[target + 1]
+                code[site] = target
+            position += 1 + OPERANDS[opcode]
+    def constant(self, value) -> int:
+        key = (type(value), repr(value))
+        index = self.constant_index.get(key)
+        if index is None:
+            index = self.constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def declare(self, name: str) -> int:
+        slot = self.function.size
+        self.function.size += 1
+        self.function.names.append(name)
+        self.scopes[-1][name] = slot
+        return slot
+    def lookup(self, name: str) -> int | None:
+        for scope in reversed(self.scopes):
+            slot = scope.get(name)
+            if slot is not None:
+                return slot
+        return None
+    def slot(self, node: n.Node) -> int | None:
+        return self.lookup(node.var_name) if type(node) is n.VarNode else None
+    def folded(self, node: n.Node) -> tuple | None:
+        "Returns (value,) if node is a literal, or operators applied to literals that do not fail"
+        return self.folds.get(node)
+
+    def expression(self, node: n.Node):
+        EXPRESSIONS[type(node)](self, node)
+    def statement(self, node: n.Node):
+        self.mark(node)
+        STATEMENTS[type(node)](self, node)
+    def mark(self, node: n.Node):
+        "Records in the line table that the next instruction begins node"
+        self.starts.extend((len(self.code), node.start))
+    def condition(self, node: n.Node, jump_if: bool) -> list[int]:
+        "Compiles jumps taken when node is true, or when it is false, and returns their target sites"
+        cls = type(node)
+        if cls is n.BinaryOpNode and (node.operator is Operator.LOGIC_AND or node.operator is Operator.LOGIC_OR):
+            # A chain like a && b && c is taken as one list of operands, so long chains are not compiled recursively
+            operands = [node.right]
+            while type(node.left) is n.BinaryOpNode and node.left.operator is node.operator:
+                node = node.left
+                operands.append(node.right)
+            operands.append(node.left)
+            operands.reverse()
+            sites = []
+            if (node.operator is Operator.LOGIC_AND) != jump_if: # Any operand decides, and all jump to the target
+                for operand in operands:
+                    sites += self.condition(operand, jump_if)
+                return sites
+            skip = []
+            for operand in operands[:-1]:
+                skip += self.condition(operand, not jump_if)
+            sites = self.condition(operands[-1], jump_if)
+            self.patch(skip)
+            return sites
+        elif cls is n.UnaryOpNode and node.operator is Operator.LOGIC_NOT:
+            return self.condition(node.value, not jump_if)
+        literal = self.folded(node)
+        if literal is not None:
+            return [self.jump(JUMP)] if bool(literal[0]) == jump_if else []
+        if cls is n.BinaryOpNode:
+            slot = self.slot(node.left)
+            right = self.folded(node.right)
+            if slot is not None and right is not None: # Like i < 10, which jumps without a value on the stack
+                opcode = JUMP_IF_LOCAL_CONST if jump_if else JUMP_UNLESS_LOCAL_CONST
+                return [self.jump(opcode, node.operator.value, slot, self.constant(right[0]), node=node)]
+        self.expression(node)
+        return [self.jump(JUMP_IF_TRUE if jump_if else JUMP_IF_FALSE)]
+
+    # EXPRESSIONS
+    def expression_Node(self, node: n.Node):
+        self.error(node, "Expected an expression")
+        self.emit(CONST, self.constant(None))
+    def expression_Int(self, node: n.Node):
+        self.emit(CONST, self.constant(self.folded(node)[0]))
+    expression_Float = expression_Bool = expression_Char = expression_String = expression_Int
+    def expression_Array(self, node: n.ArrayNode):
+        for element in node.elements:
+            self.expression(element)
+        self.emit(ARRAY, len(node.elements))
+    def expression_Var(self, node: n.VarNode):
+        slot = self.lookup(node.var_name)
+        if slot is not None:
+            self.emit(LOAD, slot)
+        elif node.var_name in self.function_index:
+            self.emit(FUNCTION, self.function_index[node.var_name])
+        elif node.var_name in evaluator.BUILTINS:
+            self.emit(BUILTIN, BUILTIN_NAMES.index(node.var_name))
+        else:
+            self.error(node, f"Undefined name: {node.var_name}")
+            self.emit(CONST, self.constant(None))
+    def expression_VarAssign(self, node: n.VarAssignNode):
+        self.expression(node.value)
+        self.emit(ASSIGN, self.assigned_slot(node))
+    def assigned_slot(self, node: n.VarAssignNode) -> int:
+        slot = self.lookup(node.var_name)
+        if slot is None:
+            if node.var_name in self.function_index or node.var_name in evaluator.BUILTINS:
+                self.error(node, f"Cannot assign to function {node.var_name}")
+            else:
+                self.error(node, f"Undefined variable: {node.var_name}")
+            return 0
+        return slot
+    def expression_BinaryOp(self, node: n.BinaryOpNode):
+        if node.operator is Operator.LOGIC_AND or node.operator is Operator.LOGIC_OR:
+            false = self.condition(node, False)
+            self.emit(CONST, self.constant(True))
+            end = self.jump(JUMP)
+            self.patch(false)
+            self.emit(CONST, self.constant(False))
+            self.patch([end])
+            return
+        folded = self.folded(node)
+        if folded is not None:
+            self.emit(CONST, self.constant(folded[0]))
+            return
+        # A left-leaning chain like a + b + c + ... is lowered from its innermost operation out rather than
+        # recursively, each operation after the first applying to the value the one before left on the stack
+        chain = [node]
+        while self.chained(chain[-1].left):
+            chain.append(chain[-1].left)
+        self.binary(chain.pop(), False)
+        while chain:
+            self.binary(chain.pop(), True)
+    def chained(self, node: n.Node) -> bool:
+        "Whether node is an operation that is compiled as part of the chain of operations it is the left operand of"
+        return (
+            type(node) is n.BinaryOpNode and node.operator is not Operator.LOGIC_AND
+            and node.operator is not Operator.LOGIC_OR and self.folded(node) is None
+        )
+    def binary(self, node: n.BinaryOpNode, stacked: bool):
+        "Compiles an operation that is not folded. If stacked, its left operand is already on the stack"
+        operator_ = node.operator.value
+        left_slot = None if stacked else self.slot(node.left)
+        right_slot = self.slot(node.right)
+        right_literal = self.folded(node.right)
+        if left_slot is not None and right_slot is not None:
+            self.emit(BINARY_LOCAL_LOCAL, operator_, left_slot, right_slot, node=node)
+        elif left_slot is not None and right_literal is not None:
+            self.emit(BINARY_LOCAL_CONST, operator_, left_slot, self.constant(right_literal[0]), node=node)
+        else:
+            if not stacked:
+                self.expression(node.left)
+            if right_literal is not None:
+                self.emit(BINARY_CONST, operator_, self.constant(right_literal[0]), node=node)
+            else:
+                self.expression(node.right)
+                self.emit(BINARY, operator_, node=node)
+    def expression_UnaryOp(self, node: n.UnaryOpNode):
+        folded = self.folded(node)
+        if folded is not None:
+            self.emit(CONST, self.constant(folded[0]))
+            return
+        self.expression(node.value)
+        self.emit(UNARY, node.operator.value, node=node)
+    def expression_Call(self, node: n.CallNode):
+        callee = node.node
+        count = len(node.arguments)
+        if type(callee) is n.VarNode and self.lookup(callee.var_name) is None:
+            name = callee.var_name
+            if name in self.function_index:
+                index = self.function_index[name]
+                arity = self.functions[index].arity
+                if count != arity:
+                    self.error(node, evaluator.arity_message(name, arity, count))
+                for argument in node.arguments:
+                    self.expression(argument)
+                self.emit(CALL, index, count, node=node)
+                return
+            elif name in evaluator.BUILTINS:
+                arity = evaluator.BUILTINS[name][1]
+                if arity is not None and count != arity:
+                    self.error(node, evaluator.arity_message(name, arity, count))
+                for argument in node.arguments:
+                    self.expression(argument)
+                self.emit(CALL_BUILTIN, BUILTIN_NAMES.index(name), count, node=node)
+                return
+        self.expression(callee)
+        for argument in node.arguments:
+            self.expression(argument)
+        self.emit(CALL_VALUE, count, node=node)
+
+    # STATEMENTS
+    def statement_Node(self, node: n.Node):
+        self.expression(node)
+        self.emit(POP)
+    def statement_VarAssign(self, node: n.VarAssignNode):
+        slot = self.assigned_slot(node)
+        value = node.value
+        if type(value) is n.BinaryOpNode and self.folded(value) is None and value.operator is not Operator.LOGIC_AND and value.operator is not Operator.LOGIC_OR:
+            left_slot = self.slot(value.left)
+            right_literal = self.folded(value.right)
+            if left_slot is not None and right_literal is not None:
+                self.emit(SET_LOCAL_CONST, value.operator.value, left_slot, self.constant(right_literal[0]), slot, node=value)
+                return
+        self.expression(value)
+        self.emit(STORE, slot)
+    def statement_VarDeclare(self, node: n.VarDeclareNode):
+        if node.value is not None:
+            self.expression(node.value)
+        elif isinstance(node.var_type.value, types_.ArrayType):
+            self.emit(ARRAY, 0)
+        else:
+            self.emit(CONST, self.constant(evaluator.DEFAULTS[node.var_type.value]))
+        self.emit(STORE, self.declare(node.var_name))
+    def statement_Block(self, node: n.BlockNode):
+        self.scopes.append({})
+        for statement in node.nodes:
+            self.statement(statement)
+        self.scopes.pop()
+    def statement_Return(self, node: n.ReturnNode):
+        if node.value is None:
+            self.emit(RETURN_NONE)
+        else:
+            self.expression(node.value)
+            self.emit(RETURN)
+    def statement_Break(self, node: n.BreakNode):
+        self.loops[-1][0].append(self.jump(JUMP))
+    def statement_Continue(self, node: n.ContinueNode):
+        self.loops[-1][1].append(self.jump(JUMP))
+
+    def statement_If(self, node: n.IfNode):
+        cases = [(node.condition, node.success)] + [(case.condition, case.success) for case in node.alternate_cases]
+        ends = []
+        for i, (condition, success) in enumerate(cases):
+            if i:
+                self.mark(condition)
+            skip = self.condition(condition, False)
+            self.statement(success)
+            if i + 1 < len(cases) or node.failure is not None:
+                ends.append(self.jump(JUMP))
+            self.patch(skip)
+        if node.failure is not None:
+            self.statement(node.failure)
+        self.patch(ends)
+    def statement_While(self, node: n.WhileNode):
+        test = self.jump(JUMP)
+        body = len(self.code)
+        self.loops.append(([], []))
+        self.statement(node.block)
+        breaks, continues = self.loops.pop()
+        self.patch([test] + continues)
+        self.mark(node.cond)
+        self.patch(self.condition(node.cond, True), body)
+        self.patch(breaks)
+    def statement_For(self, node: n.ForNode):
+        self.scopes.append({})
+        if node.init is not None:
+            self.statement(node.init)
+        test = self.jump(JUMP)
+        body = len(self.code)
+        self.loops.append(([], []))
+        self.statement(node.block)
+        breaks, continues = self.loops.pop()
+        self.patch(continues)
+        if node.iter is not None:
+            self.statement(node.iter)
+        self.patch([test])
+        if node.cond is not None:
+            self.mark(node.cond)
+            self.patch(self.condition(node.cond, True), body)
+        else:
+            self.emit(JUMP, body)
+        self.patch(breaks)
+        self.scopes.pop()
+    def statement_ForEach(self, node: n.ForEachNode):
+        self.expression(node.container)
+        self.emit(GET_ITER, node=node.container)
+        self.scopes.append({})
+        slot = self.declare(node.var_name)
+        start = len(self.code)
+        done = self.jump(FOR_ITER, slot)
+        self.loops.append(([], []))
+        self.statement(node.block)
+        breaks, continues = self.loops.pop()
+        self.emit(JUMP, start)
+        self.patch(continues, start)
+        if breaks: # A break leaves the iterator on the stack
+            self.patch(breaks)
+            self.emit(POP)
+        self.patch([done])
+        self.scopes.pop()
+
+EXPRESSIONS = dispatch_table(Compiler, "expression_")
+STATEMENTS = dispatch_table(Compiler, "statement_")
+
+def fold(tree: n.Node) -> dict[n.Node, tuple]:
+    """
+    Maps each node of tree that is a literal, or operators applied to literals that evaluator.fold folds, to
+    (value,). Each node is visited once, after its operands
+    """
+    folds: dict[n.Node, tuple] = {}
+    for node in postorder(tree):
+        cls = type(node)
+        if cls is n.IntNode or cls is n.FloatNode or cls is n.BoolNode or cls is n.CharNode:
+            folds[node] = (node.value,)
+            continue
+        elif cls is n.StringNode:
+            folds[node] = (evaluator.unescape(node.value),)
+            continue
+        elif cls is n.UnaryOpNode:
+            value = folds.get(node.value)
+            if value is None:
+                continue
+            operands = value
+        elif cls is n.BinaryOpNode and node.operator is not Operator.LOGIC_AND and node.operator is not Operator.LOGIC_OR:
+            left, right = folds.get(node.left), folds.get(node.right)
+            if left is None or right is None:
+                continue
+            operands = left + right
+        else:
+            continue
+        folded = evaluator.fold(OPERATOR_FUNCTIONS[node.operator.value], operands)
+        if folded is not None:
+            folds[node] = folded
+    return folds
+
+def compile_tree(tree: n.BlockNode | None) -> tuple[Program, list[Error]]:
+    compiler = Compiler()
+    with evaluator.recursion_limit():
+        program = compiler.compile(tree)
+    return (program, compiler.errors)
+
+def disassemble(program: Program, out: TextIO, lines: LineIndex | None = None):
+    """
+    Writes each function's instructions with their operands, the names of the slots and constants they use, and
+    >> before jump targets. Given the source's lines, the line of each statement is shown at its first instruction,
+    from the line table, when it differs from the line before
+    """
+    code = program.code
+    targets = set()
+    position = 0
+    while position < len(code):
+        opcode = code[position]
+        if opcode in JUMPS:
+            targets.add(code[position + 1 + JUMPS[opcode]])
+        position += 1 + OPERANDS[opcode]
+    # Where several statements start at one position, like a block and its first statement, the innermost is last
+    starts = {program.starts[i]: program.starts[i + 1] for i in range(0, len(program.starts), 2)}
+    ends = [f.entry for f in program.functions[1:]] + [len(code)]
+    for function, end in zip(program.functions, ends):
+        out.write(f"func {function.name}: {function.arity} argument{'s' if function.arity != 1 else ''}, {function.size} slot{'s' if function.size != 1 else ''}\n")
+        position = function.entry
+        last_line = None
+        while position < end:
+            opcode = code[position]
+            operands = list(code[position + 1:position + 1 + OPERANDS[opcode]])
+            line = "     "
+            if lines is not None and position in starts:
+                number = lines.locate(starts[position])[0] + 1
+                if number != last_line:
+                    line = f"{number:>5}"
+                    last_line = number
+            marker = ">>" if position in targets else "  "
+            out.write(f"{line} {marker} {position:6} {NAMES[opcode]:<23} {' '.join(map(str, operands)):<14} {describe(program, function, opcode, operands)}".rstrip() + "\n")
+            position += 1 + len(operands)
+        out.write("\n")
+
+def describe(program: Program, function: Function, opcode: int, operands: list[int]) -> str:
+    "The meaning of an instruction's operands, in parentheses"
+    names = []
+    if opcode in (LOAD, STORE, ASSIGN):
+        names = [function.names[operands[0]]]
+    elif opcode == CONST:
+        names = [repr(program.constants[operands[0]])]
+    elif opcode in (BINARY, UNARY):
+        names = [Operator(operands[0]).name]
+    elif opcode in (BINARY_LOCAL_CONST, JUMP_UNLESS_LOCAL_CONST, JUMP_IF_LOCAL_CONST):
+        names = [Operator(operands[0]).name, function.names[operands[1]], repr(program.constants[operands[2]])]
+    elif opcode == SET_LOCAL_CONST:
+        names = [function.names[operands[3]], "=", Operator(operands[0]).name, function.names[operands[1]], repr(program.constants[operands[2]])]
+    elif opcode == BINARY_LOCAL_LOCAL:
+        names = [Operator(operands[0]).name, function.names[operands[1]], function.names[operands[2]]]
+    elif opcode == BINARY_CONST:
+        names = [Operator(operands[0]).name, repr(program.constants[operands[1]])]
+    elif opcode in (CALL, FUNCTION):
+        names = [program.functions[operands[0]].name]
+    elif opcode in (CALL_BUILTIN, BUILTIN):
+        names = [BUILTIN_NAMES[operands[0]]]
+    elif opcode == FOR_ITER:
+        names = [function.names[operands[0]]]
+    return f"({' '.join(names)})" if names else ""
+
+def cache_path(path: str) -> str:
+    "Where the bytecode of a source file is cached: next to it, with a c added to its extension"
+    return path + "c"
+def source_key(text: str) -> bytes:
+    digest = hashlib.sha256(f"{c.VERSION_MAJOR}.{c.VERSION_MINOR}.{c.VERSION_PATCH}/{FORMAT}\0".encode())
+    digest.update(text.encode("utf-8", "surrogatepass"))
+    return digest.digest()
+
+def load_cached(path: str, text: str) -> Program | None:
+    "Returns the cached bytecode of the source at path if it was compiled from text by this version, or None"
+    try:
+        with open(cache_path(path), "rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+    header = MAGIC + source_key(text)
+    if not data.startswith(header):
+        return None
+    try:
+        return Program.load(data[len(header):])
+    except (EOFError, ValueError, TypeError):
+        return None
+def store_cached(path: str, text: str, program: Program) -> bool:
+    """
+    Writes the bytecode of the source at path next to it, tagged with a hash of text and the compiler version.
+    The file is written to a temporary name and renamed into place. Returns False if it could not be written
+    """
+    temp = None
+    try:
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(MAGIC + source_key(text) + program.dump())
+        os.replace(temp, cache_path(path))
+    except OSError:
+        if temp is not None:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+        return False
+    return True
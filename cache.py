@@ -0,0 +1,135 @@
+import hashlib
+import os
+import copyreg
+import pickle
+import tempfile
+import time
+from typing import BinaryIO
+import nodes as n
+import constants as c
+from error import Error
+from pos import LineIndex
+
+FORMAT = 3 # Changed when the layout of cached entries changes without a version change
+ParseOutcome = tuple[n.BlockNode | None, list[Error], list[Error]] # (tree, lexer errors, parser errors)
+
+class ParseCache:
+    """
+    On-disk cache of parse outcomes, keyed by a hash of the source text and the compiler version. Entries are
+    written to a temporary file and renamed into place, so concurrent runs never read a partial entry. Entries
+    older than max_age seconds are evicted, then the least recently used ones until the cache fits in max_bytes
+    """
+    suffix = ".parse"
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024, max_age: float = 30 * 24 * 60 * 60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.stored = 0 # Entries written by this instance
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{c.VERSION_MAJOR}.{c.VERSION_MINOR}.{c.VERSION_PATCH}/{FORMAT}\0".encode())
+        digest.update(text.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def load(self, text: str, lines: LineIndex) -> ParseOutcome | None:
+        "Returns the cached outcome of parsing text, with its nodes using lines, or None on a miss"
+        path = self.path(self.key(text))
+        try:
+            with open(path, "rb") as file:
+                outcome = load_with_lines(file, lines)
+        except OSError:
+            return None
+        except Exception: # Any corrupt or foreign entry is a miss, and is removed so the next run replaces it
+            self.remove(path)
+            return None
+        if not is_outcome(outcome):
+            self.remove(path)
+            return None
+        try:
+            os.utime(path) # Marks the entry as recently used
+        except OSError:
+            pass
+        return outcome
+    def store(self, text: str, lines: LineIndex, outcome: ParseOutcome) -> bool:
+        """
+        Caches the outcome of parsing text. The LineIndex is not stored, load attaches a new one instead.
+        Returns False if the outcome could not be written, in which case the cache is left unchanged
+        """
+        temp = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                dump_with_lines(outcome, file, lines)
+            os.replace(temp, self.path(self.key(text)))
+            self.stored += 1
+        except (OSError, RecursionError): # Trees nested too deeply for pickle are not cached
+            if temp is not None:
+                self.remove(temp)
+            return False
+        return True
+
+    def evict(self):
+        "Removes expired entries, then the least recently used ones until the cache fits in max_bytes"
+        now = time.time()
+        entries = []
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if not entry.name.endswith((self.suffix, ".tmp")):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError: # Removed by another run
+                        continue
+                    if now - stat.st_mtime > self.max_age:
+                        self.remove(entry.path)
+                    else:
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+    def remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def is_outcome(outcome) -> bool:
+    "Whether a loaded entry has the shape of a ParseOutcome"
+    if type(outcome) is not tuple or len(outcome) != 3:
+        return False
+    tree, lexer_errors, parser_errors = outcome
+    return (
+        (tree is None or isinstance(tree, n.BlockNode))
+        and all(type(errors) is list and all(isinstance(error, Error) for error in errors) for errors in (lexer_errors, parser_errors))
+    )
+
+def dump_with_lines(obj, file: BinaryIO, lines: LineIndex):
+    "Pickles obj to file, storing a reference to lines instead of a copy of the source"
+    pickler = pickle.Pickler(file, pickle.HIGHEST_PROTOCOL)
+    # Reducing through the dispatch table keeps the rest of pickling in C, and lines is memoized after the first use
+    pickler.dispatch_table = copyreg.dispatch_table.copy()
+    pickler.dispatch_table[LineIndex] = lambda index: (attached_lines, ()) if index is lines else index.__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+    pickler.dump(obj)
+def load_with_lines(file: BinaryIO, lines: LineIndex):
+    "Unpickles what dump_with_lines wrote, with lines in place of the reference"
+    global attaching
+    attaching = lines
+    try:
+        return pickle.load(file)
+    finally:
+        attaching = None
+
+attaching: LineIndex | None = None
+def attached_lines() -> LineIndex:
+    "Returns the line index that load_with_lines is attaching"
+    return attaching
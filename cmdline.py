@@ -1,48 +1,416 @@
 import sys
+import os
+import glob
+import json
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
+from typing import BinaryIO, Callable, TextIO
 import lexer
+import fastlexer
 import parser
+import parallel
+import writers
+import evaluator
+import bytecode
+import vm
 import constants as c
+from diagnostics import Diagnostics
+from cache import ParseCache, ParseOutcome
+from symbols import SymbolIndex
+from timings import Timings
+from pos import LineIndex
 
-FLAG_LIST = {"-d"}
-OPTION_LIST = set()
+FLAG_LIST = {"-d", "--stream", "--split", "--check", "--tokens", "--timings", "--profile"}
+OPTION_LIST = {"--lexer", "--parser", "--max-errors", "--error-format", "--cache", "-j", "--index", "--output-format", "-o", "--backend"}
+SYMBOL_COMMANDS = {"--find", "--outline"}
+RUN_COMMANDS = {"run", "dis"}
+RUN_FLAGS = {"--timings", "--profile"} # The flags and options the run and dis commands take
+RUN_OPTIONS = {"--lexer", "--parser", "--max-errors", "--error-format", "--cache", "--backend"}
+LEXERS = {
+    "classic": lexer.Lexer,
+    "fast": fastlexer.FastLexer,
+}
+PARSERS = { # (parser, streaming parser)
+    "recursive": (parser.Parser, parser.StreamParser),
+    "stack": (parser.StackParser, parser.StackStreamParser),
+}
+ERROR_FORMATS = {"text", "json"}
+BACKENDS = {"closures", "bytecode"}
 
 def run(input_args: list[str]):
     if len(input_args) == 0:
-        print("COMMAND LIST: -v / --version")
-        print("FLAGS: -d")
-        print("OPTIONS: NONE")
+        print("COMMAND LIST: -v / --version, --find NAME [FILES], --outline FILES, run [OPTIONS] FILE [ARGS], dis [OPTIONS] FILE")
+        print("FLAGS: -d, --stream, --split, --check, --tokens, --timings, --profile")
+        print("OPTIONS: --lexer [classic|fast], --parser [recursive|stack], --max-errors N, --error-format [text|json], --cache DIR, -j N, --index FILE, --output-format [text|jsonl|binary], -o FILE, --backend [closures|bytecode]")
         sys.exit()
 
     input_args = sys.argv[1:]
     if input_args[0] == "-v" or input_args[0] == "--version":
         print(f"Jargonlang v{c.VERSION_MAJOR}.{c.VERSION_MINOR}.{c.VERSION_PATCH} [{c.RELEASE_YEAR}-{c.RELEASE_MONTH}-{c.RELEASE_DAY}]")
+    elif input_args[0] in SYMBOL_COMMANDS:
+        args, _, options = process(input_args[1:])
+        run_symbols(input_args[0], args, options)
+    elif input_args[0] in RUN_COMMANDS:
+        run_program(input_args[0], input_args[1:])
     else:
         args, flags, options = process(input_args)
         if len(args) == 0:
             raise ValueError("Expected filename")
-        elif len(args) > 1:
-            raise ValueError("Too many arguments")
-        with open(args[0], "r") as file:
+
+        check_options(options)
+        error_format = options.get("--error-format", "text")
+        jobs = options.get("-j")
+        if jobs is not None and not (jobs.isdigit() and int(jobs) > 0):
+            raise ValueError("Expected a positive number for -j: " + jobs)
+        if "--split" in flags and ("-d" in flags or "--stream" in flags):
+            raise ValueError("--split cannot be used with -d or --stream")
+        if "--check" in flags and ("-d" in flags or "--split" in flags):
+            raise ValueError("--check cannot be used with -d or --split")
+        output_format = options.get("--output-format", "text")
+        if output_format not in writers.FORMATS:
+            raise ValueError("Invalid output format: " + output_format)
+        if "-d" in flags and output_format != "text":
+            raise ValueError("-d only works with --output-format text")
+        if "--tokens" in flags and ("-d" in flags or "--split" in flags or "--check" in flags):
+            raise ValueError("--tokens cannot be used with -d, --split or --check")
+        paths = expand(args)
+        if paths != args or len(paths) > 1:
+            if "-d" in flags or "--split" in flags or "--tokens" in flags or "-o" in options or "--output-format" in options:
+                raise ValueError("-d, --split, --tokens, -o and --output-format only work with a single file")
+            run_many(paths, flags, options)
+            return
+
+        timings = Timings(memory="--profile" in flags)
+        try:
+            compile_single(args[0], flags, options, timings)
+        finally:
+            timings.close()
+            if "--timings" in flags or "--profile" in flags:
+                print(timings.render_json(file=args[0]) if error_format == "json" else timings.render(args[0]), file=sys.stderr)
+
+def check_options(options: dict[str, str]):
+    "Checks the values of the options that choose the lexer, parser and error reporting"
+    lexer_name = options.get("--lexer", "classic")
+    if lexer_name not in LEXERS:
+        raise ValueError("Invalid lexer: " + lexer_name)
+    parser_name = options.get("--parser", "recursive")
+    if parser_name not in PARSERS:
+        raise ValueError("Invalid parser: " + parser_name)
+    error_format = options.get("--error-format", "text")
+    if error_format not in ERROR_FORMATS:
+        raise ValueError("Invalid error format: " + error_format)
+    max_errors = options.get("--max-errors")
+    if max_errors is not None and not (max_errors.isdigit() and int(max_errors) > 0):
+        raise ValueError("Expected a positive number for --max-errors: " + max_errors)
+
+def compile_single(path: str, flags: set[str], options: dict[str, str], timings: Timings):
+    "Lexes and parses one file, and prints its tree or tokens or its errors. Exits with status 1 on errors"
+    max_errors = options.get("--max-errors")
+    error_format = options.get("--error-format", "text")
+    output_format = options.get("--output-format", "text")
+    with timings.phase("read"):
+        with open(path, "r") as file:
             text = file.read()
+    cache = ParseCache(options["--cache"]) if "--cache" in options and "-d" not in flags and "--check" not in flags else None
+    lines = LineIndex(text)
+    if "--tokens" in flags:
+        lexer_ = LEXERS[options.get("--lexer", "classic")](text)
+        lexer_.lines = lines
+        with timings.phase("lex+output"):
+            write_output(lambda out: writers.write_tokens(lexer_.iter_tokens(recover=True), out, output_format), options)
+        if lexer_.errors:
+            diagnostics = Diagnostics(text, path, int(max_errors) if max_errors else None, lines)
+            diagnostics.extend(lexer_.errors)
+            report(diagnostics, error_format)
+            sys.exit(1)
+        return
+    tree, lexer_errors, parser_errors = load_or_parse(text, lines, flags, options, cache, timings)
+    if cache and cache.stored:
+        cache.evict()
+    if "--timings" in flags or "--profile" in flags:
+        timings.count_nodes(tree)
+    diagnostics = Diagnostics(text, path, int(max_errors) if max_errors else None, lines)
+    if lexer_errors:
+        if "-d" in flags: print("LEXER ERROR")
+        diagnostics.extend(lexer_errors)
+        report(diagnostics, error_format)
+        sys.exit(1)
+    if parser_errors:
+        if "-d" in flags: print("PARSER ERROR")
+        diagnostics.extend(parser_errors)
+        report(diagnostics, error_format)
+        sys.exit(1)
+    if "--check" in flags:
+        return
+    if "-d" in flags:
+        print("PARSER OUTPUT:", end=" ")
+        write_output(lambda out: writers.write_tree(tree, out), {})
+    with timings.phase("output"):
+        if tree is None:
+            if output_format == "text": write_output(lambda out: out.write("None"), options)
+        else:
+            write_output(lambda out: writers.write_tree(tree, out, output_format), options)
+
+def run_program(command: str, input_args: list[str]):
+    """
+    Parses and compiles a program, then runs its main function with the arguments after the file name (run) or
+    prints its bytecode (dis). Exits with the int main returns, or with status 1 if the program has errors or fails.
+    The bytecode backend caches the compiled program next to the source
+    """
+    i = 0
+    while i < len(input_args) and input_args[i].startswith("-"): # Options end at the file name
+        i += 2 if input_args[i] in OPTION_LIST else 1
+    args, flags, options = process(input_args[:i])
+    if i >= len(input_args):
+        raise ValueError("Expected filename")
+    for name in list(flags) + list(options):
+        if name not in RUN_FLAGS and name not in RUN_OPTIONS:
+            raise ValueError(f"{name} cannot be used with {command}")
+    check_options(options)
+    backend = "bytecode" if command == "dis" else options.get("--backend", "closures")
+    if backend not in BACKENDS:
+        raise ValueError("Invalid backend: " + backend)
+    path, program_args = input_args[i], input_args[i + 1:]
+    if command == "dis" and program_args:
+        raise ValueError("Unexpected argument: " + program_args[0])
+    error_format = options.get("--error-format", "text")
+    max_errors = options.get("--max-errors")
+    timings = Timings(memory="--profile" in flags)
+    result = None
+    try:
+        with timings.phase("read"):
+            with open(path, "r") as file:
+                text = file.read()
+        lines = LineIndex(text)
+        diagnostics = Diagnostics(text, path, int(max_errors) if max_errors else None, lines)
+        program = None
+        if backend == "bytecode":
+            with timings.phase("code load"):
+                program = bytecode.load_cached(path, text)
+        if program is None:
+            cache = ParseCache(options["--cache"]) if "--cache" in options else None
+            tree, lexer_errors, parser_errors = load_or_parse(text, lines, flags, options, cache, timings)
+            if cache and cache.stored:
+                cache.evict()
+            if "--timings" in flags or "--profile" in flags:
+                timings.count_nodes(tree)
+            if lexer_errors or parser_errors:
+                diagnostics.extend(lexer_errors or parser_errors)
+                report(diagnostics, error_format)
+                sys.exit(1)
+            with timings.phase("compile"):
+                if backend == "bytecode":
+                    program, errors = bytecode.compile_tree(tree)
+                else:
+                    program = evaluator.Program(tree)
+                    errors = program.errors
+            if errors:
+                diagnostics.extend(errors)
+                report(diagnostics, error_format)
+                sys.exit(1)
+            if backend == "bytecode":
+                with timings.phase("code store"):
+                    bytecode.store_cached(path, text, program)
+        if command == "dis":
+            bytecode.disassemble(program, sys.stdout, lines)
+            return
+        try:
+            with timings.phase("run"):
+                result = (vm.VM(program, lines) if backend == "bytecode" else program).run(program_args)
+        except evaluator.RunError as error:
+            sys.stdout.flush()
+            diagnostics.add(error.error)
+            report(diagnostics, error_format)
+            sys.exit(1)
+        sys.stdout.flush()
+    finally:
+        timings.close()
+        if "--timings" in flags or "--profile" in flags:
+            print(timings.render_json(file=path) if error_format == "json" else timings.render(path), file=sys.stderr)
+    sys.exit(result if type(result) is int else 0)
+
+def write_output(write: Callable[[TextIO | BinaryIO], None], options: dict[str, str]):
+    """
+    Calls write with the -o file, or with stdout, opened in binary mode for --output-format binary. Text output
+    ends with a newline, like print
+    """
+    binary = options.get("--output-format") == "binary"
+    with open(options["-o"], "wb" if binary else "w") if "-o" in options else nullcontext(sys.stdout.buffer if binary else sys.stdout) as out:
+        sys.stdout.flush() # Anything printed before comes first
+        write(out)
+        if options.get("--output-format", "text") == "text":
+            out.write("\n")
+        out.flush()
+
+def expand(args: list[str]) -> list[str]:
+    "Replaces directories with the .jgl files under them and globs with the files they match, keeping the first of duplicates"
+    paths = []
+    seen = set()
+    for arg in args:
+        if os.path.isdir(arg):
+            matches = sorted(glob.glob(os.path.join(glob.escape(arg), "**", "*.jgl"), recursive=True))
+        elif any(char in arg for char in "*?["):
+            matches = sorted(path for path in glob.glob(arg, recursive=True) if os.path.isfile(path))
+            if not matches:
+                raise ValueError("No files match: " + arg)
+        else:
+            matches = [arg]
+        for path in matches:
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    if not paths:
+        raise ValueError("No .jgl files found")
+    return paths
+
+def run_many(paths: list[str], flags: set[str], options: dict[str, str]):
+    """
+    Lexes and parses several files on a process pool of -j workers, printing the errors of each file in the order
+    the files were given. Exits with status 1 if any file has errors or cannot be read
+    """
+    jobs = int(options.get("-j", os.cpu_count() or 1))
+    failed = 0
+    with ProcessPoolExecutor(jobs) if jobs > 1 else nullcontext() as pool:
+        if pool:
+            results = pool.map(compile_file, paths, repeat(flags), repeat(options), chunksize=max(1, len(paths) // (jobs * 8)))
+        else:
+            results = map(compile_file, paths, repeat(flags), repeat(options))
+        for path, (errors, timings) in zip(paths, results):
+            if errors is not None:
+                failed += 1
+                print(errors, file=sys.stderr)
+            if timings is not None:
+                print(timings.render_json(file=path) if options.get("--error-format") == "json" else timings.render(path), file=sys.stderr)
+    if "--cache" in options:
+        ParseCache(options["--cache"]).evict()
+    if failed:
+        if options.get("--error-format", "text") == "text":
+            print(f"\n{failed} of {len(paths)} files failed", file=sys.stderr)
+        sys.exit(1)
+
+def run_symbols(command: str, args: list[str], options: dict[str, str]):
+    """
+    Updates the symbol index with the files given, then prints the declarations of a function (--find NAME, where
+    NAME can be a glob pattern) or of each file (--outline). --find searches the current directory without files,
+    and exits with status 1 if nothing matches
+    """
+    if command == "--find":
+        if len(args) == 0:
+            raise ValueError("Expected a function name")
+        name, args = args[0], args[1:] or ["."]
+    elif len(args) == 0:
+        raise ValueError("Expected filename")
+    jobs = options.get("-j")
+    if jobs is not None and not (jobs.isdigit() and int(jobs) > 0):
+        raise ValueError("Expected a positive number for -j: " + jobs)
+    paths = expand(args)
+    with SymbolIndex(options.get("--index", ".jargon-index")) as index:
+        index.update(paths, int(jobs or os.cpu_count() or 1))
+        if command == "--outline":
+            found = [symbol for path in paths for symbol in index.outline(path)]
+        elif any(char in name for char in "*?["):
+            found = index.search(name, paths)
+        else:
+            found = index.find(name, paths)
+    for symbol in found:
+        print(f"{os.path.relpath(symbol.path)}:{symbol.line + 1}:{symbol.col + 1}: {symbol.signature()}")
+    if command == "--find" and not found:
+        sys.exit(1)
+
+def compile_file(path: str, flags: set[str], options: dict[str, str]) -> tuple[str | None, Timings | None]:
+    """
+    Lexes and parses one file of a multi-file run. Returns its rendered errors, or None if it has none, and its
+    timings with --timings or --profile
+    """
+    timings = Timings(memory="--profile" in flags)
+    try:
+        errors = check_file(path, flags, options, timings)
+    finally:
+        timings.close()
+    return (errors, timings if "--timings" in flags or "--profile" in flags else None)
+def check_file(path: str, flags: set[str], options: dict[str, str], timings: Timings) -> str | None:
+    error_format = options.get("--error-format", "text")
+    try:
+        with timings.phase("read"):
+            with open(path, "r") as file:
+                text = file.read()
+    except (OSError, UnicodeDecodeError) as error:
+        if error_format == "json":
+            return json.dumps({"file": path, "message": f"Cannot read file: {error}"})
+        return f"Error: cannot read {path}: {error}"
+    lines = LineIndex(text)
+    cache = ParseCache(options["--cache"]) if "--cache" in options and "--check" not in flags else None
+    try:
+        tree, lexer_errors, parser_errors = load_or_parse(text, lines, flags, options, cache, timings)
+    except RecursionError:
+        message = "Nesting too deep for the recursive parser, use --parser stack"
+        if error_format == "json":
+            return json.dumps({"file": path, "message": message})
+        return f"Error: {message} ({path})"
+    if "--timings" in flags or "--profile" in flags:
+        timings.count_nodes(tree)
+    if not lexer_errors and not parser_errors:
+        return None
+    max_errors = options.get("--max-errors")
+    diagnostics = Diagnostics(text, path, int(max_errors) if max_errors else None, lines)
+    diagnostics.extend(lexer_errors or parser_errors)
+    return render(diagnostics, error_format)
+
+def load_or_parse(text: str, lines: LineIndex, flags: set[str], options: dict[str, str], cache: ParseCache | None, timings: Timings) -> ParseOutcome:
+    "Returns the cached outcome for text if there is one, otherwise parses it and stores the outcome in the cache"
+    outcome = None
+    if cache:
+        with timings.phase("cache load"):
+            outcome = cache.load(text, lines)
+    if outcome is None:
+        lexer_class = LEXERS[options.get("--lexer", "classic")]
+        parser_class, stream_parser_class = PARSERS[options.get("--parser", "recursive")]
+        if "--split" in flags:
+            with timings.phase("lex+parse"):
+                outcome = parallel.parse_split(text, lines, int(options.get("-j", os.cpu_count() or 1)), lexer_class, parser_class)
+        else:
+            lexer_ = lexer_class(text)
+            lexer_.lines = lines
+            outcome = parse(lexer_, stream_parser_class if "--stream" in flags else parser_class, flags, timings)
+        if cache:
+            with timings.phase("cache store"):
+                cache.store(text, lines, outcome)
+    return outcome
+
+def parse(lexer_: lexer.Lexer | fastlexer.FastLexer, parser_class: type[parser.Parser], flags: set[str], timings: Timings) -> ParseOutcome:
+    """
+    Lexes and parses the source with every error recorded. The parser does not run if lexing fails, unless streaming.
+    With --check no tree is built, and None is returned in its place
+    """
+    if "--stream" in flags:
+        parser_ = parser_class(lexer_)
+        with timings.phase("lex+parse"):
+            if "--check" in flags:
+                tree, parser_errors = None, parser_.check()
+            else:
+                tree, parser_errors = parser_.parse_all()
+        timings.tokens = parser_.index + 1
+        return (tree, lexer_.errors, parser_errors)
+    with timings.phase("lex"):
+        tokens, lexer_errors = lexer_.lex_all()
+    timings.tokens = len(tokens)
+    if lexer_errors:
+        return (None, lexer_errors, [])
+    if "-d" in flags:
+        print("LEXER OUTPUT:", end=" ")
+        write_output(lambda out: writers.write_tokens(tokens, out), {})
+    with timings.phase("parse"):
+        if "--check" in flags:
+            return (None, [], parser_class(tokens).check())
+        tree, parser_errors = parser_class(tokens).parse_all()
+    return (tree, [], parser_errors)
 
-        lexer_ = lexer.Lexer(text)
-        lexer_res = lexer_.lex_text()
-
-        if lexer_res[1]:
-            if "-d" in flags: print("LEXER ERROR")
-            print(lexer_res[1].display(lexer_.text, args[0]), file=sys.stderr, sep="")
-            exit()
-        if "-d" in flags:
-            print("LEXER OUTPUT:", lexer_res[0])
-        parser_ = parser.Parser(lexer_res[0])
-        parser_res = parser_.parse()
-        if parser_res.err:
-            if "-d" in flags: print("PARSER ERROR")
-            print(parser_res.err.display(text, args[0]), file=sys.stderr, sep="")
-            sys.exit()
-        if "-d" in flags:
-            print("PARSER OUTPUT:", parser_res.ok)
-        print(parser_res.ok)
+def report(diagnostics: Diagnostics, error_format: str):
+    "Prints the collected errors to stderr"
+    print(render(diagnostics, error_format), file=sys.stderr)
+def render(diagnostics: Diagnostics, error_format: str) -> str:
+    return diagnostics.render_json() if error_format == "json" else diagnostics.render()
 
 def process(input_args: list[str]) -> tuple[list[str], set[str], dict[str, str]]: # (args, flags, options)
     args = []
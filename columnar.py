@@ -0,0 +1,260 @@
+import mmap
+import struct
+import sys
+from array import array
+import nodes as n
+import types_
+from operators import Operator
+from constants import TYPES
+from pos import LineIndex
+
+# How each node class is stored: its child fields, the field holding its list of children (always stored after
+# the others), and the fields kept in the value and extra columns with the codec used for them
+LAYOUTS: dict[type[n.Node], tuple[tuple[str, ...], str | None, tuple[str, str] | None, tuple[str, str] | None]] = {
+    n.BlockNode: ((), "nodes", None, None),
+    n.IntNode: ((), None, ("value", "int"), None),
+    n.FloatNode: ((), None, ("value", "float"), None),
+    n.StringNode: ((), None, ("value", "pool"), None),
+    n.CharNode: ((), None, ("value", "pool"), None),
+    n.BoolNode: ((), None, ("value", "bool"), None),
+    n.BinaryOpNode: (("left", "right"), None, ("operator", "operator"), None),
+    n.UnaryOpNode: (("value",), None, ("operator", "operator"), None),
+    n.VarNode: ((), None, ("var_name", "pool"), None),
+    n.VarAssignNode: (("value",), None, ("var_name", "pool"), None),
+    n.VarDeclareNode: (("value",), None, ("var_name", "pool"), ("var_type", "type")),
+    n.FuncDeclNode: (("body",), None, ("name", "pool"), ("args", "signature")),
+    n.ReturnNode: (("value",), None, None, None),
+    n.CallNode: (("node",), "arguments", None, None),
+    n.IfNode: (("condition", "success", "failure"), "alternate_cases", None, None),
+    n.WhileNode: (("cond", "block"), None, None, None),
+    n.ContinueNode: ((), None, None, None),
+    n.BreakNode: ((), None, None, None),
+    n.ForNode: (("init", "cond", "iter", "block"), None, None, None),
+    n.ArrayNode: ((), "elements", None, None),
+    n.ForEachNode: (("container", "block"), None, ("var_name", "pool"), None),
+}
+KINDS: list[type[n.Node]] = list(LAYOUTS) # A node's kind is the index of its class here
+KIND_CODES = {cls: code for code, cls in enumerate(KINDS)}
+TYPE_NAMES = {basic_type: name for name, basic_type in TYPES.items()}
+
+MAGIC = b"JGLC"
+FORMAT_VERSION = 1
+# magic, format version, node count, child slot count, pool entry count, pool byte count
+HEADER = struct.Struct("<4sIqqqq")
+COLUMNS = (("kind", "B"), ("start", "i"), ("end", "i"), ("first", "i"), ("value", "i"), ("extra", "i"), ("children", "i"))
+
+class Pool:
+    "The strings of a loaded file, decoded when first used"
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+        self.strings: dict[int, str] = {}
+    def __len__(self):
+        return len(self.offsets) - 1
+    def __getitem__(self, index: int) -> str:
+        string = self.strings.get(index)
+        if string is None:
+            string = self.strings[index] = str(self.data[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+        return string
+
+class ColumnarTree:
+    """
+    A tree stored as parallel columns instead of node objects. Node i has class KINDS[kind[i]] and spans
+    start[i] to end[i]. Its children are the node indices children[first[i]:first[i + 1]], with -1 for a missing
+    child, in the order of its LAYOUTS entry. value[i] and extra[i] hold its other fields: an index into pool
+    for names, literals and types, or a code for booleans and operators. Nodes are numbered breadth first from
+    the root at index 0, so children always come after their parent.
+    Trees read with load share the file's memory, and only decode what is used
+    """
+    def __init__(self, kind, start, end, first, value, extra, children, pool):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.first = first
+        self.value = value
+        self.extra = extra
+        self.children = children
+        self.pool = pool
+    def __len__(self):
+        return len(self.kind)
+
+    def node_class(self, index: int) -> type[n.Node]:
+        return KINDS[self.kind[index]]
+    def child_indices(self, index: int) -> list[int]:
+        return list(self.children[self.first[index]:self.first[index + 1]])
+
+    @classmethod
+    def from_nodes(cls, root: n.Node) -> "ColumnarTree":
+        kind, start, end, value, extra = array("B"), array("i"), array("i"), array("i"), array("i")
+        first, children = array("i"), array("i")
+        pool: list[str] = []
+        pooled: dict[str, int] = {}
+        def encode(node: n.Node, field: tuple[str, str] | None) -> int:
+            if field is None:
+                return -1
+            data = encode_field(node, field)
+            if type(data) is int:
+                return data
+            index = pooled.get(data)
+            if index is None:
+                index = pooled[data] = len(pool)
+                pool.append(data)
+            return index
+
+        order = [root]
+        i = 0
+        while i < len(order):
+            node = order[i]
+            i += 1
+            child_fields, list_field, value_field, extra_field = LAYOUTS[type(node)]
+            kind.append(KIND_CODES[type(node)])
+            start.append(node.start)
+            end.append(node.end)
+            value.append(encode(node, value_field))
+            extra.append(encode(node, extra_field))
+            first.append(len(children))
+            for child in [getattr(node, field) for field in child_fields] + (getattr(node, list_field) if list_field else []):
+                if child is None:
+                    children.append(-1)
+                else:
+                    children.append(len(order))
+                    order.append(child)
+        first.append(len(children))
+        return cls(kind, start, end, first, value, extra, children, pool)
+
+    def to_nodes(self, lines: LineIndex, index: int = 0) -> n.Node:
+        "Builds the node objects for the subtree at index, with positions in lines"
+        kind, start, end, first, children, pool = self.kind, self.start, self.end, self.first, self.children, self.pool
+        if index == 0:
+            subtree = range(len(kind))
+        else:
+            subtree = [index]
+            i = 0
+            while i < len(subtree):
+                subtree.extend(child for child in children[first[subtree[i]]:first[subtree[i] + 1]] if child != -1)
+                i += 1
+        # Every node is built after its children, which have higher indices
+        built: dict[int, n.Node] = {-1: None}
+        for i in reversed(subtree):
+            cls = KINDS[kind[i]]
+            child_fields, list_field, value_field, extra_field = LAYOUTS[cls]
+            node = cls.__new__(cls)
+            node.start = start[i]
+            node.end = end[i]
+            node.lines = lines
+            slots = [built[child] for child in children[first[i]:first[i + 1]]]
+            for field, child in zip(child_fields, slots):
+                setattr(node, field, child)
+            if list_field:
+                setattr(node, list_field, slots[len(child_fields):])
+            for field, code in ((value_field, self.value[i]), (extra_field, self.extra[i])):
+                if field is not None:
+                    decode_field(node, field, code if field[1] in INT_CODECS else pool[code])
+            built[i] = node
+        return built[index]
+
+    def nbytes(self) -> int:
+        "Size of the columns, without the pool"
+        return sum(len(getattr(self, name)) * array(typecode).itemsize for name, typecode in COLUMNS)
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the tree: a header, then the columns as little-endian arrays each padded to 8 bytes, then the pool
+        as an array of offsets into the UTF-8 text of all its strings
+        """
+        data = [pool_string.encode("utf-8") for pool_string in self.pool]
+        offsets = array("q", [0])
+        for string in data:
+            offsets.append(offsets[-1] + len(string))
+        out = [HEADER.pack(MAGIC, FORMAT_VERSION, len(self), len(self.children), len(data), offsets[-1])]
+        for column in [array(typecode, getattr(self, name)) for name, typecode in COLUMNS] + [offsets]:
+            if sys.byteorder != "little":
+                column.byteswap()
+            raw = column.tobytes()
+            out.append(raw + b"\0" * (-len(raw) % 8))
+        out.extend(data)
+        return b"".join(out)
+    def save(self, path: str):
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def from_buffer(cls, buffer) -> "ColumnarTree":
+        "Reads a serialized tree without copying it. The columns are views of buffer"
+        view = memoryview(buffer)
+        magic, version, nodes, slots, pool_size, pool_bytes = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Not a columnar tree file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar tree format version: {version}")
+        offset = HEADER.size
+        columns = []
+        counts = {"first": nodes + 1, "children": slots}
+        for typecode, count in [(typecode, counts.get(name, nodes)) for name, typecode in COLUMNS] + [("q", pool_size + 1)]:
+            size = array(typecode).itemsize * count
+            column = view[offset:offset + size].cast(typecode)
+            if sys.byteorder != "little":
+                column = array(typecode, column)
+                column.byteswap()
+            columns.append(column)
+            offset += size + -size % 8
+        pool = Pool(columns.pop(), view[offset:offset + pool_bytes])
+        return cls(*columns, pool)
+    @classmethod
+    def load(cls, path: str) -> "ColumnarTree":
+        "Memory-maps a file written by save"
+        with open(path, "rb") as file:
+            return cls.from_buffer(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+INT_CODECS = {"bool", "operator"} # Codecs that store a number, the others store a string
+def encode_field(node: n.Node, field: tuple[str, str]) -> int | str:
+    "Returns the data a value or extra field is stored as"
+    name, codec = field
+    data = getattr(node, name)
+    if codec == "bool":
+        return int(data)
+    elif codec == "operator":
+        return data.value
+    elif codec in ("int", "float"): # Kept as text in the pool, since they do not fit the 32-bit columns
+        return repr(data)
+    elif codec == "type":
+        return encode_type(data)
+    elif codec == "signature":
+        return ",".join(f"{arg}:{encode_type(type_)}" for arg, type_ in data.items()) + "->" + encode_type(node.return_type)
+    return data
+def decode_field(node: n.Node, field: tuple[str, str], data: int | str):
+    "Sets a value or extra field of node from what encode_field returned"
+    name, codec = field
+    if codec == "bool":
+        setattr(node, name, bool(data))
+    elif codec == "operator":
+        setattr(node, name, Operator(data))
+    elif codec == "int":
+        setattr(node, name, int(data))
+    elif codec == "float":
+        setattr(node, name, float(data))
+    elif codec == "type":
+        setattr(node, name, decode_type(data))
+    elif codec == "signature":
+        args, return_type = data.split("->")
+        node.args = {
+            arg: decode_type(type_) for arg, type_ in (part.split(":") for part in args.split(",") if part)
+        }
+        node.return_type = decode_type(return_type)
+    else:
+        setattr(node, name, data)
+
+def encode_type(type_: types_.Type) -> str:
+    "Writes a type the way it is declared, like [[int]]"
+    depth = 0
+    value = type_.value
+    while isinstance(value, types_.ArrayType):
+        depth += 1
+        value = value.element_type.value
+    return "[" * depth + TYPE_NAMES[value] + "]" * depth
+def decode_type(text: str) -> types_.Type:
+    depth = text.count("[")
+    type_ = types_.Type(TYPES[text[depth:len(text) - depth]])
+    for _ in range(depth):
+        type_ = types_.Type(types_.ArrayType(type_))
+    return type_
@@ -0,0 +1,50 @@
+import json
+from error import Error
+from pos import LineIndex
+
+class Diagnostics:
+    """
+    Collects the errors found in one source text and renders them together, using a single line index
+    for the whole text. Only the first max_errors errors added are kept; the rest are counted, so render can
+    say how many were left out. The lexer and parser still find every error, the limit only shortens the output
+    """
+    def __init__(self, text: str, filename: str, max_errors: int | None = None, lines: LineIndex | None = None):
+        self.text = text
+        self.filename = filename
+        self.max_errors = max_errors
+        self.lines = lines if lines is not None else LineIndex(text)
+        self.errors: list[Error] = []
+        self.count = 0 # Every error added, including the ones over the limit
+
+    def add(self, error: Error) -> bool:
+        "Records an error. Returns False if the error limit has been reached"
+        self.count += 1
+        if self.full():
+            return False
+        self.errors.append(error)
+        return True
+    def extend(self, errors: list[Error]):
+        for error in errors:
+            self.add(error)
+    def full(self) -> bool:
+        return self.max_errors is not None and len(self.errors) >= self.max_errors
+
+    def sorted(self) -> list[Error]:
+        return sorted(self.errors, key=lambda error: error.pos_start.index)
+
+    def render(self) -> str:
+        "Formats every error like Error.display, in source order"
+        text = "\n\n".join(error.display(self.text, self.filename, self.lines) for error in self.sorted())
+        if self.count > len(self.errors):
+            text += f"\n\n{self.count - len(self.errors)} more errors not shown (limit: {self.max_errors})"
+        return text
+    def render_json(self) -> str:
+        "Formats the errors as JSON lines, one object per error, in source order"
+        return "\n".join(json.dumps({
+            "file": self.filename,
+            "line": error.pos_start.line + 1,
+            "col": error.pos_start.col + 1,
+            "end_line": error.pos_end.line + 1,
+            "end_col": error.pos_end.col + 1,
+            "message": error.value,
+        }) for error in self.sorted())
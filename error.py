@@ -12,12 +12,15 @@ class Error:
     def __str__(self):
         return f"Error: {self.value}"
     
-    def display(self, text: str, filename: str) -> str:
+    def display(self, text: str, filename: str, lines: pos.LineIndex | None = None) -> str:
+        "Formats the error with the line it occurred on. Pass the source's LineIndex when displaying several errors"
+        if lines is None:
+            lines = pos.LineIndex(text)
         disp_text: str = (
             f"Error at line {self.pos_start.line + 1}, col {self.pos_start.col + 1} ({filename}:{self.pos_start.line+1}:{self.pos_start.col+1}):\n"
             f"{self.value}\n"
         )
-        line_text = text.split("\n")[self.pos_start.line]
+        line_text = lines.line_text(self.pos_start.line)
         disp_text += line_text
         disp_text += "\n"
         disp_text += " " * self.pos_start.col
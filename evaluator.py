@@ -0,0 +1,670 @@
+import operator
+import sys
+from contextlib import contextmanager
+from typing import Any, Callable
+import nodes as n
+import types_
+from operators import Operator
+from error import Error
+from pos import Position
+from visitor import dispatch_table
+
+# What a compiled statement returns to the statements around it. None, the usual result, carries on with the next
+# statement. They are also bits of the mask compiling a statement returns, of the results it can have
+BREAK = 1
+CONTINUE = 2
+RETURN = 4 # The return value is in slot 0 of the function's frame
+RECURSION_LIMIT = 200_000 # Python's recursion limit while a program compiles and runs. Each call in the program takes a few Python frames
+
+Code = Callable[[list], Any] # A compiled node. Called with the frame of the function it is in: a list of the function's variables
+
+class RunError(Exception):
+    "An error found while compiling or running a program"
+    def __init__(self, error: Error):
+        super().__init__(error.value)
+        self.error = error
+
+def node_error(node: n.Node, message: str) -> RunError:
+    return RunError(Error(message, node.pos_start, node.pos_end))
+
+@contextmanager
+def recursion_limit():
+    "Raises Python's recursion limit to RECURSION_LIMIT while compiling or running, for deeply nested code"
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+    try:
+        yield
+    finally:
+        sys.setrecursionlimit(limit)
+
+class Function:
+    "A compiled function. Its frame holds the return value in slot 0, then its arguments, then its other variables"
+    __slots__ = ("name", "arity", "size", "body", "node")
+    def __init__(self, name: str, arity: int, node: n.FuncDeclNode):
+        self.name = name
+        self.arity = arity
+        self.size = 1 # Grows as the compiler declares the arguments and variables
+        self.body: Code | None = None
+        self.node = node
+    def __call__(self, *arguments):
+        frame = [None] * self.size
+        frame[1:len(arguments) + 1] = arguments
+        try:
+            self.body(frame)
+        except RecursionError:
+            raise node_error(self.node, "Too many nested calls") from None
+        return frame[0]
+    def __repr__(self):
+        return f"<function {self.name}>"
+
+def divide(left, right):
+    "Truncates toward zero when both operands are ints, like C, and divides exactly otherwise"
+    if type(left) is int and type(right) is int:
+        quotient = abs(left) // abs(right)
+        return quotient if (left < 0) == (right < 0) else -quotient
+    return left / right
+def invert(value):
+    return not value if type(value) is bool else ~value
+
+BINARY: dict[Operator, Callable[[Any, Any], Any]] = {
+    Operator.ADD: operator.add,
+    Operator.SUB: operator.sub,
+    Operator.MUL: operator.mul,
+    Operator.DIV: divide,
+    Operator.EQ: operator.eq,
+    Operator.NOT_EQ: operator.ne,
+    Operator.GT: operator.gt,
+    Operator.LT: operator.lt,
+    Operator.GE: operator.ge,
+    Operator.LE: operator.le,
+    Operator.AND: operator.and_,
+    Operator.OR: operator.or_,
+    Operator.XOR: operator.xor,
+}
+UNARY: dict[Operator, Callable[[Any], Any]] = {
+    Operator.NEG: operator.neg,
+    Operator.NOT: invert,
+    Operator.LOGIC_NOT: operator.not_,
+}
+OPERAND_ERRORS = (TypeError, ZeroDivisionError, OverflowError)
+MAX_FOLDED_LENGTH = 4096 # Longest string that constant folding builds. Longer ones are built when, and if, the code runs
+
+def fold(function: Callable, operands: tuple) -> tuple | None:
+    """
+    Returns (value,) for an operator's function applied to constant operands. Returns None if it fails, which is
+    reported when the code runs, or if it would build a string longer than MAX_FOLDED_LENGTH, which code that
+    never runs should not cost
+    """
+    if len(operands) == 2:
+        a, b = operands
+        if function is operator.add and type(a) is str and type(b) is str:
+            if len(a) + len(b) > MAX_FOLDED_LENGTH:
+                return None
+        elif function is operator.mul and (type(a) is str) != (type(b) is str):
+            text, count = (a, b) if type(a) is str else (b, a)
+            if isinstance(count, int) and len(text) * count > MAX_FOLDED_LENGTH:
+                return None
+    try:
+        return (function(*operands),)
+    except OPERAND_ERRORS:
+        return None
+
+def operand_error(node: n.Node, operator_: Operator, operands: tuple, error: Exception) -> RunError:
+    return node_error(node, operand_message(operator_, operands, error))
+def operand_message(operator_: Operator, operands: tuple, error: Exception) -> str:
+    if isinstance(error, ZeroDivisionError):
+        return "Division by zero"
+    elif isinstance(error, OverflowError):
+        return "Number too large"
+    return f"Cannot apply {operator_.name} to {' and '.join(type_name(value) for value in operands)}"
+def type_name(value) -> str:
+    if type(value) is list:
+        return "array"
+    elif value is None:
+        return "void"
+    elif callable(value) or hasattr(value, "arity"): # Builtins, and the functions of either backend
+        return "function"
+    return type(value).__name__
+
+def format_value(value) -> str:
+    "How print shows a value: booleans as true and false, and arrays as their elements in brackets"
+    # Arrays are expanded on an explicit stack, with their brackets and commas pushed as text, so deeply nested
+    # arrays do not reach the recursion limit
+    pieces = []
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if type(value) is list:
+            stack.append("]")
+            for i in range(len(value) - 1, -1, -1):
+                stack.append(value[i])
+                if i:
+                    stack.append(", ")
+            stack.append("[")
+        else:
+            pieces.append("true" if value is True else "false" if value is False else "void" if value is None else str(value))
+    return "".join(pieces)
+
+def print_values(*values):
+    sys.stdout.write(" ".join(map(format_value, values)) + "\n")
+
+# Functions every program can call, with their number of arguments, or None for any number
+BUILTINS: dict[str, tuple[Callable, int | None]] = {
+    "print": (print_values, None),
+    "len": (len, 1),
+}
+DEFAULTS: dict[types_.BasicType, Any] = { # Value of a variable declared without one
+    types_.BasicType.INT: 0,
+    types_.BasicType.FLOAT: 0.0,
+    types_.BasicType.STR: "",
+    types_.BasicType.CHAR: "\0",
+    types_.BasicType.BOOL: False,
+    types_.BasicType.VOID: None,
+}
+ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "0": "\0"} # Other escaped characters stand for themselves, like \" and \\
+
+def unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+    out = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\" and i + 1 < len(text):
+            i += 1
+            char = ESCAPES.get(text[i], text[i])
+        out.append(char)
+        i += 1
+    return "".join(out)
+
+def arity_message(name: str, arity: int, count: int) -> str:
+    return f"{name} takes {arity} argument{'s' if arity != 1 else ''}, got {count}"
+
+def call_value(node: n.Node, target, arguments: list):
+    "Calls a value that is not known when compiling: a function, a builtin, or an array or string, which is indexed"
+    if type(target) is Function:
+        if len(arguments) != target.arity:
+            raise node_error(node, arity_message(target.name, target.arity, len(arguments)))
+        return target(*arguments)
+    elif type(target) is list or type(target) is str:
+        if len(arguments) != 1 or type(arguments[0]) is not int:
+            raise node_error(node, f"Expected one int index for {type_name(target)}")
+        index = arguments[0]
+        if not 0 <= index < len(target):
+            raise node_error(node, f"Index {index} out of range for length {len(target)}")
+        return target[index]
+    elif callable(target):
+        try:
+            return target(*arguments)
+        except TypeError:
+            raise node_error(node, "Wrong arguments for builtin function") from None
+    raise node_error(node, f"Cannot call {type_name(target)}")
+
+class Compiler:
+    """
+    Compiles a tree into nested Python closures that run it, one per node, so each node's work is decided once
+    instead of every time it runs. An expression compiles to a function of the frame that returns its value, and a
+    statement to one that returns None, BREAK, CONTINUE or RETURN to the statements around it, so control flow
+    never raises exceptions. Variables are resolved to slots of their function's frame while compiling.
+    Errors, like undefined names, are collected in errors, and the program cannot run if there are any
+    """
+    def __init__(self):
+        self.errors: list[Error] = []
+        self.functions: dict[str, Function] = {}
+        self.function: Function | None = None # The function being compiled
+        self.scopes: list[dict[str, int]] = [] # The variables of each enclosing block, with their slots
+
+    def compile(self, tree: n.BlockNode | None) -> dict[str, Function]:
+        "Compiles every function of a program. Each can call the ones declared after it"
+        declarations = tree.nodes if tree is not None else []
+        for node in declarations:
+            if node.name in self.functions:
+                self.error(node, f"Function {node.name} is already declared")
+                continue
+            self.functions[node.name] = Function(node.name, len(node.args), node)
+        for function in self.functions.values():
+            self.function = function
+            self.scopes = [{}]
+            for name in function.node.args:
+                self.declare(name)
+            try:
+                function.body = self.statement(function.node.body)[0]
+            except RecursionError:
+                self.error(function.node, f"Function {function.name} is nested too deeply to compile")
+        self.function = None
+        main = self.functions.get("main")
+        if main is None:
+            self.errors.append(Error("No main function", Position(0, 0, 0), Position(0, 0, 0)))
+        elif main.arity > 1:
+            self.error(main.node, "main takes no arguments, or one [str] for the command line arguments")
+        return self.functions
+
+    def error(self, node: n.Node, message: str):
+        self.errors.append(Error(message, node.pos_start, node.pos_end))
+    def declare(self, name: str) -> int:
+        slot = self.function.size
+        self.function.size += 1
+        self.scopes[-1][name] = slot
+        return slot
+    def lookup(self, name: str) -> int | None:
+        "Returns the slot of the innermost variable called name, or None if there is none"
+        for scope in reversed(self.scopes):
+            slot = scope.get(name)
+            if slot is not None:
+                return slot
+        return None
+    def slot(self, node: n.Node) -> int | None:
+        "Returns the slot of node if it reads a variable"
+        return self.lookup(node.var_name) if type(node) is n.VarNode else None
+    def literal(self, node: n.Node) -> tuple | None:
+        "Returns (value,) if node is a literal"
+        cls = type(node)
+        if cls is n.IntNode or cls is n.FloatNode or cls is n.BoolNode or cls is n.CharNode:
+            return (node.value,)
+        elif cls is n.StringNode:
+            return (unescape(node.value),)
+        return None
+
+    def expression(self, node: n.Node) -> Code:
+        return EXPRESSIONS[type(node)](self, node)
+    def statement(self, node: n.Node) -> tuple[Code, int]:
+        "Returns the compiled statement and the mask of the results other than None it can return"
+        return STATEMENTS[type(node)](self, node)
+
+    # EXPRESSIONS
+    def expression_Node(self, node: n.Node) -> Code:
+        self.error(node, "Expected an expression")
+        return constant(None)
+    def expression_Int(self, node: n.IntNode) -> Code:
+        return constant(node.value)
+    expression_Float = expression_Bool = expression_Char = expression_Int
+    def expression_String(self, node: n.StringNode) -> Code:
+        return constant(unescape(node.value))
+    def expression_Array(self, node: n.ArrayNode) -> Code:
+        elements = [self.expression(element) for element in node.elements]
+        def run(frame):
+            return [element(frame) for element in elements]
+        return run
+    def expression_Var(self, node: n.VarNode) -> Code:
+        slot = self.lookup(node.var_name)
+        if slot is not None:
+            def run(frame):
+                return frame[slot]
+            return run
+        elif node.var_name in self.functions:
+            return constant(self.functions[node.var_name])
+        elif node.var_name in BUILTINS:
+            return constant(BUILTINS[node.var_name][0])
+        self.error(node, f"Undefined name: {node.var_name}")
+        return constant(None)
+    def expression_VarAssign(self, node: n.VarAssignNode) -> Code:
+        value = self.expression(node.value)
+        slot = self.assigned_slot(node)
+        def run(frame):
+            frame[slot] = result = value(frame)
+            return result
+        return run
+    def assigned_slot(self, node: n.VarAssignNode) -> int:
+        slot = self.lookup(node.var_name)
+        if slot is None:
+            if node.var_name in self.functions or node.var_name in BUILTINS:
+                self.error(node, f"Cannot assign to function {node.var_name}")
+            else:
+                self.error(node, f"Undefined variable: {node.var_name}")
+            return 0
+        return slot
+
+    def expression_BinaryOp(self, node: n.BinaryOpNode) -> Code:
+        # A left-leaning chain like a + b + c + ... is compiled from its innermost operation out rather than
+        # recursively, so long chains do not take a Python frame per operator
+        chain = [node]
+        while type(chain[-1].left) is n.BinaryOpNode:
+            chain.append(chain[-1].left)
+        code = self.binary(chain.pop(), None)
+        while chain:
+            code = self.binary(chain.pop(), code)
+        return code
+    def binary(self, node: n.BinaryOpNode, left: Code | None) -> Code:
+        "Compiles node with left as its compiled left operand, or compiles that too if left is None"
+        operator_ = node.operator
+        if left is None:
+            left_literal = self.literal(node.left)
+            left_slot = self.slot(node.left)
+        else:
+            left_literal = left_slot = None
+        if operator_ is Operator.LOGIC_AND or operator_ is Operator.LOGIC_OR:
+            left = left or self.expression(node.left)
+            right = self.expression(node.right)
+            if operator_ is Operator.LOGIC_AND:
+                def run(frame):
+                    return True if left(frame) and right(frame) else False
+            else:
+                def run(frame):
+                    return True if left(frame) or right(frame) else False
+            return run
+        function = BINARY[operator_]
+        right_literal = self.literal(node.right)
+        if left_literal is not None and right_literal is not None:
+            folded = fold(function, (left_literal[0], right_literal[0]))
+            if folded is not None:
+                return constant(folded[0])
+        # Operands that are variables or literals are read in place rather than through their own closures
+        right_slot = self.slot(node.right)
+        if left_slot is not None and right_slot is not None:
+            def run(frame):
+                a = frame[left_slot]
+                b = frame[right_slot]
+                try:
+                    return function(a, b)
+                except OPERAND_ERRORS as error:
+                    raise operand_error(node, operator_, (a, b), error) from None
+        elif left_slot is not None and right_literal is not None:
+            b = right_literal[0]
+            def run(frame):
+                a = frame[left_slot]
+                try:
+                    return function(a, b)
+                except OPERAND_ERRORS as error:
+                    raise operand_error(node, operator_, (a, b), error) from None
+        elif right_literal is not None:
+            left = left or self.expression(node.left)
+            b = right_literal[0]
+            def run(frame):
+                a = left(frame)
+                try:
+                    return function(a, b)
+                except OPERAND_ERRORS as error:
+                    raise operand_error(node, operator_, (a, b), error) from None
+        else:
+            left = left or self.expression(node.left)
+            right = self.expression(node.right)
+            def run(frame):
+                a = left(frame)
+                b = right(frame)
+                try:
+                    return function(a, b)
+                except OPERAND_ERRORS as error:
+                    raise operand_error(node, operator_, (a, b), error) from None
+        return run
+    def expression_UnaryOp(self, node: n.UnaryOpNode) -> Code:
+        function = UNARY[node.operator]
+        literal = self.literal(node.value)
+        if literal is not None:
+            folded = fold(function, (literal[0],))
+            if folded is not None:
+                return constant(folded[0])
+        value = self.expression(node.value)
+        operator_ = node.operator
+        def run(frame):
+            a = value(frame)
+            try:
+                return function(a)
+            except OPERAND_ERRORS as error:
+                raise operand_error(node, operator_, (a,), error) from None
+        return run
+
+    def expression_Call(self, node: n.CallNode) -> Code:
+        arguments = [self.expression(argument) for argument in node.arguments]
+        callee = node.node
+        if type(callee) is n.VarNode and self.lookup(callee.var_name) is None:
+            function = self.functions.get(callee.var_name)
+            if function is not None:
+                if len(arguments) != function.arity:
+                    self.error(node, arity_message(function.name, function.arity, len(arguments)))
+                    return constant(None)
+                return self.call(node, function, arguments)
+            builtin = BUILTINS.get(callee.var_name)
+            if builtin is not None:
+                builtin_function, arity = builtin
+                if arity is not None and len(arguments) != arity:
+                    self.error(node, arity_message(callee.var_name, arity, len(arguments)))
+                    return constant(None)
+                def run(frame):
+                    values = [argument(frame) for argument in arguments]
+                    try:
+                        return builtin_function(*values)
+                    except TypeError:
+                        raise node_error(node, f"Cannot apply {callee.var_name} to {', '.join(type_name(value) for value in values)}") from None
+                return run
+        target = self.expression(callee)
+        if len(arguments) == 1:
+            # Usually an array or string being indexed
+            (argument,) = arguments
+            def run(frame):
+                value = target(frame)
+                index = argument(frame)
+                if type(index) is int and index >= 0 and (type(value) is list or type(value) is str):
+                    try:
+                        return value[index]
+                    except IndexError:
+                        pass
+                return call_value(node, value, [index])
+            return run
+        def run(frame):
+            return call_value(node, target(frame), [argument(frame) for argument in arguments])
+        return run
+    def call(self, node: n.CallNode, function: Function, arguments: list[Code]) -> Code:
+        "Compiles a call to a function declared in the program. Calls with up to two arguments fill the frame directly"
+        if len(arguments) == 0:
+            def run(frame):
+                callee_frame = [None] * function.size
+                try:
+                    function.body(callee_frame)
+                except RecursionError:
+                    raise node_error(node, "Too many nested calls") from None
+                return callee_frame[0]
+        elif len(arguments) == 1:
+            (first,) = arguments
+            def run(frame):
+                callee_frame = [None] * function.size
+                callee_frame[1] = first(frame)
+                try:
+                    function.body(callee_frame)
+                except RecursionError:
+                    raise node_error(node, "Too many nested calls") from None
+                return callee_frame[0]
+        elif len(arguments) == 2:
+            first, second = arguments
+            def run(frame):
+                callee_frame = [None] * function.size
+                callee_frame[1] = first(frame)
+                callee_frame[2] = second(frame)
+                try:
+                    function.body(callee_frame)
+                except RecursionError:
+                    raise node_error(node, "Too many nested calls") from None
+                return callee_frame[0]
+        else:
+            end = len(arguments) + 1
+            def run(frame):
+                callee_frame = [None] * function.size
+                callee_frame[1:end] = [argument(frame) for argument in arguments]
+                try:
+                    function.body(callee_frame)
+                except RecursionError:
+                    raise node_error(node, "Too many nested calls") from None
+                return callee_frame[0]
+        return run
+
+    # STATEMENTS
+    def statement_Node(self, node: n.Node) -> tuple[Code, int]:
+        "An expression used as a statement. Its value is dropped"
+        value = self.expression(node)
+        def run(frame):
+            value(frame)
+        return (run, 0)
+    def statement_VarAssign(self, node: n.VarAssignNode) -> tuple[Code, int]:
+        value = self.expression(node.value)
+        slot = self.assigned_slot(node)
+        def run(frame):
+            frame[slot] = value(frame)
+        return (run, 0)
+    def statement_VarDeclare(self, node: n.VarDeclareNode) -> tuple[Code, int]:
+        # The value is compiled first, so it reads any variable of the same name from an enclosing block
+        value = self.expression(node.value) if node.value is not None else None
+        slot = self.declare(node.var_name)
+        if value is None:
+            default = [] if isinstance(node.var_type.value, types_.ArrayType) else DEFAULTS[node.var_type.value]
+            if type(default) is list:
+                def run(frame):
+                    frame[slot] = []
+            else:
+                def run(frame):
+                    frame[slot] = default
+        else:
+            def run(frame):
+                frame[slot] = value(frame)
+        return (run, 0)
+    def statement_Block(self, node: n.BlockNode) -> tuple[Code, int]:
+        self.scopes.append({})
+        compiled = [self.statement(statement) for statement in node.nodes]
+        self.scopes.pop()
+        if len(compiled) == 1:
+            return compiled[0]
+        statements = tuple(code for code, _ in compiled)
+        mask = 0
+        for _, statement_mask in compiled:
+            mask |= statement_mask
+        if not statements:
+            def run(frame):
+                return None
+        elif not mask:
+            def run(frame):
+                for statement in statements:
+                    statement(frame)
+        else:
+            def run(frame):
+                for statement in statements:
+                    status = statement(frame)
+                    if status:
+                        return status
+        return (run, mask)
+    def statement_Return(self, node: n.ReturnNode) -> tuple[Code, int]:
+        if node.value is None:
+            def run(frame):
+                return RETURN
+        else:
+            value = self.expression(node.value)
+            def run(frame):
+                frame[0] = value(frame)
+                return RETURN
+        return (run, RETURN)
+    def statement_Break(self, node: n.BreakNode) -> tuple[Code, int]:
+        return (constant(BREAK), BREAK)
+    def statement_Continue(self, node: n.ContinueNode) -> tuple[Code, int]:
+        return (constant(CONTINUE), CONTINUE)
+
+    def statement_If(self, node: n.IfNode) -> tuple[Code, int]:
+        cases = [(node.condition, node.success)] + [(case.condition, case.success) for case in node.alternate_cases]
+        compiled = [(self.expression(condition), self.statement(success)) for condition, success in cases]
+        failure, mask = self.statement(node.failure) if node.failure is not None else (None, 0)
+        for _, (_, case_mask) in compiled:
+            mask |= case_mask
+        if len(compiled) == 1:
+            condition, (success, _) = compiled[0]
+            if failure is None:
+                def run(frame):
+                    if condition(frame):
+                        return success(frame)
+            else:
+                def run(frame):
+                    if condition(frame):
+                        return success(frame)
+                    return failure(frame)
+        else:
+            branches = tuple((condition, success) for condition, (success, _) in compiled)
+            def run(frame):
+                for condition, success in branches:
+                    if condition(frame):
+                        return success(frame)
+                if failure is not None:
+                    return failure(frame)
+        return (run, mask)
+    def statement_While(self, node: n.WhileNode) -> tuple[Code, int]:
+        condition = self.expression(node.cond)
+        body, mask = self.statement(node.block)
+        if not mask:
+            def run(frame):
+                while condition(frame):
+                    body(frame)
+        else:
+            def run(frame):
+                while condition(frame):
+                    status = body(frame)
+                    if status:
+                        if status == BREAK:
+                            return None
+                        if status == RETURN:
+                            return RETURN
+        return (run, mask & RETURN)
+    def statement_For(self, node: n.ForNode) -> tuple[Code, int]:
+        self.scopes.append({}) # For variables declared by the initial statement
+        initial = self.statement(node.init)[0] if node.init is not None else nothing
+        condition = self.expression(node.cond) if node.cond is not None else constant(True)
+        iteration = self.statement(node.iter)[0] if node.iter is not None else nothing
+        body, mask = self.statement(node.block)
+        self.scopes.pop()
+        if not mask:
+            def run(frame):
+                initial(frame)
+                while condition(frame):
+                    body(frame)
+                    iteration(frame)
+        else:
+            def run(frame):
+                initial(frame)
+                while condition(frame):
+                    status = body(frame)
+                    if status:
+                        if status == BREAK:
+                            return None
+                        if status == RETURN:
+                            return RETURN
+                    iteration(frame)
+        return (run, mask & RETURN)
+    def statement_ForEach(self, node: n.ForEachNode) -> tuple[Code, int]:
+        container = self.expression(node.container)
+        self.scopes.append({})
+        slot = self.declare(node.var_name)
+        body, mask = self.statement(node.block)
+        self.scopes.pop()
+        def run(frame):
+            values = container(frame)
+            if type(values) is not list and type(values) is not str:
+                raise node_error(node.container, f"Cannot iterate over {type_name(values)}")
+            for value in values:
+                frame[slot] = value
+                status = body(frame)
+                if status:
+                    if status == BREAK:
+                        return None
+                    if status == RETURN:
+                        return RETURN
+        return (run, mask & RETURN)
+
+EXPRESSIONS = dispatch_table(Compiler, "expression_")
+STATEMENTS = dispatch_table(Compiler, "statement_")
+
+def constant(value) -> Code:
+    def run(frame):
+        return value
+    return run
+def nothing(frame):
+    return None
+
+class Program:
+    "A compiled program. errors lists what was found compiling it, and it can only run without any"
+    def __init__(self, tree: n.BlockNode | None):
+        compiler = Compiler()
+        with recursion_limit():
+            self.functions = compiler.compile(tree)
+        self.errors = compiler.errors
+
+    def run(self, arguments: list[str] | None = None):
+        """
+        Calls main, with the command line arguments if it takes one, and returns what it returned. Raises RunError
+        if the program fails
+        """
+        main = self.functions["main"]
+        with recursion_limit():
+            return main(list(arguments or [])) if main.arity else main()
@@ -0,0 +1,84 @@
+from typing import Iterator
+import nodes as n
+from tokens import TokenType
+from parser import Parser
+from visitor import NAMES
+
+ENTER = "enter"
+EXIT = "exit"
+LEAF = "leaf"
+
+# The child fields of each node class, in source order. Classes without any are leaves
+CHILDREN: dict[type[n.Node], tuple[str, ...]] = {cls: cls.child_fields for cls in n.Node.__subclasses__()}
+# The field given as the value of a node's events: a literal, a name or an operator
+VALUES: dict[type[n.Node], str] = {
+    n.IntNode: "value",
+    n.FloatNode: "value",
+    n.StringNode: "value",
+    n.CharNode: "value",
+    n.BoolNode: "value",
+    n.BinaryOpNode: "operator",
+    n.UnaryOpNode: "operator",
+    n.VarNode: "var_name",
+    n.VarAssignNode: "var_name",
+    n.VarDeclareNode: "var_name",
+    n.FuncDeclNode: "name",
+    n.ForEachNode: "var_name",
+}
+
+class Event:
+    """
+    One step of a walk over a tree: entering or leaving a node that has child fields, or a leaf. name is the node's
+    class without the Node suffix, like FuncDecl, and value is its field listed in VALUES, or None
+    """
+    __slots__ = ("kind", "name", "start", "end", "value")
+    def __init__(self, kind: str, name: str, start: int, end: int | None, value):
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.end = end
+        self.value = value
+    def __repr__(self):
+        return f"{self.kind} {self.name} {self.start}-{self.end}" + ("" if self.value is None else f" {self.value}")
+
+def iter_events(parser_: Parser, recover: bool = True) -> Iterator[Event]:
+    """
+    Parses a program and yields the events of its tree, a function at a time: each function is parsed, walked and
+    dropped before the next is parsed. With a StreamParser, memory use depends on the largest function rather than
+    on the size of the source. The events are those of walk over the tree parse_all would return, except that the
+    program's enter event has no end, which is only known at EOF.
+    With recover, syntax errors are skipped and collected in parser_.errors, like parse_all. Otherwise the first
+    one is raised as a ParseError, after the events of the functions before it
+    """
+    parser_.recover = recover
+    if parser_.current_token.token_type == TokenType.EOF:
+        return
+    start = parser_.current_token.start
+    yield Event(ENTER, "Block", start, None, None)
+    for node in parser_.iter_top_level():
+        yield from walk(node)
+    yield Event(EXIT, "Block", start, parser_.current_token.end, None)
+
+def walk(node: n.Node) -> Iterator[Event]:
+    "Yields the events of a tree in source order. Missing children are skipped"
+    stack: list = [node]
+    while stack:
+        node = stack.pop()
+        if type(node) is Event: # The exit of a node whose children are done
+            yield node
+            continue
+        cls = type(node)
+        fields = CHILDREN[cls]
+        value_field = VALUES.get(cls)
+        value = getattr(node, value_field) if value_field else None
+        if not fields:
+            yield Event(LEAF, NAMES[cls], node.start, node.end, value)
+            continue
+        yield Event(ENTER, NAMES[cls], node.start, node.end, value)
+        stack.append(Event(EXIT, NAMES[cls], node.start, node.end, value))
+        for field in reversed(fields):
+            child = getattr(node, field)
+            if type(child) is list:
+                stack.extend(reversed(child))
+            elif child is not None:
+                stack.append(child)
@@ -0,0 +1,112 @@
+import re
+from sys import intern
+from typing import Iterator
+from tokens import Token, TokenType
+from pos import LineIndex
+from error import Error
+from lexer import Lexer, number_error
+from constants import KEYWORDS, TYPES
+
+class FastLexer:
+    """
+    Table-driven lexer. Matches whole tokens with a single compiled pattern instead of advancing one
+    character at a time, and produces the same tokens and errors as lexer.Lexer
+    """
+    token_pattern = re.compile(r"""
+        (?P<SPACE>[ \t\n]+)
+      | (?P<WORD>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<OPERATOR>==|&&|\|\||>=|<=|->|[-+*()=^&|!~><:;{},\[\]])
+      | (?P<NUMBER>[0-9]+(?:\.[0-9]*)?|\.[0-9]*)
+      | (?P<STRING>"[^"\\\x1a]*(?:\\[^\x1a][^"\\\x1a]*)*")
+      | (?P<CHAR>'.')
+      | (?P<COMMENT>//[^\n\x1a]*)
+      | (?P<MULTILINE_COMMENT>/\*(?:[^*\x1a]+|\*(?!/))*(?:\*/)?)
+      | (?P<SLASH>/)
+      | (?P<EOF>\x1a)
+      | (?P<UNTERMINATED_STRING>"[^\x1a]*)
+      | (?P<UNTERMINATED_CHAR>'.?)
+      | (?P<UNEXPECTED>.)
+    """, re.VERBOSE | re.DOTALL)
+    word_table: dict[str, TokenType] = {
+        **{type_name: TokenType.TYPE for type_name in TYPES},
+        **{keyword: TokenType.KEYWORD for keyword in KEYWORDS.values()},
+    }
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lines = LineIndex(text)
+        self.tokens: list[Token] = []
+        self.errors: list[Error] = []
+
+    @property
+    def error(self) -> Error | None:
+        return self.errors[0] if self.errors else None
+
+    def lex_text(self) -> tuple[list[Token], Error | None]:
+        self.tokens.extend(self.iter_tokens())
+        if self.error:
+            return ([], self.error)
+        return (self.tokens, None)
+
+    def lex_all(self) -> tuple[list[Token], list[Error]]:
+        "Lexes the whole text, skipping over invalid input so that every error is reported"
+        self.tokens.extend(self.iter_tokens(recover=True))
+        return (self.tokens, self.errors)
+
+    def iter_tokens(self, recover: bool = False, start: int = 0) -> Iterator[Token]:
+        """
+        Yields tokens one at a time, ending with the EOF token. Errors are added to self.errors. Stops at
+        the first error, unless recover is set, in which case the invalid input is skipped. Lexing begins
+        at offset start, which must be the start of a token or of whitespace between tokens
+        """
+        text = self.text
+        lines = self.lines
+        token_table = Lexer.token_table
+        word_table = self.word_table
+        for match in self.token_pattern.finditer(text, start):
+            kind = match.lastgroup
+            if kind == "SPACE":
+                continue
+            start, end = match.span()
+            if kind == "WORD":
+                value = intern(match.group()) # Every occurrence of a name shares one string
+                yield Token(word_table.get(value, TokenType.IDENTIFIER), value, start, end, lines)
+            elif kind == "OPERATOR":
+                yield Token(token_table[match.group()], None, start, end, lines)
+            elif kind == "NUMBER":
+                value = match.group()
+                if value == ".":
+                    value = "0.0"
+                token_type = TokenType.FLOAT if "." in value else TokenType.INT
+                error = number_error(value, token_type)
+                if error is not None:
+                    self.errors.append(Error(error, lines.position(start), lines.position(end)))
+                    if not recover:
+                        return
+                    continue
+                yield Token(token_type, value, start, end, lines)
+            elif kind == "STRING":
+                # The end of a string token is its closing quote
+                yield Token(TokenType.STR, text[start + 1:end - 1], start, end - 1, lines)
+            elif kind == "CHAR":
+                yield Token(TokenType.CHAR, text[start + 1], start, end, lines)
+            elif kind == "COMMENT" or kind == "MULTILINE_COMMENT":
+                continue
+            elif kind == "SLASH":
+                yield Token(TokenType.SLASH, None, start, end, lines)
+            elif kind == "EOF":
+                yield Token(TokenType.EOF, None, start, end, lines)
+                return
+            else:
+                # Each error pattern consumes the same input the classic lexer skips over
+                if kind == "UNTERMINATED_STRING":
+                    error = Error("Unterminated string literal, expected '\"'", lines.position(start), lines.position(end))
+                elif kind == "UNTERMINATED_CHAR":
+                    error = Error(f"Expected \"'\"", lines.position(start), lines.position(start + 2) + 1)
+                else:
+                    pos_start = lines.position(start)
+                    error = Error(f"Unexpected character: {match.group()!r}", pos_start, pos_start + 1)
+                self.errors.append(error)
+                if not recover:
+                    return
+        yield Token(TokenType.EOF, None, len(text), len(text) + 1, lines)
@@ -0,0 +1,126 @@
+from bisect import bisect_left
+import nodes as n
+from tokens import Token, TokenType
+from fastlexer import FastLexer
+from parser import Parser
+from error import Error
+from constants import KEYWORDS
+from pos import LineIndex
+from visitor import preorder
+
+class Edit:
+    "A change to a source text: removed characters at offset are replaced with inserted"
+    __slots__ = ("offset", "removed", "inserted")
+    def __init__(self, offset: int, removed: int, inserted: str):
+        self.offset = offset
+        self.removed = removed
+        self.inserted = inserted
+    @property
+    def delta(self) -> int:
+        "How far the text after the edit moves"
+        return len(self.inserted) - self.removed
+    def apply(self, text: str) -> str:
+        return text[:self.offset] + self.inserted + text[self.offset + self.removed:]
+    def __repr__(self):
+        return f"[EDIT {self.offset}+{self.removed} {self.inserted!r}]"
+
+class ParseState:
+    """
+    A source text with its tree and errors, parsed in error recovery mode. Every token, node and error
+    position of the text refers to lines, which reparse updates in place
+    """
+    def __init__(self, text: str, tree: n.BlockNode | None, lexer_errors: list[Error], parser_errors: list[Error], lines: LineIndex):
+        self.text = text
+        self.tree = tree
+        self.lexer_errors = lexer_errors
+        self.parser_errors = parser_errors
+        self.lines = lines
+    @classmethod
+    def parse(cls, text: str, parser_class: type[Parser] = Parser) -> "ParseState":
+        "Lexes and parses the whole text"
+        lexer_ = FastLexer(text)
+        tokens, lexer_errors = lexer_.lex_all()
+        tree, parser_errors = parser_class(tokens).parse_all()
+        return cls(text, tree, lexer_errors, parser_errors, lexer_.lines)
+
+def reparse(state: ParseState, edit: Edit, parser_class: type[Parser] = Parser) -> ParseState:
+    """
+    Returns the state of the edited text, lexing and parsing only the functions the edit can affect: from the
+    last function that starts before the edit, up to the first function after it whose 'func' token the new
+    tokens line up with again. The other FuncDeclNodes are reused, and the ones after the edit are moved.
+    The result is the same as parsing the new text from scratch. The old state is updated in place, so it
+    must not be used afterwards
+    """
+    if not (0 <= edit.offset and edit.removed >= 0 and edit.offset + edit.removed <= len(state.text)):
+        raise ValueError(f"Edit out of range: {edit}")
+    functions = state.tree.nodes if state.tree else []
+    starts = [function.start for function in functions]
+    # Functions whose 'func' token and the character after it are before the edit
+    before = bisect_left(starts, edit.offset - len(KEYWORDS["declare_func"]))
+    region_start = starts[before - 1] if before else 0
+    resume = bisect_left(starts, edit.offset + edit.removed) # First function the edit leaves intact
+    delta = edit.delta
+    lines = state.lines
+    moved = lines.replace(edit.offset, edit.removed, edit.inserted)
+    text = lines.text
+
+    lexer_ = FastLexer(text)
+    lexer_.lines = lines
+    source = lexer_.iter_tokens(recover=True, start=region_start)
+    tokens: list[Token] = []
+    while True:
+        # Lex until a token lines up with the 'func' of an old function, or to EOF
+        for token in source:
+            tokens.append(token)
+            while resume < len(functions) and token.start > starts[resume] + delta:
+                resume += 1
+            if resume < len(functions) and token.start == starts[resume] + delta:
+                break
+        else:
+            resume = len(functions)
+        parser_ = parser_class(tokens)
+        parser_.recover = True
+        end = len(tokens) - 1
+        region = parser_.parse_top_level(end)
+        if parser_.index <= end or resume == len(functions):
+            break
+        # An unclosed argument list took the 'func' token as its ')', so the function after it
+        # is parsed differently and has to be included
+        resume += 1
+
+    reused = functions[resume:]
+    if delta:
+        for function in reused:
+            shift(function, delta)
+    if region_start == 0 and tokens[0].token_type == TokenType.EOF:
+        tree = None
+    else:
+        tree = n.BlockNode(
+            functions[:max(before - 1, 0)] + region.nodes + reused,
+            state.tree.start if region_start else tokens[0].start,
+            state.tree.end + delta if reused else tokens[-1].end,
+            lines,
+        )
+
+    region_end = starts[resume] if reused else len(state.text) + 1
+    def merge(old_errors: list[Error], new_errors: list[Error]) -> list[Error]:
+        "Replaces the errors of the reparsed region, and moves the ones after it"
+        merged = []
+        for error in old_errors:
+            index = error.pos_start.index
+            if index < region_start or index == region_start > 0:
+                merged.append(error)
+        merged.extend(new_errors)
+        for error in old_errors:
+            if error.pos_start.index > region_end:
+                merged.append(Error(error.value, moved.position(error.pos_start), moved.position(error.pos_end)))
+        return merged
+    return ParseState(
+        text, tree, merge(state.lexer_errors, lexer_.errors), merge(state.parser_errors, parser_.errors), lines
+    )
+
+def shift(node: n.Node, delta: int):
+    "Moves a node and everything inside it by delta characters"
+    for node in preorder(node):
+        node.start += delta
+        node.end += delta
@@ -1,10 +1,25 @@
 from tokens import Token, TokenType
 from result import LexerResult as Result
-from pos import Position
-from copy import copy
+from pos import LineIndex
+from bisect import bisect_left
+from sys import intern, get_int_max_str_digits
+from typing import Iterator
 from error import Error
 from constants import LETTERS, KEYWORDS, TYPES, NUMBERS, ALPHANUMERIC
 
+def number_error(literal: str, token_type: TokenType) -> str | None:
+    """
+    Returns why an int or float literal cannot be held by its node, or None if it can. Both lexers report such a
+    literal as an error and skip it
+    """
+    if token_type == TokenType.INT:
+        limit = get_int_max_str_digits() # int refuses to convert longer ones
+        if limit and len(literal) > limit:
+            return f"Integer literal longer than {limit} digits"
+    elif len(literal) > 300 and float(literal) == float("inf"): # Shorter literals are all below 1e300
+        return "Float literal out of range"
+    return None
+
 class Lexer:
     token_table = {
         "\x1a": TokenType.EOF,
@@ -38,38 +53,114 @@ class Lexer:
     def __init__(self, text: str):
         self.text = text
         self.current_char: str = "\0"
-        self.pos = Position(-1, 0, -1)
+        self.index = -1
+        self.lines = LineIndex(text)
         self.tokens: list[Token] = []
+        self.errors: list[Error] = []
         self.advance()
 
+    @property
+    def error(self) -> Error | None:
+        return self.errors[0] if self.errors else None
+
     def advance(self):
         "Advances to the next character then returns it. Returns EOF if there are no characters left"
-        self.pos.increment()
-        if self.pos.index >= len(self.text):
+        self.index += 1
+        if self.index >= len(self.text):
             self.current_char = "\x1a" 
         else:
-            if self.current_char == "\n":
-                self.pos.newline()
-            self.current_char = self.text[self.pos.index]
+            self.current_char = self.text[self.index]
         return self.current_char
         
     def lex_text(self) -> tuple[list[Token], Error | None]:
+        self.tokens.extend(self.iter_tokens())
+        if self.error:
+            return ([], self.error)
+        return (self.tokens, None)
+
+    def lex_all(self) -> tuple[list[Token], list[Error]]:
+        "Lexes the whole text, skipping over invalid input so that every error is reported"
+        self.tokens.extend(self.iter_tokens(recover=True))
+        return (self.tokens, self.errors)
+
+    def relex(self, offset: int, removed: int, inserted: str) -> tuple[list[Token], list[Error]]:
+        """
+        Updates the output of lex_all for an edit that replaces removed characters at offset with inserted.
+        Scanning restarts at the last token that ends before the edit, which is never inside a string, char
+        literal or comment, and stops as soon as a new token starts where an old token after the edit did.
+        The tokens and errors after that point are moved instead of lexed again
+        """
+        if not 0 <= offset <= offset + removed <= len(self.text):
+            raise ValueError(f"Edit out of range: {offset}+{removed}")
+        tokens = self.tokens
+        shift = self.lines.replace(offset, removed, inserted)
+        self.text = self.lines.text
+        if not tokens:
+            return self.lex_all()
+        first = bisect_left(tokens, offset, key=lambda token: token.end) - 1 # Last token that ends before the edit
+        restart = tokens[first].start if first >= 0 else 0
+        first = max(first, 0)
+        old = bisect_left(tokens, offset + removed, first, key=lambda token: token.start) # First token after the edit
+        delta = shift.delta
+        old_errors = self.errors
+        self.errors = []
+        new_tokens = []
+        for token in self.iter_tokens(recover=True, start=restart):
+            while old < len(tokens) and tokens[old].start + delta < token.start:
+                old += 1
+            if old < len(tokens) and tokens[old].start + delta == token.start:
+                break
+            new_tokens.append(token)
+        else:
+            old = len(tokens)
+
+        resume = tokens[old].start if old < len(tokens) else len(self.text) - delta + 1
+        self.errors = (
+            [error for error in old_errors if error.pos_start.index < restart]
+            + self.errors
+            + [
+                Error(error.value, shift.position(error.pos_start), shift.position(error.pos_end))
+                for error in old_errors if error.pos_start.index >= resume
+            ]
+        )
+        if delta:
+            for token in tokens[old:]:
+                token.start += delta
+                token.end += delta
+        tokens[first:old] = new_tokens
+        return (tokens, self.errors)
+
+    def iter_tokens(self, recover: bool = False, start: int = 0) -> Iterator[Token]:
+        """
+        Yields tokens one at a time, ending with the EOF token. Errors are added to self.errors. Stops at
+        the first error, unless recover is set, in which case the invalid input is skipped. Lexing begins
+        at offset start, which must be the start of a token or of whitespace between tokens
+        """
+        self.index = start - 1
+        self.advance()
         while True:
+            index = self.index
             gen_result = self.gen_token()
             if not gen_result.is_success():
-                return ([], gen_result.err)
+                self.errors.append(gen_result.get_error())
+                if not recover:
+                    return
+                if self.index == index:
+                    self.advance()
+                # An unterminated char literal at the end of the text can step past it
+                self.index = min(self.index, len(self.text))
+                continue
             if not gen_result.ok:
                 continue
             token = gen_result.get_success()
-            self.tokens.append(token)
+            yield token
             if token.token_type == TokenType.EOF: 
-                break
-        return (self.tokens, None) 
+                return
     
     def gen_token(self) -> Result:
         "Generates a token from the current character and advances as necessary."
         current_char = self.current_char
-        pos_start = copy(self.pos)
+        start = self.index
         if self.current_char in self.token_table:
             char = self.current_char
             token_type = self.token_table[char]
@@ -77,7 +168,7 @@ class Lexer:
             if char + self.current_char in self.token_table:
                 token_type = self.token_table[char + self.current_char]
                 self.advance()
-            return Result(Token(token_type, None, pos_start, copy(self.pos)))
+            return Result(Token(token_type, None, start, self.index, self.lines))
         elif self.current_char in NUMBERS + ".":
             return self.gen_number()
         elif self.current_char in " \n\t":
@@ -91,7 +182,7 @@ class Lexer:
             elif self.current_char == "*":
                 self.multiline_comment()
                 return Result(None)
-            return Result(Token(TokenType.SLASH, None, pos_start, copy(self.pos)))
+            return Result(Token(TokenType.SLASH, None, start, self.index, self.lines))
         elif self.current_char == '"':
             return self.gen_string()
         elif self.current_char == "'":
@@ -99,16 +190,17 @@ class Lexer:
             char = self.current_char
             self.advance()
             if self.current_char != "'":
-                return Result(None, Error(f"Expected \"'\"", pos_start, self.pos+1))
+                return Result(None, Error(f"Expected \"'\"", self.lines.position(start), self.lines.position(self.index)+1))
             self.advance()
-            return Result(Token(TokenType.CHAR, char, pos_start, copy(self.pos)))
+            return Result(Token(TokenType.CHAR, char, start, self.index, self.lines))
         elif self.current_char in LETTERS + "_":
             return self.gen_ident()
-        return Result(None, Error(f"Unexpected character: {current_char!r}", pos_start, self.pos+1))
+        pos_start = self.lines.position(start)
+        return Result(None, Error(f"Unexpected character: {current_char!r}", pos_start, pos_start+1))
     
     def gen_number(self) -> Result:
         num_str = ""
-        pos_start = copy(self.pos)
+        start = self.index
         token_type: TokenType = TokenType.INT
         contains_decimal_point = False
         while self.current_char in "0123456789.":
@@ -121,11 +213,14 @@ class Lexer:
             self.advance()
         if num_str == ".":
             num_str = "0.0"
-        return Result(Token(token_type, num_str, pos_start, copy(self.pos)))
+        error = number_error(num_str, token_type)
+        if error is not None:
+            return Result(None, Error(error, self.lines.position(start), self.lines.position(self.index)))
+        return Result(Token(token_type, num_str, start, self.index, self.lines))
     
     def gen_string(self) -> Result:
         string = ""
-        pos_start = copy(self.pos)
+        start = self.index
         escape = False
         while True:
             self.advance()
@@ -136,14 +231,16 @@ class Lexer:
             else:
                 escape = False
             if self.current_char == "\x1a":
-                return Result(None, Error("Unterminated string literal, expected '\"'", pos_start, copy(self.pos)))
+                return Result(None, Error(
+                    "Unterminated string literal, expected '\"'", self.lines.position(start), self.lines.position(self.index)
+                ))
             string += self.current_char
-        pos_end = copy(self.pos)
+        end = self.index
         self.advance()
-        return Result(Token(TokenType.STR, string, pos_start, pos_end))
+        return Result(Token(TokenType.STR, string, start, end, self.lines))
 
     def gen_ident(self) -> Result:
-        pos_start = copy(self.pos)
+        start = self.index
         text = ""
         while self.current_char in ALPHANUMERIC  +"_":
             text += self.current_char
@@ -153,14 +250,17 @@ class Lexer:
             TokenType.KEYWORD if text in KEYWORDS.values() else
             TokenType.TYPE if text in TYPES.keys() else
             TokenType.IDENTIFIER
-        ), text, pos_start, copy(self.pos)))
+        ), intern(text), start, self.index, self.lines))
 
     def comment(self):
         while self.current_char not in "\n\x1a":
             self.advance()
     def multiline_comment(self):
-        while True:
-            if self.current_char == "*" and self.advance() == "/" or self.current_char == "\x1b":
-                break
-            self.advance()
+        "Skips a comment started by '/*' until the matching '*/' or the end of the text"
         self.advance()
+        while self.current_char != "\x1a":
+            char = self.current_char
+            self.advance()
+            if char == "*" and self.current_char == "/":
+                self.advance()
+                break
@@ -2,225 +2,348 @@ import pos
 import operators
 import tokens
 import types_
+from typing import Callable, Iterator
 
-class Node:
-    def __init__(self, pos_start: pos.Position, pos_end: pos.Position):
-        self.pos_start = pos_start
-        self.pos_end = pos_end
+class Node(pos.Span):
+    """
+    Base of the tree's nodes. Every node class lists its fields in __slots__, so nodes have no __dict__. IntNode and
+    FloatNode hold the number itself rather than its text, and names are the lexer's interned strings
+    """
+    __slots__ = ("start", "end", "lines")
+    # The fields holding child nodes, lists of them or None, in source order. Every class declares its own, and
+    # leaves have none
+    child_fields: tuple[str, ...] = ()
+    def __init__(self, start: int, end: int, lines: pos.LineIndex):
+        self.start = start
+        self.end = end
+        self.lines = lines
+    def iter_children(self) -> Iterator["Node"]:
+        "Yields the node's children in source order, without the missing ones"
+        for field in self.child_fields:
+            child = getattr(self, field)
+            if type(child) is list:
+                yield from child
+            elif child is not None:
+                yield child
+    def parts(self) -> list:
+        "The pieces of the node's repr in order: text, child nodes, lists of child nodes, and None for missing children"
+        return ["(Node)"]
     def __repr__(self):
-        return "(Node)"
+        return "".join(self.iter_repr())
+    def iter_repr(self) -> Iterator[str]:
+        "Yields the text of the node's repr piece by piece"
+        # Children are expanded from an explicit stack, so deeply nested trees do not hit the recursion limit
+        stack: list = [self]
+        while stack:
+            part = stack.pop()
+            if type(part) is str:
+                yield part
+            elif isinstance(part, Node):
+                stack.extend(reversed(part.parts()))
+            elif isinstance(part, list):
+                stack.append("]")
+                for i in range(len(part) - 1, -1, -1):
+                    stack.append(part[i])
+                    if i: stack.append(", ")
+                stack.append("[")
+            else:
+                yield str(part)
     
 class IntNode(Node):
+    __slots__ = ("value",)
+    child_fields = ()
     def __init__(self, token: tokens.Token):
-        self.pos_start = token.pos_start
-        self.pos_end = token.pos_end
-        self.value = token.value
+        self.start = token.start
+        self.end = token.end
+        self.lines = token.lines
+        self.value = int(token.value)
 
-    def __repr__(self):
-        return f"(int {self.value})"
+    def parts(self) -> list:
+        return [f"(int {self.value})"]
 
 class FloatNode(Node):
+    __slots__ = ("value",)
+    child_fields = ()
     def __init__(self, token: tokens.Token):
-        self.pos_start = token.pos_start
-        self.pos_end = token.pos_end
-        self.value = token.value
+        self.start = token.start
+        self.end = token.end
+        self.lines = token.lines
+        self.value = float(token.value)
 
-    def __repr__(self):
-        return f"(float {self.value})"
+    def parts(self) -> list:
+        return [f"(float {self.value})"]
 
 class StringNode(Node):
+    __slots__ = ("value",)
+    child_fields = ()
     def __init__(self, token: tokens.Token):
-        self.pos_start = token.pos_start
-        self.pos_end = token.pos_end
+        self.start = token.start
+        self.end = token.end
+        self.lines = token.lines
         self.value = token.value
 
-    def __repr__(self):
-        return f"(str {self.value})"
+    def parts(self) -> list:
+        return [f"(str {self.value})"]
 
 class BinaryOpNode(Node):
     "Used for binary operations"
+    __slots__ = ("left", "operator", "right")
+    child_fields = ("left", "right")
     def __init__(self, left: Node, operator: operators.Operator, right: Node):
         self.left = left
         self.operator = operator
         self.right = right
-        self.pos_start = left.pos_start
-        self.pos_end = right.pos_end
+        self.start = left.start
+        self.end = right.end
+        self.lines = left.lines
     
-    def __repr__(self):
-        return f"({self.left} {self.operator.name} {self.right})"
+    def parts(self) -> list:
+        return ["(", self.left, f" {self.operator.name} ", self.right, ")"]
 
 class UnaryOpNode(Node):
     "Used for unary operations"
-    def __init__(self, operator: operators.Operator, value: Node, pos_start: pos.Position):
+    __slots__ = ("value", "operator")
+    child_fields = ("value",)
+    def __init__(self, operator: operators.Operator, value: Node, start: int):
         self.value = value
         self.operator = operator
-        self.pos_start = pos_start
-        self.pos_end = value.pos_end
+        self.start = start
+        self.end = value.end
+        self.lines = value.lines
     
-    def __repr__(self):
-        return f"({self.operator.name} {self.value})"
+    def parts(self) -> list:
+        return [f"({self.operator.name} ", self.value, ")"]
 
 class CharNode(Node):
+    __slots__ = ("value",)
+    child_fields = ()
     def __init__(self, token: tokens.Token):
-        self.pos_start = token.pos_start
-        self.pos_end = token.pos_end
+        self.start = token.start
+        self.end = token.end
+        self.lines = token.lines
         self.value = token.value
 
-    def __repr__(self):
-        return f"(char {self.value})"
+    def parts(self) -> list:
+        return [f"(char {self.value})"]
 
 class VarNode(Node):
+    __slots__ = ("var_name",)
+    child_fields = ()
     def __init__(self, token: tokens.Token):
         self.var_name = token.value
-        self.pos_start = token.pos_start
-        self.pos_end = token.pos_end
-    def __repr__(self):
-        return f"(var {self.var_name})"
+        self.start = token.start
+        self.end = token.end
+        self.lines = token.lines
+    def parts(self) -> list:
+        return [f"(var {self.var_name})"]
 
 class VarAssignNode(Node):
-    def __init__(self, var_name: str, value: Node, pos_start: pos.Position):
+    __slots__ = ("var_name", "value")
+    child_fields = ("value",)
+    def __init__(self, var_name: str, value: Node, start: int):
         self.var_name = var_name
         self.value = value
-        self.pos_start = pos_start
-        self.pos_end = value.pos_end
-    def __repr__(self):
-        return f"(set {self.var_name} = {self.value})"
+        self.start = start
+        self.end = value.end
+        self.lines = value.lines
+    def parts(self) -> list:
+        return [f"(set {self.var_name} = ", self.value, ")"]
 
 class VarDeclareNode(Node):
-    def __init__(self, var_name: str, var_type: types_.Type, value: Node | None, pos_start: pos.Position, pos_end = pos.Position):
+    __slots__ = ("var_name", "var_type", "value")
+    child_fields = ("value",)
+    def __init__(self, var_name: str, var_type: types_.Type, value: Node | None, start: int, end: int, lines: pos.LineIndex):
         self.var_name = var_name
         self.var_type = var_type
         self.value = value
-        self.pos_start = pos_start
-        self.pos_end = pos_end
-    def __repr__(self):
-        return f"[variable {self.var_name}: {self.var_type}" + (
-            f" = {self.value}]" if self.value else "]"
+        self.start = start
+        self.end = end
+        self.lines = lines
+    def parts(self) -> list:
+        return [f"[variable {self.var_name}: {self.var_type}"] + (
+            [" = ", self.value, "]"] if self.value else ["]"]
         )
 
 class BlockNode(Node):
-    def __init__(self, nodes: list[Node], pos_start: pos.Position, pos_end: pos.Position):
+    __slots__ = ("nodes",)
+    child_fields = ("nodes",)
+    def __init__(self, nodes: list[Node], start: int, end: int, lines: pos.LineIndex):
         self.nodes = nodes
-        self.pos_start = pos_start
-        self.pos_end = pos_end
-    def __repr__(self):
-        return f"(block: {self.nodes})"
+        self.start = start
+        self.end = end
+        self.lines = lines
+    def parts(self) -> list:
+        return ["(block: ", self.nodes, ")"]
 
 class FuncDeclNode(Node):
-    def __init__(self, name: str, args: dict[str, types_.Type], return_type: types_.Type, body: BlockNode, pos_start: pos.Position, pos_end: pos.Position):
+    __slots__ = ("name", "args", "return_type", "body", "parse_body")
+    child_fields = ("body",)
+    def __init__(self, name: str, args: dict[str, types_.Type], return_type: types_.Type, body: BlockNode, start: int, end: int):
         self.name = name
         self.args = args
         self.return_type = return_type
         self.body = body
-        self.pos_start = pos_start
-        self.pos_end = pos_end
-    def __repr__(self):
-        return f"(function {self.name}({self.args})) -> {self.return_type} {self.body})"
+        self.start = start
+        self.end = end
+        self.lines = body.lines
+    @classmethod
+    def unparsed(cls, name: str, args: dict[str, types_.Type], return_type: types_.Type, parse_body: Callable[[], BlockNode], start: int, end: int, lines: pos.LineIndex) -> "FuncDeclNode":
+        "A declaration whose body is made by calling parse_body the first time it is used"
+        node = cls.__new__(cls)
+        node.name = name
+        node.args = args
+        node.return_type = return_type
+        node.parse_body = parse_body
+        node.start = start
+        node.end = end
+        node.lines = lines
+        return node
+    def __getattr__(self, name: str):
+        # Only called for slots that are not set, so parsed declarations never get here. Reading parse_body raises
+        # AttributeError through this method again if the declaration was not made by unparsed
+        if name == "body":
+            body = self.parse_body()
+            del self.parse_body
+            self.body = body
+            return body
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+    def parts(self) -> list:
+        return [f"(function {self.name}({self.args})) -> {self.return_type} ", self.body, ")"]
 
 class ReturnNode(Node):
-    def __init__(self, value: Node | None, pos_start: pos.Position, pos_end: pos.Position):
+    __slots__ = ("value",)
+    child_fields = ("value",)
+    def __init__(self, value: Node | None, start: int, end: int, lines: pos.LineIndex):
         self.value = value
-        self.pos_start = pos_start
-        self.pos_end = pos_end
-    def __repr__(self):
-        return f"(return {self.value})"
+        self.start = start
+        self.end = end
+        self.lines = lines
+    def parts(self) -> list:
+        return ["(return ", self.value, ")"]
 
 class CallNode(Node):
-    def __init__(self, node: Node, arguments: list[Node], pos_end: pos.Position):
+    __slots__ = ("node", "arguments")
+    child_fields = ("node", "arguments")
+    def __init__(self, node: Node, arguments: list[Node], end: int):
         self.node = node
         self.arguments = arguments
-        self.pos_end = pos_end
-        self.pos_start = node.pos_start
-    def __repr__(self):
-        return f"(call {self.node} {self.arguments})"
+        self.end = end
+        self.start = node.start
+        self.lines = node.lines
+    def parts(self) -> list:
+        return ["(call ", self.node, " ", self.arguments, ")"]
 
 class IfNode(Node):
-    def __init__(self, condition: Node, success: Node, alternate_cases, failure: BlockNode | None, pos_start, pos_end):
+    __slots__ = ("condition", "success", "alternate_cases", "failure")
+    child_fields = ("condition", "success", "alternate_cases", "failure")
+    def __init__(self, condition: Node, success: Node, alternate_cases, failure: BlockNode | None, start: int, end: int):
         self.condition = condition
         self.success = success
         self.alternate_cases: list[IfNode] = alternate_cases
         self.failure = failure
-        self.pos_start = pos_start
-        self.pos_end = pos_end
-    def __repr__(self):
+        self.start = start
+        self.end = end
+        self.lines = condition.lines
+    def parts(self) -> list:
         return (
-            f"[if {self.condition} {self.success}"
-            + (f" alt {self.alternate_cases}" if self.alternate_cases else "")
-            + (f" else {self.failure}" if self.failure else "")
-            + "]"
+            ["[if ", self.condition, " ", self.success]
+            + ([" alt ", self.alternate_cases] if self.alternate_cases else [])
+            + ([" else ", self.failure] if self.failure else [])
+            + ["]"]
         )
     def strip(self):
         self.alternate_cases = []
         self.failure = None
 
 class WhileNode(Node):
-    def __init__(self, condition: Node, block: Node, pos_start: pos.Position):
+    __slots__ = ("cond", "block")
+    child_fields = ("cond", "block")
+    def __init__(self, condition: Node, block: Node, start: int):
         self.cond = condition
         self.block = block
-        self.pos_start = pos_start
-        self.pos_end = block.pos_end
-    def __repr__(self):
+        self.start = start
+        self.end = block.end
+        self.lines = block.lines
+    def parts(self) -> list:
         return (
-            f"[while {self.cond} {self.block}]"
+            ["[while ", self.cond, " ", self.block, "]"]
         )
 
 class ContinueNode(Node):
-    def __init__(self, pos_start: pos.Position, pos_end: pos.Position):
-        self.pos_start = pos_start
-        self.pos_end = pos_end
-    def __repr__(self):
+    __slots__ = ()
+    child_fields = ()
+    def __init__(self, start: int, end: int, lines: pos.LineIndex):
+        self.start = start
+        self.end = end
+        self.lines = lines
+    def parts(self) -> list:
         return (
-            f"[continue]"
+            ["[continue]"]
         )
 
 class BreakNode(Node):
-    def __init__(self, pos_start: pos.Position, pos_end: pos.Position):
-        self.pos_start = pos_start
-        self.pos_end = pos_end
-    def __repr__(self):
+    __slots__ = ()
+    child_fields = ()
+    def __init__(self, start: int, end: int, lines: pos.LineIndex):
+        self.start = start
+        self.end = end
+        self.lines = lines
+    def parts(self) -> list:
         return (
-            f"[break]"
+            ["[break]"]
         )
 
 class ForNode(Node):
-    def __init__(self, initial: Node | None, condition: Node | None, iteration: Node | None, block: Node, pos_start: pos.Position):
-        self.pos_start = pos_start
-        self.pos_end = block.pos_end
+    __slots__ = ("init", "cond", "iter", "block")
+    child_fields = ("init", "cond", "iter", "block")
+    def __init__(self, initial: Node | None, condition: Node | None, iteration: Node | None, block: Node, start: int):
+        self.start = start
+        self.end = block.end
+        self.lines = block.lines
         self.init = initial
         self.cond = condition
         self.iter = iteration
         self.block = block
-    def __repr__(self):
+    def parts(self) -> list:
         return (
-            f"[for [{self.init}; {self.cond}; {self.iter}] {self.block}]"
+            ["[for [", self.init, "; ", self.cond, "; ", self.iter, "] ", self.block, "]"]
         )
 
 class ArrayNode(Node): 
-    def __init__(self, elements: list[Node], pos_start: pos.Position, pos_end: pos.Position):
+    __slots__ = ("elements",)
+    child_fields = ("elements",)
+    def __init__(self, elements: list[Node], start: int, end: int, lines: pos.LineIndex):
         self.elements = elements
-        self.pos_start = pos_start
-        self.pos_end = pos_end
-    def __repr__(self):
+        self.start = start
+        self.end = end
+        self.lines = lines
+    def parts(self) -> list:
         return (
-            f"(array {self.elements})" 
+            ["(array ", self.elements, ")"]
         )
    
 class ForEachNode(Node):
-    def __init__(self, var_name: str, container: Node, block: Node, pos_start: pos.Position):
-        self.pos_start = pos_start
-        self.pos_end = block.pos_end
+    __slots__ = ("var_name", "container", "block")
+    child_fields = ("container", "block")
+    def __init__(self, var_name: str, container: Node, block: Node, start: int):
+        self.start = start
+        self.end = block.end
+        self.lines = block.lines
         self.var_name = var_name
         self.container = container
         self.block = block
-    def __repr__(self):
+    def parts(self) -> list:
         return (
-            f"[foreach [{self.var_name} in {self.container}] {self.block}]"
+            [f"[foreach [{self.var_name} in ", self.container, "] ", self.block, "]"]
         )
 
 class BoolNode(Node):
-    def __init__(self, value: bool, pos_start: pos.Position, pos_end: pos.Position):
-        self.pos_start = pos_start
-        self.pos_end = pos_end
+    __slots__ = ("value",)
+    child_fields = ()
+    def __init__(self, value: bool, start: int, end: int, lines: pos.LineIndex):
+        self.start = start
+        self.end = end
+        self.lines = lines
         self.value = value
-    def __repr__(self):
-        return f"(bool {self.value})"
+    def parts(self) -> list:
+        return [f"(bool {self.value})"]
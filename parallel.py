@@ -0,0 +1,118 @@
+import gc
+import io
+import re
+from concurrent.futures import ProcessPoolExecutor
+import nodes as n
+from tokens import TokenType
+from lexer import Lexer
+from fastlexer import FastLexer
+from parser import Parser
+from error import Error
+from pos import LineIndex
+from cache import ParseOutcome, dump_with_lines, load_with_lines
+
+# A 'func' keyword at the start of a line, where a file can usually be split
+SPLIT_POINT = re.compile(r"^[ \t]*(func)\b", re.MULTILINE)
+
+class Chunk:
+    """
+    The functions parsed from one piece of a source. A piece ends at a 'func' token, which the next piece starts
+    with, or at EOF. It is complete if it was lexed and parsed the same as it would be as part of the whole text:
+    the lexer stopped exactly at the 'func' token the piece ends at, and the parser did not take that token
+    """
+    __slots__ = ("nodes", "lexer_errors", "parser_errors", "start", "end", "complete", "at_eof", "empty")
+    def __init__(self, nodes: list[n.Node], lexer_errors: list[Error], parser_errors: list[Error], start: int, end: int, complete: bool, at_eof: bool, empty: bool):
+        self.nodes = nodes
+        self.lexer_errors = lexer_errors
+        self.parser_errors = parser_errors
+        self.start = start # Start of the first token
+        self.end = end # End of the token the piece stops at
+        self.complete = complete
+        self.at_eof = at_eof
+        self.empty = empty # The piece has no tokens before EOF
+
+def parse_chunk(text: str, lines: LineIndex, lexer_class: type[Lexer | FastLexer], parser_class: type[Parser], start: int, end: int) -> Chunk:
+    "Lexes and parses the piece of text from offset start, which must be the start of a token, to the 'func' token at end"
+    lexer_ = lexer_class(text)
+    lexer_.lines = lines
+    tokens = []
+    for token in lexer_.iter_tokens(recover=True, start=start):
+        tokens.append(token)
+        if token.start >= end:
+            break
+    boundary = tokens[-1]
+    at_eof = boundary.token_type == TokenType.EOF
+    empty = tokens[0].token_type == TokenType.EOF
+    if not at_eof and boundary.start != end:
+        # The cut is inside a string or comment. Parsing would not stop at the token after it either
+        return Chunk([], lexer_.errors, [], tokens[0].start, boundary.end, False, False, empty)
+    parser_ = parser_class(tokens)
+    parser_.recover = True
+    nodes = parser_.parse_top_level(len(tokens) - 1).nodes
+    complete = at_eof or parser_.index <= len(tokens) - 1
+    return Chunk(nodes, lexer_.errors, parser_.errors, tokens[0].start, boundary.end, complete, at_eof, empty)
+
+def split_points(text: str, chunks: int) -> list[int]:
+    "Returns offsets that cut text into about chunks pieces at 'func' keywords, starting with 0 and ending with its length"
+    points = [0]
+    for k in range(1, chunks):
+        match = SPLIT_POINT.search(text, max(len(text) * k // chunks, points[-1] + 1))
+        if match is None:
+            break
+        if match.start(1) > points[-1]:
+            points.append(match.start(1))
+    points.append(len(text))
+    return points
+
+def parse_split(text: str, lines: LineIndex, jobs: int, lexer_class: type[Lexer | FastLexer] = FastLexer, parser_class: type[Parser] = Parser, chunk_size: int = 1 << 18) -> ParseOutcome:
+    """
+    Lexes and parses text in pieces of about chunk_size characters on jobs worker processes, and joins them into one
+    tree. Pieces are cut before 'func' keywords at the start of a line. A cut that turns out to be inside a string
+    or comment, or that an unclosed argument list reads past, is undone by parsing the two pieces around it again as
+    one, so the tree and errors are always the same as those of a serial parse
+    """
+    points = split_points(text, max(1, min(jobs * 4, len(text) // chunk_size)))
+    if len(points) <= 2:
+        chunks = [parse_chunk(text, lines, lexer_class, parser_class, 0, len(text))]
+    else:
+        with ProcessPoolExecutor(jobs, initializer=start_worker, initargs=(text, lexer_class, parser_class)) as pool:
+            results = list(pool.map(parse_piece, points[:-1], points[1:]))
+        chunks = []
+        # Loading creates every node at once, so garbage collection passes would only slow it down
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            i = 0
+            while i < len(results):
+                chunk = load_with_lines(io.BytesIO(results[i]), lines)
+                end = i
+                while not chunk.complete:
+                    end += 1
+                    chunk = parse_chunk(text, lines, lexer_class, parser_class, points[i], points[end + 1])
+                chunks.append(chunk)
+                if chunk.at_eof:
+                    break
+                i = end + 1
+        finally:
+            if collecting:
+                gc.enable()
+
+    if chunks[0].empty:
+        return (None, chunks[0].lexer_errors, [])
+    tree = n.BlockNode([node for chunk in chunks for node in chunk.nodes], chunks[0].start, chunks[-1].end, lines)
+    return (
+        tree,
+        [error for chunk in chunks for error in chunk.lexer_errors],
+        [error for chunk in chunks for error in chunk.parser_errors],
+    )
+
+worker: tuple[str, LineIndex, type[Lexer | FastLexer], type[Parser]] | None = None
+def start_worker(text: str, lexer_class: type[Lexer | FastLexer], parser_class: type[Parser]):
+    global worker
+    worker = (text, LineIndex(text), lexer_class, parser_class)
+def parse_piece(start: int, end: int) -> bytes:
+    "Parses a piece in a worker process. The result is pickled without the line index, which the caller attaches"
+    text, lines, lexer_class, parser_class = worker
+    data = io.BytesIO()
+    dump_with_lines(parse_chunk(text, lines, lexer_class, parser_class, start, end), data, lines)
+    return data.getvalue()
@@ -1,19 +1,57 @@
 import nodes as n
 from tokens import Token, TokenType
 from result import ParseResult as Result
-from pos import Position
 from operators import Operator
-from typing import Callable
+from lexer import Lexer
+from fastlexer import FastLexer
 from error import Error
 from constants import KEYWORDS, TYPES
-import types_ 
+import types_
+from typing import Any, Generator, Iterator
+from types import SimpleNamespace
+
+class ParseError(Exception):
+    """
+    Raised by the parsing methods to abandon the construct being parsed. The parsing methods return nodes directly
+    and report a syntax error by raising this, so the success path allocates no Result. parse and parse_all turn
+    it back into a ParseResult or a recorded error
+    """
+    def __init__(self, error: Error):
+        super().__init__(error.value)
+        self.error = error
 
 class Parser:
+    # Precedence and operator for each binary operator token, higher binding tighter. See "Order of operations" in the README
+    binary_operators: dict[TokenType, tuple[int, Operator]] = {
+        TokenType.EQEQ: (1, Operator.EQ),
+        TokenType.NOTEQ: (1, Operator.NOT_EQ),
+        TokenType.ANDAND: (2, Operator.LOGIC_AND),
+        TokenType.PIPEPIPE: (2, Operator.LOGIC_OR),
+        TokenType.GT: (3, Operator.GT),
+        TokenType.LT: (3, Operator.LT),
+        TokenType.GE: (3, Operator.GE),
+        TokenType.LE: (3, Operator.LE),
+        TokenType.PLUS: (4, Operator.ADD),
+        TokenType.MINUS: (4, Operator.SUB),
+        TokenType.AND: (5, Operator.AND),
+        TokenType.PIPE: (5, Operator.OR),
+        TokenType.CARET: (5, Operator.XOR),
+        TokenType.ASTERISK: (6, Operator.MUL),
+        TokenType.SLASH: (6, Operator.DIV),
+    }
+    unary_operators: dict[TokenType, Operator] = {
+        TokenType.MINUS: Operator.NEG,
+        TokenType.TILDE: Operator.NOT,
+        TokenType.EXCLAMATION: Operator.LOGIC_NOT,
+    }
+    nodes: Any = n # Where the node classes are looked up. check replaces them with factories that build nothing
     def __init__(self, tokens: list[Token]):
         self.tokens = tokens
         self.index = -1
         self.current_token: Token = self.advance()
         self.loops_inside: int = 0 # Number of loops the code is currently in
+        self.recover: bool = False # Whether to resynchronize after syntax errors instead of stopping
+        self.errors: list[Error] = []
     def advance(self, amount: int = 1):
         self.index += amount
         if self.index >= len(self.tokens):
@@ -23,286 +61,314 @@ class Parser:
         return self.current_token
 
     def parse(self) -> Result:
+        res = Result()
         if len(self.tokens) == 1:
-            return Result()
-        output = self.parse_top_level()
-        if output.err:
-            return output
+            return res
+        try:
+            res.success(self.parse_top_level())
+        except ParseError as error:
+            return res.error(error.error)
         if self.index < len(self.tokens) - 1:
-            return output.error(Error("Unexpected token. Expected EOF", self.current_token.pos_start, self.current_token.pos_end))
-        return output
-    
+            return res.error(Error("Unexpected token. Expected EOF", self.current_token.pos_start, self.current_token.pos_end))
+        return res
+    def parse_all(self) -> tuple[n.BlockNode | None, list[Error]]:
+        """
+        Parses the program, skipping past syntax errors instead of stopping at the first one.
+        Returns the functions that parsed successfully and every syntax error found
+        """
+        self.recover = True
+        if self.current_token.token_type == TokenType.EOF:
+            return (None, self.errors)
+        return (self.parse_top_level(), self.errors)
+
+    def check(self) -> list[Error]:
+        "Parses the program like parse_all without building any nodes, and returns every syntax error found"
+        self.nodes = unbuilt_nodes
+        self.recover = True
+        if self.current_token.token_type != TokenType.EOF:
+            self.parse_top_level()
+        return self.errors
+
+    # ERROR RECOVERY
+    def record(self, error: Error):
+        "Records a syntax error in recovery mode, unless an inner block already recorded it"
+        if not self.errors or self.errors[-1] is not error:
+            self.errors.append(error)
+    def at_top_level_boundary(self) -> bool:
+        return self.current_token.token_type == TokenType.EOF or self.current_token.match_keyword(KEYWORDS["declare_func"])
+    def synchronize(self, top_level: bool = False):
+        """
+        Skips tokens after a syntax error. Inside a block, stops after a ';' or a braced group, or before a '}'.
+        Always stops before a 'func' keyword or EOF
+        """
+        while not self.at_top_level_boundary():
+            token_type = self.current_token.token_type
+            if top_level:
+                self.advance()
+                continue
+            if token_type == TokenType.R_BRACE:
+                return
+            self.advance()
+            if token_type == TokenType.SEMICOLON:
+                return
+            if token_type == TokenType.L_BRACE:
+                depth = 1
+                while depth and not self.at_top_level_boundary():
+                    if self.current_token.token_type == TokenType.L_BRACE:
+                        depth += 1
+                    elif self.current_token.token_type == TokenType.R_BRACE:
+                        depth -= 1
+                    self.advance()
+                return
+
     # PARSING
-    def parse_top_level(self) -> Result:
-        "Parses a list of statements outside of functions"
-        nodes = []
-        res = Result()
-        while self.current_token.token_type != TokenType.EOF:
-            statement = res.process(self.parse_top_level_statement())
-            if res.err: return res
-            nodes.append(statement.get_success())
-        return res.success(n.BlockNode(nodes, self.tokens[0].pos_start, self.tokens[-1].pos_end))
-    def parse_top_level_statement(self) -> Result:
+    # Each method returns the node it parsed, and raises ParseError on a syntax error
+    def parse_top_level(self, end: int | None = None) -> n.BlockNode:
+        "Parses a list of statements outside of functions, up to EOF or to the token at index end"
+        start = self.current_token.start
+        nodes = list(self.iter_top_level(end))
+        return self.nodes.BlockNode(nodes, start, self.current_token.end, self.current_token.lines)
+    def iter_top_level(self, end: int | None = None) -> Iterator[n.Node]:
+        "Parses the statements outside of functions one at a time, yielding each as soon as it is parsed"
+        while self.current_token.token_type != TokenType.EOF and (end is None or self.index < end):
+            try:
+                statement = self.parse_top_level_statement()
+            except ParseError as error:
+                if not self.recover: raise
+                self.record(error.error)
+                self.synchronize(top_level=True)
+                self.loops_inside = 0
+                continue
+            yield statement
+    def parse_top_level_statement(self) -> n.Node:
         "Parses a statement outside of any function"
-        res = Result()
         if self.current_token.match_keyword(KEYWORDS["declare_func"]):
             return self.parse_func_decl()
         else:
-            return res.error(Error("Unexpected token. ", self.current_token.pos_start, self.current_token.pos_end))
-    def parse_block(self) -> Result:
-        res = Result()
+            raise ParseError(Error("Unexpected token. ", self.current_token.pos_start, self.current_token.pos_end))
+    def parse_block(self) -> n.BlockNode:
         if self.current_token.token_type == TokenType.L_BRACE:
             nodes = []
-            pos_start = self.current_token.pos_start
+            start = self.current_token.start
             self.advance()
             while self.current_token.token_type != TokenType.R_BRACE:
-                statement = res.process(self.parse_statement())
-                if res.err: return res
-                if statement.ok is None:
+                try:
+                    statement = self.parse_statement()
+                except ParseError as error:
+                    if not self.recover: raise
+                    self.record(error.error)
+                    self.synchronize()
+                    if self.at_top_level_boundary():
+                        raise ParseError(Error("Expected '}'", self.current_token.pos_start, self.current_token.pos_end))
+                    continue
+                if statement is None:
                     continue
-                nodes.append(statement.get_success())
+                nodes.append(statement)
                 if self.current_token.token_type == TokenType.EOF:
-                    return res.error(Error("Expected '}'", self.current_token.pos_start, self.current_token.pos_end))
-            pos_end = self.current_token.pos_end
+                    raise ParseError(Error("Expected '}'", self.current_token.pos_start, self.current_token.pos_end))
+            end = self.current_token.end
             self.advance()
-            return res.success(n.BlockNode(nodes, pos_start, pos_end))
+            return self.nodes.BlockNode(nodes, start, end, self.current_token.lines)
         else:
-            statement = res.process(self.parse_statement())
-            if res.err: return res
-            node = statement.get_success()
-            return res.success(n.BlockNode([node], node.pos_start, node.pos_end))
-    def parse_statement(self, semicolon_required = True) -> Result:
-        res = Result()
+            token = self.current_token
+            statement = self.parse_statement()
+            if statement is None: # A lone ';'
+                return self.nodes.BlockNode([], token.start, token.end, token.lines)
+            return self.nodes.BlockNode([statement], statement.start, statement.end, statement.lines)
+    def parse_statement(self, semicolon_required = True) -> n.Node | None:
+        "Parses a statement. Returns None for an empty statement"
         if self.current_token.match_keyword(KEYWORDS["declare_var"]):
-            pos_start = self.current_token.pos_start
+            start = self.current_token.start
             self.advance()
             if self.current_token.token_type != TokenType.IDENTIFIER:
-                return res.error(Error("Expected identifier", self.current_token.pos_start, self.current_token.pos_end))
+                raise ParseError(Error("Expected identifier", self.current_token.pos_start, self.current_token.pos_end))
             variable = self.current_token.value
             self.advance()
             if self.current_token.token_type != TokenType.COLON:
-                return res.error(Error("Expected ':'", self.current_token.pos_start, self.current_token.pos_end))
+                raise ParseError(Error("Expected ':'", self.current_token.pos_start, self.current_token.pos_end))
             self.advance()
-            var_type = res.process(self.parse_type())
-            if res.err: return res
-            var_type = var_type.get_success()
+            var_type = self.parse_type()
             if self.current_token.token_type == TokenType.EQUALS:
                 self.advance()
-                value = res.process(self.parse_expression())
-                if res.err: return res
-                value = value.get_success()
+                value = self.parse_expression()
             else:
                 value = None
-            
-            if self.current_token.token_type != TokenType.SEMICOLON: 
-                return res.error(Error("Expected semicolon", self.current_token.pos_start, self.current_token.pos_end))
+
+            if self.current_token.token_type != TokenType.SEMICOLON:
+                raise ParseError(Error("Expected semicolon", self.current_token.pos_start, self.current_token.pos_end))
             self.advance()
-            return res.success(n.VarDeclareNode(variable, var_type, value, pos_start, self.current_token.pos_end)) # pyright: ignore[reportArgumentType]
+            return self.nodes.VarDeclareNode(variable, var_type, value, start, self.current_token.end, self.current_token.lines) # pyright: ignore[reportArgumentType]
         elif self.current_token.token_type == TokenType.L_BRACE:
             return self.parse_block()
         elif self.current_token.token_type == TokenType.SEMICOLON:
             self.advance()
-            return res
+            return None
         elif self.current_token.match_keyword(KEYWORDS["return_value"]):
-            pos_start = self.current_token.pos_start
+            start = self.current_token.start
             self.advance()
             if self.current_token.token_type == TokenType.SEMICOLON:
-                pos_end = self.current_token.pos_end
+                end = self.current_token.end
                 self.advance()
-                return res.success(n.ReturnNode(None, pos_start, pos_end))
-            value = res.process(self.parse_expression())
-            if res.err: return res
-            if self.current_token.token_type != TokenType.SEMICOLON: 
-                return res.error(Error("Expected semicolon", self.current_token.pos_start, self.current_token.pos_end))
+                return self.nodes.ReturnNode(None, start, end, self.current_token.lines)
+            value = self.parse_expression()
+            if self.current_token.token_type != TokenType.SEMICOLON:
+                raise ParseError(Error("Expected semicolon", self.current_token.pos_start, self.current_token.pos_end))
             self.advance()
-            return res.success(n.ReturnNode(value.get_success() , pos_start, value.get_success().pos_end))
+            return self.nodes.ReturnNode(value, start, value.end, self.current_token.lines)
         elif self.current_token.match_keyword(KEYWORDS["condition_main"]):
             return self.parse_conditional()
         elif self.current_token.match_keyword(KEYWORDS["loop_condition"]):
-            pos_start = self.current_token.pos_start
+            start = self.current_token.start
             self.advance()
-            condition = res.process(self.parse_expression())
-            if res.err: return res
+            condition = self.parse_expression()
             self.loops_inside += 1
-            block = res.process(self.parse_block())
-            self.loops_inside -= 1
-            if res.err: return res
-            return res.success(n.WhileNode(condition.get_success(), block.get_success(), pos_start))
+            try:
+                block = self.parse_block()
+            finally:
+                self.loops_inside -= 1
+            return self.nodes.WhileNode(condition, block, start)
         elif self.current_token.match_keyword(KEYWORDS["control_next"]):
             if self.loops_inside == 0:
-                return res.err(Error("Must be in loop", self.current_token.pos_start, self.current_token.pos_end))
+                raise ParseError(Error("Must be in loop", self.current_token.pos_start, self.current_token.pos_end))
             token = self.current_token
             self.advance()
-            return res.success(n.ContinueNode(token.pos_start, token.pos_end))
+            return self.nodes.ContinueNode(token.start, token.end, token.lines)
         elif self.current_token.match_keyword(KEYWORDS["control_end"]):
             if self.loops_inside == 0:
-                return res.error(Error("Must be in loop", self.current_token.pos_start, self.current_token.pos_end))
+                raise ParseError(Error("Must be in loop", self.current_token.pos_start, self.current_token.pos_end))
             token = self.current_token
             self.advance()
-            return res.success(n.BreakNode(token.pos_start, token.pos_end))
+            return self.nodes.BreakNode(token.start, token.end, token.lines)
         elif self.current_token.match_keyword(KEYWORDS["loop_threepart"]):
-            pos_start = self.current_token.pos_start
+            start = self.current_token.start
             self.advance()
             if self.current_token.token_type != TokenType.L_PAREN:
-                return res.error(Error("Expected '('", self.current_token.pos_start, self.current_token.pos_end))
+                raise ParseError(Error("Expected '('", self.current_token.pos_start, self.current_token.pos_end))
             self.advance()
 
-            initial = res.process(self.parse_statement())
-            if res.err: return res
+            initial = self.parse_statement()
 
             if self.current_token.token_type == TokenType.SEMICOLON:
-                condition = Result()
+                condition = None
             else:
-                condition = res.process(self.parse_expression())
-                if res.err: return res
-                if self.current_token.token_type != TokenType.SEMICOLON: 
-                    return res.error(Error("Expected semicolon", self.current_token.pos_start, self.current_token.pos_end))
+                condition = self.parse_expression()
+                if self.current_token.token_type != TokenType.SEMICOLON:
+                    raise ParseError(Error("Expected semicolon", self.current_token.pos_start, self.current_token.pos_end))
             self.advance()
 
             if self.current_token.token_type == TokenType.R_PAREN:
-                iteration = Result()
+                iteration = None
             else:
-                iteration = res.process(self.parse_statement(semicolon_required=False))
-            if res.err: return res
+                iteration = self.parse_statement(semicolon_required=False)
 
             if self.current_token.token_type != TokenType.R_PAREN:
-                return res.error(Error("Expected ')'", self.current_token.pos_start, self.current_token.pos_end))
+                raise ParseError(Error("Expected ')'", self.current_token.pos_start, self.current_token.pos_end))
             self.advance()
 
             self.loops_inside += 1
-            block = res.process(self.parse_block())
-            if res.err: return res
-            self.loops_inside -= 1
+            try:
+                block = self.parse_block()
+            finally:
+                self.loops_inside -= 1
 
-            return res.success(n.ForNode(initial.ok, condition.ok, iteration.ok, block.get_success(), pos_start))
+            return self.nodes.ForNode(initial, condition, iteration, block, start)
         elif self.current_token.match_keyword(KEYWORDS["loop_iter"]):
-            pos_start = self.current_token.pos_start
+            start = self.current_token.start
             self.advance()
             if self.current_token.token_type != TokenType.L_PAREN:
-                return res.error(Error("Expected '('", self.current_token.pos_start, self.current_token.pos_end))
+                raise ParseError(Error("Expected '('", self.current_token.pos_start, self.current_token.pos_end))
             self.advance()
             if self.current_token.token_type != TokenType.IDENTIFIER:
-                return res.error(Error("Expected variable name", self.current_token.pos_start, self.current_token.pos_end))
+                raise ParseError(Error("Expected variable name", self.current_token.pos_start, self.current_token.pos_end))
             var_name = self.current_token.value
             self.advance()
             if not self.current_token.match_keyword(KEYWORDS["value_in"]):
-                return res.error(Error(f"Expected '{KEYWORDS["value_in"]}'", self.current_token.pos_start, self.current_token.pos_end))
+                raise ParseError(Error(f"Expected '{KEYWORDS["value_in"]}'", self.current_token.pos_start, self.current_token.pos_end))
             self.advance()
-            container = res.process(self.parse_expression())
-            if res.err: return res
-            container = container.get_success()
+            container = self.parse_expression()
             if self.current_token.token_type != TokenType.R_PAREN:
-                return res.error(Error("Expected ')'", self.current_token.pos_start, self.current_token.pos_end))
+                raise ParseError(Error("Expected ')'", self.current_token.pos_start, self.current_token.pos_end))
             self.advance()
-            block = res.process(self.parse_block())
-            if res.err: return res
-            block = block.get_success()
-            return res.success(n.ForEachNode(var_name, container, block, pos_start))
+            block = self.parse_block()
+            return self.nodes.ForEachNode(var_name, container, block, start)
         else:
-            parse_res = res.process(self.parse_expression())
-            if res.err: return res
+            value = self.parse_expression()
             if semicolon_required:
-                if self.current_token.token_type != TokenType.SEMICOLON: 
-                    return res.error(Error("Expected semicolon", self.current_token.pos_start, self.current_token.pos_end))
+                if self.current_token.token_type != TokenType.SEMICOLON:
+                    raise ParseError(Error("Expected semicolon", self.current_token.pos_start, self.current_token.pos_end))
                 self.advance()
-            return parse_res
-    def parse_expression(self) -> Result:
-        return self.parse_equality_expr()
-    def parse_equality_expr(self) -> Result:
-        return self.parse_binary_operation(
-            self.parse_logical,
-            [TokenType.EQEQ, TokenType.NOTEQ],
-            [Operator.EQ, Operator.NOT_EQ]
-        )
-    def parse_logical(self) -> Result:
-        return self.parse_binary_operation(
-            self.parse_comparison,
-            [TokenType.ANDAND, TokenType.PIPEPIPE],
-            [Operator.LOGIC_AND, Operator.LOGIC_OR]
-        )
-    def parse_comparison(self) -> Result:
-        return self.parse_binary_operation(
-            self.parse_arithmetic,
-            [TokenType.LT, TokenType.GE, TokenType.LE],
-            [Operator.LT, Operator.GE, Operator.LE]
-        )
-    def parse_arithmetic(self) -> Result:
-        return self.parse_binary_operation(
-            self.parse_bitwise, [TokenType.PLUS, TokenType.MINUS], [Operator.ADD, Operator.SUB]
-        )
-    def parse_bitwise(self) -> Result:
-        return self.parse_binary_operation(
-            self.parse_term,
-            [TokenType.AND, TokenType.PIPE, TokenType.CARET],
-            [Operator.AND, Operator.OR, Operator.XOR]
-        )
-    def parse_term(self) -> Result:
-        return self.parse_binary_operation(
-            self.parse_factor, [TokenType.ASTERISK, TokenType.SLASH], [Operator.MUL, Operator.DIV]
-        )
-    def parse_factor(self) -> Result:
-        res = Result()  
-        
+            return value
+    def parse_expression(self) -> n.Node:
+        """
+        Parses a binary expression by precedence climbing, using binary_operators. Operands wait on a stack until
+        an operator that binds less or equally tightly arrives, so operators of the same precedence are left-associative
+        """
+        operands: list[n.Node] = [self.parse_factor()]
+        pending: list[tuple[int, Operator]] = []
+        binary_operators = self.binary_operators
+        while True:
+            operator = binary_operators.get(self.current_token.token_type)
+            if operator is None:
+                break
+            while pending and pending[-1][0] >= operator[0]:
+                right = operands.pop()
+                operands[-1] = self.nodes.BinaryOpNode(operands[-1], pending.pop()[1], right)
+            pending.append(operator)
+            self.advance()
+            operands.append(self.parse_factor())
+        while pending:
+            right = operands.pop()
+            operands[-1] = self.nodes.BinaryOpNode(operands[-1], pending.pop()[1], right)
+        return operands[0]
+    def parse_factor(self) -> n.Node:
+        "Parses an operand of a binary expression: an atom, optionally called, with an optional unary operator"
+        op_token = None
         if self.current_token.token_type in (TokenType.MINUS, TokenType.TILDE, TokenType.EXCLAMATION):
             op_token = self.current_token
             self.advance()
-            value = res.process(self.parse_func_call())
-            if res.err:
-                return res
-            return res.success(n.UnaryOpNode((
-                Operator.LOGIC_NOT if op_token.token_type == TokenType.NOTEQ else
-                Operator.NOT if op_token.token_type == TokenType.TILDE else
-                Operator.NEG
-            ), value.get_success(), self.current_token.pos_start))
-        
-        return self.parse_func_call()
-    def parse_func_call(self) -> Result:
-        res = Result()
-        value = res.process(self.parse_atom())
-        if res.err: return res
-        if self.current_token.token_type != TokenType.L_PAREN:
-            return value
+        node = self.parse_atom()
+        if self.current_token.token_type == TokenType.L_PAREN:
+            node = self.parse_func_call(node)
+        if op_token:
+            return self.nodes.UnaryOpNode(self.unary_operators[op_token.token_type], node, op_token.start)
+        return node
+    def parse_func_call(self, node: n.Node) -> n.CallNode:
+        "Parses the argument list of a call to node"
         self.advance()
         args: list[n.Node] = []
         while self.current_token.token_type != TokenType.R_PAREN:
-            arg = res.process(self.parse_expression())
-            if res.err: return res
-            args.append(arg.get_success())
+            args.append(self.parse_expression())
             if self.current_token.token_type == TokenType.COMMA:
                 self.advance()
                 continue
             break
         if self.current_token.token_type != TokenType.R_PAREN:
-            return res.error(Error("Expected ')'", self.current_token.pos_start, self.current_token.pos_end))
-        pos_end = self.current_token.pos_end
+            raise ParseError(Error("Expected ')'", self.current_token.pos_start, self.current_token.pos_end))
+        end = self.current_token.end
         self.advance()
-        return res.success(n.CallNode(value.get_success(), args, pos_end))
-    def parse_atom(self) -> Result:
-        res = Result()
-        
+        return self.nodes.CallNode(node, args, end)
+    def parse_atom(self) -> n.Node:
         if self.current_token.token_type == TokenType.INT:
-            res = res.success(n.IntNode(self.current_token))
+            node = self.nodes.IntNode(self.current_token)
             self.advance()
-            return res
+            return node
         elif self.current_token.token_type == TokenType.FLOAT:
-            res = res.success(n.FloatNode(self.current_token))
+            node = self.nodes.FloatNode(self.current_token)
             self.advance()
-            return res
+            return node
         elif self.current_token.token_type == TokenType.STR:
-            res = res.success(n.StringNode(self.current_token))
+            node = self.nodes.StringNode(self.current_token)
             self.advance()
-            return res
+            return node
         elif self.current_token.token_type == TokenType.CHAR:
-            res = res.success(n.CharNode(self.current_token))
+            node = self.nodes.CharNode(self.current_token)
             self.advance()
-            return res
+            return node
         elif self.current_token.token_type == TokenType.L_PAREN:
             self.advance()
-            expr = res.process(self.parse_expression())
-            if res.err:
-                return res
+            expr = self.parse_expression()
             if self.current_token.token_type != TokenType.R_PAREN:
-                return res.error(Error("Expected ')'", self.current_token.pos_start, self.current_token.pos_end))
+                raise ParseError(Error("Expected ')'", self.current_token.pos_start, self.current_token.pos_end))
             self.advance()
             return expr
         elif self.current_token.token_type == TokenType.IDENTIFIER:
@@ -310,146 +376,559 @@ class Parser:
             self.advance()
             if self.current_token.token_type == TokenType.EQUALS:
                 self.advance()
-                value = res.process(self.parse_expression())
-                if res.err: return res
-                return res.success(n.VarAssignNode(identifier.value, value.get_success(), identifier.pos_start))
-            return res.success(n.VarNode(identifier))
+                value = self.parse_expression()
+                return self.nodes.VarAssignNode(identifier.value, value, identifier.start)
+            return self.nodes.VarNode(identifier)
         elif self.current_token.token_type == TokenType.EOF:
-            return res.error(Error("Unexpected EOF", self.current_token.pos_start, self.current_token.pos_end))
+            raise ParseError(Error("Unexpected EOF", self.current_token.pos_start, self.current_token.pos_end))
         elif self.current_token.token_type == TokenType.L_BRACKET:
-            pos_start = self.current_token.pos_start
+            start = self.current_token.start
             self.advance()
             elements = []
             while True:
-                element = res.process(self.parse_expression())
-                if res.err: return res
-                elements.append(element.get_success())
+                elements.append(self.parse_expression())
                 if self.current_token.token_type != TokenType.COMMA:
                     break
                 self.advance()
             if self.current_token.token_type != TokenType.R_BRACKET:
-                return res.error(Error("Expected ']'", self.current_token.pos_start, self.current_token.pos_end))
-            pos_end = self.current_token.pos_end
+                raise ParseError(Error("Expected ']'", self.current_token.pos_start, self.current_token.pos_end))
+            end = self.current_token.end
             self.advance()
-            return res.success(n.ArrayNode(elements, pos_start, self.current_token.pos_end))
-        elif self.current_token.match_keyword(KEYWORDS["bool_true"]):   
+            return self.nodes.ArrayNode(elements, start, end, self.current_token.lines)
+        elif self.current_token.match_keyword(KEYWORDS["bool_true"]):
             token = self.current_token
             self.advance()
-            return res.success(n.BoolNode(True, token.pos_start, token.pos_end))
+            return self.nodes.BoolNode(True, token.start, token.end, token.lines)
         elif self.current_token.match_keyword(KEYWORDS["bool_false"]):
             token = self.current_token
             self.advance()
-            return res.success(n.BoolNode(False, token.pos_start, token.pos_end))
-
-        return res.error(Error("Unexpected token.", self.current_token.pos_start, self.current_token.pos_end))
-    ####
-    def parse_binary_operation(self, func: Callable, operator_tokentypes: list[TokenType], operators: list[Operator]) -> Result:
-        res = Result()
-        
-        left = res.process(func())
-        if res.err:
-            return res
-        if not self.current_token.token_type in operator_tokentypes: return left
+            return self.nodes.BoolNode(False, token.start, token.end, token.lines)
 
-        node: n.BinaryOpNode | None = None
-        while self.current_token.token_type in operator_tokentypes:
-            operator = operators[operator_tokentypes.index(self.current_token.token_type)]
-            self.advance()
-            right = res.process(func())
-            if res.err:
-                return res
-            if node: 
-                node = n.BinaryOpNode(node, operator, right.get_success())
-            else:
-                node = n.BinaryOpNode(left.get_success(), operator, right.get_success())
-        return res.success(node)
-    ####
-    def parse_func_decl(self) -> Result:
-        res = Result()
-        pos_start = self.current_token.pos_start
+        raise ParseError(Error("Unexpected token.", self.current_token.pos_start, self.current_token.pos_end))
+    def parse_func_decl(self) -> n.FuncDeclNode:
+        start = self.current_token.start
+        func_name, args, return_type = self.parse_signature()
+        func_body = self.parse_block()
+        return self.nodes.FuncDeclNode(func_name, args, return_type, func_body, start, func_body.end)
+    def parse_signature(self) -> tuple[str, dict[str, types_.Type], types_.Type]:
+        "Parses a function declaration up to its body: the name, the arguments and the return type"
         self.advance()
         if self.current_token.token_type == TokenType.IDENTIFIER:
             func_name = self.current_token.value
             self.advance()
         else:
-            return res.error(Error("Expected identifier.", self.current_token.pos_start, self.current_token.pos_end))
+            raise ParseError(Error("Expected identifier.", self.current_token.pos_start, self.current_token.pos_end))
         if self.current_token.token_type != TokenType.L_PAREN:
-            return res.error(Error("Expected '('.", self.current_token.pos_start, self.current_token.pos_end))
+            raise ParseError(Error("Expected '('.", self.current_token.pos_start, self.current_token.pos_end))
         self.advance()
         args: dict[str, Type] = {}
         while self.current_token.token_type != TokenType.R_PAREN:
-            if self.current_token.token_type != TokenType.IDENTIFIER: 
-                return res.error(
+            if self.current_token.token_type != TokenType.IDENTIFIER:
+                raise ParseError(
                     Error("Expected identifier or ')'.", self.current_token.pos_start, self.current_token.pos_end)
                 )
             arg_name = self.current_token.value
             self.advance()
-            if self.current_token.token_type != TokenType.COLON: 
-                return res.error(
+            if self.current_token.token_type != TokenType.COLON:
+                raise ParseError(
                     Error("Expected ':'", self.current_token.pos_start, self.current_token.pos_end)
                 )
             self.advance()
-            type_ = res.process(self.parse_type())
-            if res.err: return res
-            args[arg_name] = type_.get_success()
+            args[arg_name] = self.parse_type()
             if self.current_token.token_type != TokenType.COMMA:
                 break
             self.advance()
             del arg_name
         self.advance()
         if self.current_token.token_type != TokenType.ARROW:
-            return res.error(Error("Expected '->'.", self.current_token.pos_start, self.current_token.pos_end))
+            raise ParseError(Error("Expected '->'.", self.current_token.pos_start, self.current_token.pos_end))
         self.advance()
-        return_type = res.process(self.parse_type())
-        if res.err: return res
-        return_type = return_type.get_success()
-        func_body = res.process(self.parse_block())
-        if res.err: return res
-        func_body = func_body.get_success()
-        return res.success(n.FuncDeclNode(func_name, args, return_type, func_body, pos_start, func_body.pos_end))
-    def parse_conditional(self) -> Result:
-        res = Result()
-        pos_start = self.current_token.pos_start
+        return_type = self.parse_type()
+        return (func_name, args, return_type)
+    def parse_conditional(self) -> n.IfNode:
+        start = self.current_token.start
         self.advance()
-        condition = res.process(self.parse_expression())
-        if res.err: return res
-        block = res.process(self.parse_block())
-        if res.err: return res
-        block = block.get_success()
+        condition = self.parse_expression()
+        block = self.parse_block()
         if self.current_token.match_keyword(KEYWORDS["condition_alt"]):
-            alt = res.process(self.parse_conditional())
-            if res.err: return res
-            alt_case: n.IfNode = alt.get_success()
+            alt_case = self.parse_conditional()
             alternate_cases: list[n.IfNode] = [alt_case] + alt_case.alternate_cases
             if alt_case.failure:
                 failure = alt_case.failure
             else:
                 failure = None
             alternate_cases[0].strip()
-            return res.success(n.IfNode(condition.get_success(), block, alternate_cases, failure, pos_start, alt_case.pos_end))
+            return self.nodes.IfNode(condition, block, alternate_cases, failure, start, alt_case.end)
         elif self.current_token.match_keyword(KEYWORDS["condition_fail"]):
             self.advance()
-            else_block = res.process(self.parse_block())
-            if res.err: return res
-            else_block = else_block.get_success()
-            return res.success(n.IfNode(condition.get_success(), block, [], else_block, pos_start, else_block.pos_end))
+            else_block = self.parse_block()
+            return self.nodes.IfNode(condition, block, [], else_block, start, else_block.end)
         else:
-            return res.success(n.IfNode(condition.get_success(), block, [], None, pos_start, block.pos_end))
-    def parse_type(self) -> Result:
-        res = Result()
+            return self.nodes.IfNode(condition, block, [], None, start, block.end)
+    def parse_type(self) -> types_.Type:
         if self.current_token.token_type == TokenType.TYPE:
             type_elem = TYPES[self.current_token.value]
             self.advance()
-            return res.success(types_.Type(types_.BasicType(type_elem)))
+            return types_.Type(types_.BasicType(type_elem))
         elif self.current_token.token_type == TokenType.L_BRACKET:
-            pos_start = self.current_token.pos_start
+            start = self.current_token.start
             self.advance()
-            element_type = res.process(self.parse_type())
-            if res.err: return res
+            element_type = self.parse_type()
             if self.current_token.token_type != TokenType.R_BRACKET:
-                return res.error(Error("Expected ']'.", self.current_token.pos_start, self.current_token.pos_end))
-            pos_end = self.current_token.pos_end
+                raise ParseError(Error("Expected ']'.", self.current_token.pos_start, self.current_token.pos_end))
+            end = self.current_token.end
             self.advance()
-            return res.success(types_.Type(types_.ArrayType(element_type.get_success())))
+            return types_.Type(types_.ArrayType(element_type))
         else:
-            return res.error(Error("Expected type", self.current_token.pos_start, self.current_token.pos_end))
\ No newline at end of file
+            raise ParseError(Error("Expected type", self.current_token.pos_start, self.current_token.pos_end))
+
+class Unbuilt:
+    "Stands in for every node when checking syntax. Has the fields the parsing methods read from the nodes they build"
+    start = end = 0
+    lines = None
+    alternate_cases: list = []
+    failure = None
+    def strip(self):
+        pass
+UNBUILT = Unbuilt()
+def build_nothing(*args) -> Unbuilt:
+    return UNBUILT
+unbuilt_nodes = SimpleNamespace(**{name: build_nothing for name in dir(n) if name.endswith("Node")})
+
+# A step generator yields the step generators of the constructs nested in it, and is sent back the nodes they parsed
+Steps = Generator[Any, n.Node | None, n.Node | None]
+
+class StackParser(Parser):
+    """
+    Parser that keeps nested constructs on an explicit stack instead of the call stack, so nesting depth is
+    limited by memory rather than by the recursion limit. Produces the same trees and errors as Parser.
+    Expressions are parsed in a single loop; blocks and the statements that contain blocks are step generators
+    driven by run
+    """
+    nesting_keywords = {KEYWORDS["condition_main"], KEYWORDS["loop_condition"], KEYWORDS["loop_threepart"], KEYWORDS["loop_iter"]}
+    def run(self, steps: Steps) -> n.Node | None:
+        """
+        Drives a step generator, and every step generator it yields, to its result. A ParseError raised by a step
+        generator is thrown into the one that yielded it, the same as an exception raised through a call
+        """
+        stack: list[Steps] = [steps]
+        result = None
+        error: ParseError | None = None
+        while True:
+            try:
+                if error is None:
+                    nested = stack[-1].send(result)
+                else:
+                    raised, error = error, None
+                    nested = stack[-1].throw(raised)
+            except StopIteration as stop:
+                stack.pop()
+                if not stack:
+                    return stop.value
+                result = stop.value
+                continue
+            except ParseError as raised:
+                stack.pop()
+                if not stack:
+                    raise
+                error = raised
+                continue
+            stack.append(nested)
+            result = None
+    def starts_nested_statement(self) -> bool:
+        "Whether the current token starts a statement that contains a block"
+        token = self.current_token
+        if token.token_type == TokenType.KEYWORD:
+            return token.value in self.nesting_keywords
+        return token.token_type == TokenType.L_BRACE
+
+    def parse_block(self) -> n.BlockNode:
+        return self.run(self.block_steps())
+    def parse_statement(self, semicolon_required = True) -> n.Node | None:
+        return self.run(self.statement_steps(semicolon_required))
+    def parse_conditional(self) -> n.IfNode:
+        return self.run(self.conditional_steps())
+
+    def block_steps(self) -> Steps:
+        if self.current_token.token_type == TokenType.L_BRACE:
+            nodes = []
+            start = self.current_token.start
+            self.advance()
+            while self.current_token.token_type != TokenType.R_BRACE:
+                try:
+                    if self.current_token.token_type == TokenType.L_BRACE:
+                        statement = yield self.block_steps()
+                    elif self.starts_nested_statement():
+                        statement = yield self.statement_steps()
+                    else:
+                        statement = Parser.parse_statement(self)
+                except ParseError as error:
+                    if not self.recover: raise
+                    self.record(error.error)
+                    self.synchronize()
+                    if self.at_top_level_boundary():
+                        raise ParseError(Error("Expected '}'", self.current_token.pos_start, self.current_token.pos_end))
+                    continue
+                if statement is None:
+                    continue
+                nodes.append(statement)
+                if self.current_token.token_type == TokenType.EOF:
+                    raise ParseError(Error("Expected '}'", self.current_token.pos_start, self.current_token.pos_end))
+            end = self.current_token.end
+            self.advance()
+            return self.nodes.BlockNode(nodes, start, end, self.current_token.lines)
+        else:
+            token = self.current_token
+            if self.starts_nested_statement():
+                statement = yield self.statement_steps()
+            else:
+                statement = Parser.parse_statement(self)
+            if statement is None: # A lone ';'
+                return self.nodes.BlockNode([], token.start, token.end, token.lines)
+            return self.nodes.BlockNode([statement], statement.start, statement.end, statement.lines)
+    def statement_steps(self, semicolon_required = True) -> Steps:
+        "Parses the statements that contain blocks. Any other statement cannot nest, and is left to Parser.parse_statement"
+        if self.current_token.token_type == TokenType.L_BRACE:
+            return (yield self.block_steps())
+        elif self.current_token.match_keyword(KEYWORDS["condition_main"]):
+            return (yield self.conditional_steps())
+        elif self.current_token.match_keyword(KEYWORDS["loop_condition"]):
+            start = self.current_token.start
+            self.advance()
+            condition = self.parse_expression()
+            self.loops_inside += 1
+            try:
+                block = yield self.block_steps()
+            finally:
+                self.loops_inside -= 1
+            return self.nodes.WhileNode(condition, block, start)
+        elif self.current_token.match_keyword(KEYWORDS["loop_threepart"]):
+            start = self.current_token.start
+            self.advance()
+            if self.current_token.token_type != TokenType.L_PAREN:
+                raise ParseError(Error("Expected '('", self.current_token.pos_start, self.current_token.pos_end))
+            self.advance()
+
+            initial = yield self.statement_steps()
+
+            if self.current_token.token_type == TokenType.SEMICOLON:
+                condition = None
+            else:
+                condition = self.parse_expression()
+                if self.current_token.token_type != TokenType.SEMICOLON:
+                    raise ParseError(Error("Expected semicolon", self.current_token.pos_start, self.current_token.pos_end))
+            self.advance()
+
+            if self.current_token.token_type == TokenType.R_PAREN:
+                iteration = None
+            else:
+                iteration = yield self.statement_steps(semicolon_required=False)
+
+            if self.current_token.token_type != TokenType.R_PAREN:
+                raise ParseError(Error("Expected ')'", self.current_token.pos_start, self.current_token.pos_end))
+            self.advance()
+
+            self.loops_inside += 1
+            try:
+                block = yield self.block_steps()
+            finally:
+                self.loops_inside -= 1
+
+            return self.nodes.ForNode(initial, condition, iteration, block, start)
+        elif self.current_token.match_keyword(KEYWORDS["loop_iter"]):
+            start = self.current_token.start
+            self.advance()
+            if self.current_token.token_type != TokenType.L_PAREN:
+                raise ParseError(Error("Expected '('", self.current_token.pos_start, self.current_token.pos_end))
+            self.advance()
+            if self.current_token.token_type != TokenType.IDENTIFIER:
+                raise ParseError(Error("Expected variable name", self.current_token.pos_start, self.current_token.pos_end))
+            var_name = self.current_token.value
+            self.advance()
+            if not self.current_token.match_keyword(KEYWORDS["value_in"]):
+                raise ParseError(Error(f"Expected '{KEYWORDS["value_in"]}'", self.current_token.pos_start, self.current_token.pos_end))
+            self.advance()
+            container = self.parse_expression()
+            if self.current_token.token_type != TokenType.R_PAREN:
+                raise ParseError(Error("Expected ')'", self.current_token.pos_start, self.current_token.pos_end))
+            self.advance()
+            block = yield self.block_steps()
+            return self.nodes.ForEachNode(var_name, container, block, start)
+        return Parser.parse_statement(self, semicolon_required)
+    def conditional_steps(self) -> Steps:
+        "Parses an if statement and its whole elseif chain in one loop, building the same IfNode as Parser.parse_conditional"
+        cases: list[tuple[int, n.Node, n.BlockNode]] = [] # (start, condition, block) of the if and each elseif
+        while True:
+            start = self.current_token.start
+            self.advance()
+            condition = self.parse_expression()
+            block = yield self.block_steps()
+            cases.append((start, condition, block))
+            if not self.current_token.match_keyword(KEYWORDS["condition_alt"]):
+                break
+        failure = None
+        if self.current_token.match_keyword(KEYWORDS["condition_fail"]):
+            self.advance()
+            failure = yield self.block_steps()
+        # Every case of the chain ends where the whole chain ends
+        end = failure.end if failure else cases[-1][2].end
+        alternate_cases = [self.nodes.IfNode(condition, block, [], None, start, end) for start, condition, block in cases[1:]]
+        start, condition, block = cases[0]
+        return self.nodes.IfNode(condition, block, alternate_cases, failure, start, end)
+
+    def parse_expression(self) -> n.Node:
+        """
+        Parses an expression in a single loop. Parentheses, array literals, call arguments and assigned values each
+        open a frame holding the operands and pending operators of the expression inside them. The token that ends
+        that expression closes the frame, and the construct it built becomes an operand of the enclosing frame
+        """
+        binary_operators = self.binary_operators
+        unary_operators = self.unary_operators
+        frames: list[tuple] = [] # Enclosing frames, as (kind, data, operands, pending, unary)
+        kind: str | None = None # None for the outermost expression
+        data: Any = None
+        operands: list[n.Node] = []
+        pending: list[tuple[int, Operator]] = []
+        unary: Token | None = None
+        while True:
+            token = self.current_token
+            if token.token_type in (TokenType.MINUS, TokenType.TILDE, TokenType.EXCLAMATION):
+                unary = token
+                token = self.advance()
+            token_type = token.token_type
+            if token_type == TokenType.IDENTIFIER:
+                if self.advance().token_type == TokenType.EQUALS:
+                    self.advance()
+                    frames.append((kind, data, operands, pending, unary))
+                    kind, data, operands, pending, unary = "assign", token, [], [], None
+                    continue
+                node = self.nodes.VarNode(token)
+            elif token_type == TokenType.INT:
+                node = self.nodes.IntNode(token)
+                self.advance()
+            elif token_type == TokenType.L_PAREN:
+                self.advance()
+                frames.append((kind, data, operands, pending, unary))
+                kind, data, operands, pending, unary = "parentheses", None, [], [], None
+                continue
+            elif token_type == TokenType.FLOAT:
+                node = self.nodes.FloatNode(token)
+                self.advance()
+            elif token_type == TokenType.STR:
+                node = self.nodes.StringNode(token)
+                self.advance()
+            elif token_type == TokenType.CHAR:
+                node = self.nodes.CharNode(token)
+                self.advance()
+            elif token_type == TokenType.L_BRACKET:
+                self.advance()
+                frames.append((kind, data, operands, pending, unary))
+                kind, data, operands, pending, unary = "array", (token.start, []), [], [], None
+                continue
+            elif token_type == TokenType.EOF:
+                raise ParseError(Error("Unexpected EOF", token.pos_start, token.pos_end))
+            elif token.match_keyword(KEYWORDS["bool_true"]):
+                node = self.nodes.BoolNode(True, token.start, token.end, token.lines)
+                self.advance()
+            elif token.match_keyword(KEYWORDS["bool_false"]):
+                node = self.nodes.BoolNode(False, token.start, token.end, token.lines)
+                self.advance()
+            else:
+                raise ParseError(Error("Unexpected token.", token.pos_start, token.pos_end))
+
+            called = False
+            # Finishes the operand in node, then closes each frame whose expression it ends
+            while True:
+                if not called and self.current_token.token_type == TokenType.L_PAREN:
+                    if self.advance().token_type != TokenType.R_PAREN:
+                        frames.append((kind, data, operands, pending, unary))
+                        kind, data, operands, pending, unary = "call", (node, []), [], [], None
+                        break
+                    node = self.nodes.CallNode(node, [], self.current_token.end)
+                    self.advance()
+                if unary:
+                    node = self.nodes.UnaryOpNode(unary_operators[unary.token_type], node, unary.start)
+                    unary = None
+                operator = binary_operators.get(self.current_token.token_type)
+                if operator is not None:
+                    while pending and pending[-1][0] >= operator[0]:
+                        node = self.nodes.BinaryOpNode(operands.pop(), pending.pop()[1], node)
+                    operands.append(node)
+                    pending.append(operator)
+                    self.advance()
+                    break
+                while pending:
+                    node = self.nodes.BinaryOpNode(operands.pop(), pending.pop()[1], node)
+                # node is now the whole expression of the frame
+                token = self.current_token
+                if kind is None:
+                    return node
+                elif kind == "parentheses":
+                    if token.token_type != TokenType.R_PAREN:
+                        raise ParseError(Error("Expected ')'", token.pos_start, token.pos_end))
+                    self.advance()
+                    called = False
+                elif kind == "assign":
+                    node = self.nodes.VarAssignNode(data.value, node, data.start)
+                    called = False
+                elif kind == "array":
+                    data[1].append(node)
+                    if token.token_type == TokenType.COMMA:
+                        self.advance()
+                        break
+                    if token.token_type != TokenType.R_BRACKET:
+                        raise ParseError(Error("Expected ']'", token.pos_start, token.pos_end))
+                    self.advance()
+                    node = self.nodes.ArrayNode(data[1], data[0], token.end, self.current_token.lines)
+                    called = False
+                else: # "call"
+                    data[1].append(node)
+                    if token.token_type == TokenType.COMMA:
+                        token = self.advance()
+                        if token.token_type != TokenType.R_PAREN:
+                            break
+                    elif token.token_type != TokenType.R_PAREN:
+                        raise ParseError(Error("Expected ')'", token.pos_start, token.pos_end))
+                    self.advance()
+                    node = self.nodes.CallNode(data[0], data[1], token.end)
+                    called = True
+                kind, data, operands, pending, unary = frames.pop()
+    def parse_type(self) -> types_.Type:
+        depth = 0 # Number of array types around the basic type
+        while self.current_token.token_type == TokenType.L_BRACKET:
+            depth += 1
+            self.advance()
+        if self.current_token.token_type != TokenType.TYPE:
+            raise ParseError(Error("Expected type", self.current_token.pos_start, self.current_token.pos_end))
+        type_ = types_.Type(types_.BasicType(TYPES[self.current_token.value]))
+        self.advance()
+        for _ in range(depth):
+            if self.current_token.token_type != TokenType.R_BRACKET:
+                raise ParseError(Error("Expected ']'.", self.current_token.pos_start, self.current_token.pos_end))
+            self.advance()
+            type_ = types_.Type(types_.ArrayType(type_))
+        return type_
+
+class StreamParser(Parser):
+    """
+    Parser that pulls tokens from the lexer's token generator as it advances instead of indexing a
+    complete token list, so lexing and parsing overlap and only the current token is held
+    """
+    def __init__(self, lexer: Lexer | FastLexer):
+        self.lexer = lexer
+        # Lexer errors are skipped over and reported after parsing, so the stream always ends with EOF
+        self.source = lexer.iter_tokens(recover=True)
+        self.index = 0
+        self.current_token: Token = next(self.source)
+        self.loops_inside: int = 0
+        self.recover: bool = False
+        self.errors: list[Error] = []
+    def advance(self, amount: int = 1):
+        for _ in range(amount):
+            if self.current_token.token_type == TokenType.EOF:
+                break
+            self.index += 1
+            self.current_token = next(self.source)
+        return self.current_token
+
+    def parse(self) -> Result:
+        output = Result()
+        if self.current_token.token_type != TokenType.EOF:
+            try:
+                output.success(self.parse_top_level())
+            except ParseError as error:
+                output.error(error.error)
+                # A lexer error later in the text takes precedence, the same as when lexing up front
+                for _ in self.source:
+                    pass
+        if self.lexer.error:
+            return Result().error(self.lexer.error)
+        return output
+
+class StackStreamParser(StreamParser, StackParser):
+    "StackParser that pulls its tokens from the lexer like StreamParser"
+
+class LazyParser(Parser):
+    """
+    Parser that only parses function signatures, for tools that need the declarations of a file but not the code
+    inside them. A body is skipped by matching its braces, and is parsed the first time the declaration's body is
+    used, giving the same nodes as Parser. Syntax errors in a body are found when it is parsed: they are added to
+    errors in recovery mode, and raised as ParseError from the body access otherwise. A body whose braces do not
+    match before the next 'func' keyword, or that is a single statement, is parsed right away. parse and parse_all
+    do not validate the skipped bodies, so a file they accept can still have syntax errors: validate parses them
+    """
+    def __init__(self, tokens: list[Token]):
+        super().__init__(tokens)
+        self.skipped: list[n.FuncDeclNode] = [] # Declarations made with their bodies skipped
+    def validate(self) -> list[Error]:
+        """
+        Parses every skipped body that was not used yet, and returns the syntax errors found in them. In recovery
+        mode they are also added to errors, the same as when the bodies are used
+        """
+        found = []
+        for declaration in self.skipped:
+            if not hasattr(declaration, "parse_body"): # Already parsed
+                continue
+            count = len(self.errors)
+            try:
+                declaration.body
+            except ParseError as error:
+                found.append(error.error)
+            found.extend(self.errors[count:])
+        return found
+    def parse_func_decl(self) -> n.FuncDeclNode:
+        if self.nodes is unbuilt_nodes: # check parses bodies too, since skipping them would miss their errors
+            return super().parse_func_decl()
+        start = self.current_token.start
+        func_name, args, return_type = self.parse_signature()
+        body_start = self.index
+        body_end = self.skip_block()
+        if body_end is None:
+            func_body = self.parse_block()
+            return self.nodes.FuncDeclNode(func_name, args, return_type, func_body, start, func_body.end)
+        unparsed = UnparsedBody(self.tokens, body_start, type(self), self.recover, self.errors)
+        declaration = n.FuncDeclNode.unparsed(func_name, args, return_type, unparsed, start, body_end, self.current_token.lines)
+        self.skipped.append(declaration)
+        return declaration
+    def skip_block(self) -> int | None:
+        """
+        Moves past the braced block at the current token, and returns the end of its closing '}'. Returns None,
+        without moving, if the current token is not '{' or the block is not closed before a 'func' keyword or EOF
+        """
+        tokens = self.tokens
+        i = self.index
+        if tokens[i].token_type != TokenType.L_BRACE:
+            return None
+        depth = 0
+        func = KEYWORDS["declare_func"]
+        l_brace, r_brace, keyword, eof = TokenType.L_BRACE, TokenType.R_BRACE, TokenType.KEYWORD, TokenType.EOF
+        for i in range(i, len(tokens)):
+            token = tokens[i]
+            token_type = token.token_type
+            if token_type is l_brace:
+                depth += 1
+            elif token_type is r_brace:
+                depth -= 1
+                if not depth:
+                    self.advance(i + 1 - self.index)
+                    return token.end
+            elif token_type is eof or (token_type is keyword and token.value == func):
+                return None
+        return None
+
+class UnparsedBody:
+    "The tokens of a function body that LazyParser skipped. Calling it parses them"
+    __slots__ = ("tokens", "index", "parser_class", "recover", "errors")
+    def __init__(self, tokens: list[Token], index: int, parser_class: type[Parser], recover: bool, errors: list[Error]):
+        self.tokens = tokens
+        self.index = index # Index of the '{' token
+        self.parser_class = parser_class
+        self.recover = recover
+        self.errors = errors # Where syntax errors in recovery mode are added
+    def __call__(self) -> n.BlockNode:
+        parser_ = self.parser_class(self.tokens)
+        parser_.advance(self.index)
+        parser_.recover = self.recover
+        body = parser_.parse_block()
+        self.errors.extend(parser_.errors)
+        return body
@@ -1,4 +1,8 @@
+from array import array
+from bisect import bisect_right
+
 class Position:
+    __slots__ = ("index", "line", "col")
     def __init__(self, index: int, line: int, col: int):
         self.index = index
         self.line = line
@@ -12,4 +16,85 @@ class Position:
     def __repr__(self):
         return f"({self.index}:{self.col},{self.line})"
     def __add__(self, right: int):
-        return Position(self.index + 1, self.line, self.col + 1)
\ No newline at end of file
+        return Position(self.index + 1, self.line, self.col + 1)
+
+class LineIndex:
+    "Table of line start offsets for a source text. Built on first use, and shared by every token and node of that text"
+    __slots__ = ("text", "starts")
+    def __init__(self, text: str):
+        self.text = text
+        self.starts: array | None = None
+    def line_starts(self) -> array:
+        if self.starts is None:
+            text = self.text
+            starts = array("q", [0])
+            index = text.find("\n")
+            while index != -1:
+                starts.append(index + 1)
+                index = text.find("\n", index + 1)
+            self.starts = starts
+        return self.starts
+    def locate(self, index: int) -> tuple[int, int]:
+        "Returns the (line, col) of an offset. Offsets past the end continue the last line, like the lexer's cursor does"
+        length = len(self.text)
+        if index >= length and length:
+            line, col = self.locate(length - 1)
+            return (line, col + index - length + 1)
+        starts = self.line_starts()
+        line = bisect_right(starts, index) - 1
+        return (line, index - starts[line])
+    def position(self, index: int) -> Position:
+        line, col = self.locate(index)
+        return Position(index, line, col)
+    def replace(self, offset: int, removed: int, inserted: str) -> "Shift":
+        """
+        Updates the index in place for an edit of its text that replaces removed characters at offset with inserted.
+        Returns the Shift that moves positions after the edit
+        """
+        old_end = self.locate(offset + removed)
+        self.text = self.text[:offset] + inserted + self.text[offset + removed:]
+        starts = self.line_starts()
+        kept = bisect_right(starts, offset) # Lines that start before the edit are unchanged
+        moved = bisect_right(starts, offset + removed) # Lines that start after the removed text only move
+        new_starts = starts[:kept]
+        index = inserted.find("\n")
+        while index != -1:
+            new_starts.append(offset + index + 1)
+            index = inserted.find("\n", index + 1)
+        delta = len(inserted) - removed
+        new_starts.extend(start + delta for start in starts[moved:])
+        self.starts = new_starts
+        return Shift(delta, old_end, self.locate(offset + len(inserted)))
+    def line_text(self, line: int) -> str:
+        "Returns the text of a line, without its newline"
+        starts = self.line_starts()
+        end = starts[line + 1] - 1 if line + 1 < len(starts) else len(self.text)
+        return self.text[starts[line]:end]
+
+class Shift:
+    "How positions after an edit move: by delta characters, and by the line and column change at the edit's end"
+    __slots__ = ("delta", "old_end", "new_end")
+    def __init__(self, delta: int, old_end: tuple[int, int], new_end: tuple[int, int]):
+        self.delta = delta
+        self.old_end = old_end
+        self.new_end = new_end
+    def position(self, position: Position) -> Position:
+        "Moves a position at or after the end of the edit. Only positions on the line the edit ends on change column"
+        old_line, old_col = self.old_end
+        new_line, new_col = self.new_end
+        if position.line == old_line:
+            return Position(position.index + self.delta, new_line, position.col - old_col + new_col)
+        return Position(position.index + self.delta, position.line + new_line - old_line, position.col)
+
+class Span:
+    "Base for objects that store their location as offsets into a source. Positions are computed on demand"
+    __slots__ = ()
+    start: int
+    end: int
+    lines: LineIndex
+    @property
+    def pos_start(self) -> Position:
+        return self.lines.position(self.start)
+    @property
+    def pos_end(self) -> Position:
+        return self.lines.position(self.end)
@@ -0,0 +1,222 @@
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from tokens import Token, TokenType
+from fastlexer import FastLexer
+from pos import LineIndex
+from constants import KEYWORDS
+
+FORMAT = 1 # Changed when the tables or what scan records change, which makes existing index files rebuild
+
+class Symbol:
+    "A function declaration found by scan. line and col are those of its name, counted from 0"
+    __slots__ = ("path", "name", "args", "return_type", "start", "end", "line", "col")
+    def __init__(self, path: str, name: str, args: list[tuple[str, str]], return_type: str, start: int, end: int, line: int, col: int):
+        self.path = path
+        self.name = name
+        self.args = args # (name, type) pairs, with types written the way they are declared
+        self.return_type = return_type
+        self.start = start # Start of the 'func' keyword
+        self.end = end # End of the body's closing '}', or of the last token before the next declaration if it is not closed
+        self.line = line
+        self.col = col
+    def signature(self) -> str:
+        return f"func {self.name}({', '.join(f'{arg}: {type_}' for arg, type_ in self.args)}) -> {self.return_type}"
+    def __repr__(self):
+        return f"{self.path}:{self.line + 1}:{self.col + 1}: {self.signature()}"
+
+def scan(text: str, path: str = "") -> list[Symbol]:
+    """
+    Finds the function declarations of a source by matching 'func IDENT ( ARGS ) -> TYPE' over its tokens, without
+    parsing the bodies. Like the parser, every 'func' keyword starts a new declaration, so a declaration is found
+    even when the ones around it have syntax errors. Invalid characters and literals are skipped
+    """
+    lexer_ = FastLexer(text)
+    lines = lexer_.lines = LineIndex(text)
+    tokens = list(lexer_.iter_tokens(recover=True))
+    func = KEYWORDS["declare_func"]
+    symbols: list[Symbol] = []
+    current: Symbol | None = None # The declaration whose body is being skipped
+    depth = 0
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        token_type = token.token_type
+        if token_type == TokenType.KEYWORD and token.value == func:
+            if current is not None:
+                current.end = tokens[i - 1].end
+            current = None
+            depth = 0
+            signature = read_signature(tokens, i + 1)
+            if signature is None:
+                i += 1
+                continue
+            name_token, args, return_type, i = signature
+            line, col = lines.locate(name_token.start)
+            current = Symbol(path, name_token.value, args, return_type, token.start, tokens[i - 1].end, line, col)
+            symbols.append(current)
+            continue
+        if token_type == TokenType.L_BRACE:
+            depth += 1
+        elif token_type == TokenType.R_BRACE and depth:
+            depth -= 1
+            if not depth and current is not None:
+                current.end = token.end
+                current = None
+        elif token_type == TokenType.EOF and current is not None:
+            current.end = tokens[i - 1].end
+        i += 1
+    return symbols
+
+def read_signature(tokens: list[Token], i: int) -> tuple[Token, list[tuple[str, str]], str, int] | None:
+    "Reads the tokens of a declaration after 'func' at index i. Returns (name, args, return type, index after it), or None if they do not match"
+    if tokens[i].token_type != TokenType.IDENTIFIER or tokens[i + 1].token_type != TokenType.L_PAREN:
+        return None
+    name = tokens[i]
+    i += 2
+    args = []
+    while tokens[i].token_type == TokenType.IDENTIFIER and tokens[i + 1].token_type == TokenType.COLON:
+        type_ = read_type(tokens, i + 2)
+        if type_ is None:
+            return None
+        args.append((tokens[i].value, type_[0]))
+        i = type_[1]
+        if tokens[i].token_type != TokenType.COMMA:
+            break
+        i += 1
+    if tokens[i].token_type != TokenType.R_PAREN or tokens[i + 1].token_type != TokenType.ARROW:
+        return None
+    return_type = read_type(tokens, i + 2)
+    if return_type is None:
+        return None
+    return (name, args, return_type[0], return_type[1])
+def read_type(tokens: list[Token], i: int) -> tuple[str, int] | None:
+    "Reads a type like [[int]] at index i. Returns its text and the index after it, or None if there is no type there"
+    depth = 0
+    while tokens[i].token_type == TokenType.L_BRACKET:
+        depth += 1
+        i += 1
+    if tokens[i].token_type != TokenType.TYPE:
+        return None
+    name = tokens[i].value
+    i += 1
+    for _ in range(depth):
+        if tokens[i].token_type != TokenType.R_BRACKET:
+            return None
+        i += 1
+    return ("[" * depth + name + "]" * depth, i)
+
+def scan_file(path: str, known_digest: str | None) -> tuple[str, list[Symbol] | None] | None:
+    """
+    Hashes a file and scans it unless its hash is known_digest. Returns (digest, symbols), with None for the
+    symbols of an unchanged file, or None if the file cannot be read
+    """
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+    digest = hashlib.sha256(data).hexdigest()
+    if digest == known_digest:
+        return (digest, None)
+    return (digest, scan(data.decode("utf-8", "replace"), path))
+
+class SymbolIndex:
+    """
+    On-disk index of the functions declared in a set of source files, stored in an SQLite database. update
+    rescans only the files whose modification time or size changed and whose content hash is different, so
+    keeping it current costs one stat per file. Files are stored by absolute path
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != FORMAT:
+            with self.connection:
+                self.connection.execute("DROP TABLE IF EXISTS files")
+                self.connection.execute("DROP TABLE IF EXISTS symbols")
+                self.connection.execute("CREATE TABLE files (path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, digest TEXT)")
+                self.connection.execute(
+                    "CREATE TABLE symbols (path TEXT, name TEXT, args TEXT, return_type TEXT, start INTEGER, end INTEGER, line INTEGER, col INTEGER)"
+                )
+                self.connection.execute("CREATE INDEX symbols_name ON symbols (name)")
+                self.connection.execute("CREATE INDEX symbols_path ON symbols (path, start)")
+                self.connection.execute(f"PRAGMA user_version = {FORMAT}")
+    def close(self):
+        self.connection.close()
+    def __enter__(self) -> "SymbolIndex":
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def update(self, paths: list[str], jobs: int = 1) -> int:
+        """
+        Brings the index up to date with the given files, scanning changed ones on jobs worker processes, and
+        drops indexed files that no longer exist. Returns the number of files scanned
+        """
+        known = {path: (mtime, size, digest) for path, mtime, size, digest in self.connection.execute("SELECT * FROM files")}
+        changed = []
+        for path in dict.fromkeys(os.path.abspath(path) for path in paths):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            row = known.get(path)
+            if row is None or row[:2] != (stat.st_mtime_ns, stat.st_size):
+                changed.append((path, stat, row and row[2]))
+        if jobs > 1 and len(changed) > 1:
+            with ProcessPoolExecutor(jobs) as pool:
+                results = list(pool.map(scan_file, [path for path, _, _ in changed], [digest for _, _, digest in changed], chunksize=max(1, len(changed) // (jobs * 8))))
+        else:
+            results = [scan_file(path, digest) for path, _, digest in changed]
+        scanned = 0
+        with self.connection:
+            for (path, stat, _), result in zip(changed, results):
+                if result is None:
+                    self.forget(path)
+                    continue
+                digest, symbols = result
+                self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (path, stat.st_mtime_ns, stat.st_size, digest))
+                if symbols is None: # Touched but not changed
+                    continue
+                scanned += 1
+                self.connection.execute("DELETE FROM symbols WHERE path = ?", (path,))
+                self.connection.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+                    (path, symbol.name, ",".join(f"{arg}:{type_}" for arg, type_ in symbol.args), symbol.return_type, symbol.start, symbol.end, symbol.line, symbol.col)
+                    for symbol in symbols
+                ])
+            for path in known:
+                if not os.path.exists(path):
+                    self.forget(path)
+        return scanned
+    def forget(self, path: str):
+        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.connection.execute("DELETE FROM symbols WHERE path = ?", (path,))
+
+    def find(self, name: str, paths: list[str] | None = None) -> list[Symbol]:
+        "Returns the declarations of functions called name, only in paths if given"
+        return self.query("WHERE name = ?" + self.within(paths) + " ORDER BY path, start", (name,))
+    def search(self, pattern: str, paths: list[str] | None = None) -> list[Symbol]:
+        "Returns the declarations of functions whose names match a glob pattern like get_*, only in paths if given"
+        return self.query("WHERE name GLOB ?" + self.within(paths) + " ORDER BY path, start", (pattern,))
+    def within(self, paths: list[str] | None) -> str:
+        """
+        Returns the condition that limits a query to paths, which are put in a temporary table so any number of
+        them fit in one query, or no condition if paths is None
+        """
+        if paths is None:
+            return ""
+        with self.connection:
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS scope (path TEXT PRIMARY KEY)")
+            self.connection.execute("DELETE FROM scope")
+            self.connection.executemany("INSERT OR IGNORE INTO scope VALUES (?)", ((os.path.abspath(path),) for path in paths))
+        return " AND path IN (SELECT path FROM scope)"
+    def outline(self, path: str) -> list[Symbol]:
+        "Returns the declarations in a file in source order"
+        return self.query("WHERE path = ? ORDER BY start", (os.path.abspath(path),))
+    def query(self, condition: str, parameters: tuple) -> list[Symbol]:
+        return [
+            Symbol(path, name, [tuple(arg.split(":")) for arg in args.split(",") if arg], return_type, start, end, line, col)
+            for path, name, args, return_type, start, end, line, col in self.connection.execute("SELECT * FROM symbols " + condition, parameters)
+        ]
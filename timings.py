@@ -0,0 +1,126 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator
+import nodes as n
+from lexer import Lexer
+from fastlexer import FastLexer
+from parser import Parser
+from pos import LineIndex
+from visitor import preorder
+
+LEXING_PHASES = {"lex", "parse", "lex+parse"} # The phases tokens_per_second counts. Other phases, like reading or running, are left out
+
+class Phase:
+    __slots__ = ("name", "wall", "cpu", "peak")
+    def __init__(self, name: str, wall: float, cpu: float, peak: int | None):
+        self.name = name
+        self.wall = wall # Seconds
+        self.cpu = cpu # Seconds of CPU time used by this process
+        self.peak = peak # Most bytes allocated during the phase beyond those in use when it started, if traced
+
+class Timings:
+    """
+    Wall and CPU time of each phase of a compilation, like reading, lexing, parsing and output, with the numbers of
+    tokens and nodes. With memory, the peak memory of each phase is traced with tracemalloc, which makes the phases
+    several times slower; tracing starts with the first phase and is stopped by close
+    """
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.tracing = False # Whether tracing was started by this instance
+        self.phases: list[Phase] = []
+        self.tokens: int | None = None
+        self.nodes: int | None = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        "Measures the code run in a with block as the phase name"
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.tracing = True
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            peak = tracemalloc.get_traced_memory()[1] - base if self.memory else None
+            self.phases.append(Phase(name, wall, cpu, peak))
+    def close(self):
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+    def count_nodes(self, tree: n.Node | None):
+        "Sets nodes to the number of nodes in tree. Leaves it unset if there is no tree"
+        if tree is None:
+            return
+        self.nodes = sum(1 for _ in preorder(tree))
+    def tokens_per_second(self) -> float | None:
+        "Tokens divided by the wall time of the phases that lex and parse them"
+        seconds = sum(phase.wall for phase in self.phases if phase.name in LEXING_PHASES)
+        if self.tokens is None or not seconds:
+            return None
+        return self.tokens / seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": [
+                {"name": phase.name, "wall": phase.wall, "cpu": phase.cpu, "peak": phase.peak} for phase in self.phases
+            ],
+            "wall": sum(phase.wall for phase in self.phases),
+            "cpu": sum(phase.cpu for phase in self.phases),
+            "tokens": self.tokens,
+            "nodes": self.nodes,
+            "tokens_per_second": self.tokens_per_second(),
+        }
+    def render_json(self, **fields) -> str:
+        "One line of JSON, with fields like the file name added first"
+        return json.dumps(fields | self.to_dict())
+    def render(self, title: str = "") -> str:
+        "A table with a line per phase, then the totals and counts"
+        out = [f"Timings{' for ' + title if title else ''}:"]
+        for phase in self.phases + [Phase("total", sum(phase.wall for phase in self.phases), sum(phase.cpu for phase in self.phases), None)]:
+            line = f"  {phase.name:<10} wall {phase.wall * 1000:10.2f} ms  cpu {phase.cpu * 1000:10.2f} ms"
+            if phase.peak is not None:
+                line += f"  peak {phase.peak / 1024:10.1f} KiB"
+            out.append(line)
+        counts = []
+        if self.tokens is not None:
+            counts.append(f"{self.tokens} tokens")
+            rate = self.tokens_per_second()
+            if rate is not None:
+                counts.append(f"{rate:,.0f} tokens/s")
+        if self.nodes is not None:
+            counts.append(f"{self.nodes} nodes")
+        if counts:
+            out.append("  " + ", ".join(counts))
+        return "\n".join(out)
+
+def measure(path: str, lexer_class: type[Lexer | FastLexer] = Lexer, parser_class: type[Parser] = Parser, memory: bool = False) -> Timings:
+    """
+    Reads, lexes and parses a file with every error recorded, the way the command line does, and returns the timings
+    of each phase. The parser does not run if lexing fails
+    """
+    timings = Timings(memory)
+    try:
+        with timings.phase("read"):
+            with open(path, "r") as file:
+                text = file.read()
+        lexer_ = lexer_class(text)
+        lexer_.lines = LineIndex(text)
+        with timings.phase("lex"):
+            tokens, lexer_errors = lexer_.lex_all()
+        timings.tokens = len(tokens)
+        if not lexer_errors:
+            with timings.phase("parse"):
+                tree, _ = parser_class(tokens).parse_all()
+            timings.count_nodes(tree)
+    finally:
+        timings.close()
+    return timings
@@ -1,6 +1,6 @@
 from enum import Enum
 from typing import Any
-from pos import Position
+from pos import LineIndex, Span
 
 TokenType = Enum("TokenType", [
     "EOF", "INT", "FLOAT", "PLUS", "MINUS", "ASTERISK", "SLASH", "L_PAREN", "R_PAREN",
@@ -9,12 +9,14 @@ TokenType = Enum("TokenType", [
     "TYPE", "SEMICOLON", "L_BRACE", "R_BRACE", "COMMA", "ARROW", "L_BRACKET", "R_BRACKET"
 ])
 
-class Token:
-    def __init__(self, token_type: TokenType, value: Any, pos_start: Position, pos_end: Position):
+class Token(Span):
+    __slots__ = ("token_type", "value", "start", "end", "lines")
+    def __init__(self, token_type: TokenType, value: Any, start: int, end: int, lines: LineIndex):
         self.token_type = token_type
         self.value = value
-        self.pos_start = pos_start
-        self.pos_end = pos_end
+        self.start = start
+        self.end = end
+        self.lines = lines
     def __repr__(self):
         string_repr: str = f"[{self.token_type.name}"
         if self.value:
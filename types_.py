@@ -5,13 +5,21 @@ BasicType = Enum("BasicType", [
 ])
 
 class ArrayType:
+    __slots__ = ("element_type",)
     def __init__(self, element_type):
         self.element_type: Type = element_type
     def __repr__(self):
         return f"ARR of {self.element_type}"
 
 class Type:
+    __slots__ = ("value",)
     def __init__(self, type_: BasicType | ArrayType):
         self.value = type_
     def __repr__(self):
-        return f"<{self.value}>"
+        # Nested array types are unwound in a loop, so deep nesting does not hit the recursion limit
+        depth = 0
+        value = self.value
+        while isinstance(value, ArrayType):
+            depth += 1
+            value = value.element_type.value
+        return "<ARR of " * depth + f"<{value}>" + ">" * depth
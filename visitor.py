@@ -0,0 +1,138 @@
+from typing import Callable, Iterator
+import nodes as n
+
+# Every node class, with its name without the Node suffix that handler methods are named after, like BinaryOp
+NAMES: dict[type[n.Node], str] = {cls: cls.__name__.removesuffix("Node") for cls in n.Node.__subclasses__()}
+# The child fields of each class in reverse, the order they are pushed on a walk's stack
+REVERSED_FIELDS: dict[type[n.Node], tuple[str, ...]] = {cls: cls.child_fields[::-1] for cls in NAMES}
+SKIP = object() # Returned by a visit method to leave the node's children out of the walk
+REMOVED = object() # Stands in for list items removed by a transform until the list is compacted
+
+def preorder(node: n.Node) -> Iterator[n.Node]:
+    "Yields a node and everything inside it, each node before its children, in source order"
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        for field in REVERSED_FIELDS[type(node)]:
+            child = getattr(node, field)
+            if child.__class__ is list:
+                stack.extend(reversed(child))
+            elif child is not None:
+                stack.append(child)
+
+def postorder(node: n.Node) -> Iterator[n.Node]:
+    "Yields a node and everything inside it, each node after its children, in source order"
+    stack: list = [node]
+    while stack:
+        node = stack.pop()
+        if node.__class__ is tuple: # A node whose children are done
+            yield node[0]
+            continue
+        stack.append((node,))
+        for field in REVERSED_FIELDS[type(node)]:
+            child = getattr(node, field)
+            if child.__class__ is list:
+                stack.extend(reversed(child))
+            elif child is not None:
+                stack.append(child)
+
+def dispatch_table(cls: type, prefix: str) -> dict[type[n.Node], Callable | None]:
+    """
+    Maps each node class to the method of cls named prefix followed by the class name without Node, like
+    visit_BinaryOp, or to the method named prefix followed by Node if there is none, or to None without either
+    """
+    default = getattr(cls, prefix + "Node", None)
+    return {node_class: getattr(cls, prefix + name, default) for node_class, name in NAMES.items()}
+
+class Visitor:
+    """
+    Base of passes that read a tree. walk calls the visit_ method for each node's class, like visit_BinaryOp for a
+    BinaryOpNode, before the node's children, and its leave_ method after them. visit_Node and leave_Node handle
+    the classes without their own method. If a visit method returns SKIP, the node's children and its leave method
+    are skipped. The methods for each class are looked up once per subclass, and the walk keeps its own stack, so
+    deep trees do not reach the recursion limit
+    """
+    visitors: dict[type[n.Node], Callable | None] = dict.fromkeys(NAMES)
+    leavers: dict[type[n.Node], Callable | None] = dict.fromkeys(NAMES)
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.visitors = dispatch_table(cls, "visit_")
+        cls.leavers = dispatch_table(cls, "leave_")
+
+    def walk(self, tree: n.Node):
+        visitors = self.visitors
+        leavers = self.leavers
+        stack: list = [tree]
+        while stack:
+            node = stack.pop()
+            if node.__class__ is tuple: # The leave method of a node whose children are done
+                node[0](self, node[1])
+                continue
+            cls = type(node)
+            visit = visitors[cls]
+            if visit is not None and visit(self, node) is SKIP:
+                continue
+            leave = leavers[cls]
+            if leave is not None:
+                stack.append((leave, node))
+            for field in REVERSED_FIELDS[cls]:
+                child = getattr(node, field)
+                if child.__class__ is list:
+                    stack.extend(reversed(child))
+                elif child is not None:
+                    stack.append(child)
+
+class Transformer:
+    """
+    Base of passes that rewrite a tree in place. transform calls the transform_ method for each node's class, like
+    transform_BinaryOp, after the node's children were transformed, and puts what it returns in the node's place:
+    the node itself to keep it, another node to replace it, or None to remove it, which drops it from a list or
+    leaves its field empty. transform_Node handles the classes without their own method. Replacements are not
+    transformed again. Like Visitor, methods are looked up once per subclass and the walk keeps its own stack
+    """
+    transforms: dict[type[n.Node], Callable | None] = dict.fromkeys(NAMES)
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.transforms = dispatch_table(cls, "transform_")
+
+    def transform(self, tree: n.Node) -> n.Node | None:
+        "Transforms a tree, and returns what took the place of its root"
+        transforms = self.transforms
+        root = [tree]
+        # Each entry is a node, the list or node holding it and its index or field there, and whether its children are done
+        stack: list[tuple[n.Node, list | n.Node, int | str, bool]] = [(tree, root, 0, False)]
+        removed: dict[int, list] = {} # Lists with REMOVED items, by id
+        while stack:
+            node, holder, key, done = stack.pop()
+            cls = type(node)
+            if not done:
+                stack.append((node, holder, key, True))
+                for field in REVERSED_FIELDS[cls]:
+                    child = getattr(node, field)
+                    if child.__class__ is list:
+                        for i in range(len(child) - 1, -1, -1):
+                            stack.append((child[i], child, i, False))
+                    elif child is not None:
+                        stack.append((child, node, field, False))
+                continue
+            if removed:
+                for field in cls.child_fields:
+                    child = getattr(node, field)
+                    if child.__class__ is list and removed.pop(id(child), None) is not None:
+                        child[:] = [item for item in child if item is not REMOVED]
+            method = transforms[cls]
+            if method is None:
+                continue
+            result = method(self, node)
+            if result is node:
+                continue
+            if holder.__class__ is list:
+                if result is None:
+                    holder[key] = REMOVED
+                    removed[id(holder)] = holder
+                else:
+                    holder[key] = result
+            else:
+                setattr(holder, key, result)
+        return None if root[0] is REMOVED else root[0]
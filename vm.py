@@ -0,0 +1,227 @@
+import evaluator
+from operators import Operator
+from pos import LineIndex
+from bytecode import (
+    LOAD, CONST, BINARY_LOCAL_CONST, JUMP_UNLESS_LOCAL_CONST, JUMP_IF_LOCAL_CONST, SET_LOCAL_CONST, JUMP_IF_FALSE,
+    JUMP_IF_TRUE, STORE, BINARY, BINARY_LOCAL_LOCAL, BINARY_CONST, JUMP, CALL, RETURN, FOR_ITER, POP, CALL_VALUE, ASSIGN,
+    UNARY, CALL_BUILTIN, ARRAY, FUNCTION, BUILTIN, GET_ITER, RETURN_NONE, BUILTIN_NAMES, OPERANDS, OPERATOR_FUNCTIONS, Function, Program,
+)
+
+MAX_DEPTH = 200_000 # Most calls in progress at once
+DONE = object() # Returned by next for an iterator that is done
+
+def decode(program: Program) -> list:
+    """
+    Returns the program's code as a list with the operands that name constants, operators, functions and builtins
+    replaced by the objects themselves, so the VM reads them without looking them up in tables
+    """
+    code = program.code.tolist()
+    builtins = [evaluator.BUILTINS[name][0] for name in BUILTIN_NAMES]
+    tables = { # The tables of the operands to replace, by opcode
+        CONST: (program.constants,),
+        BINARY_LOCAL_CONST: (OPERATOR_FUNCTIONS, None, program.constants),
+        JUMP_UNLESS_LOCAL_CONST: (OPERATOR_FUNCTIONS, None, program.constants),
+        JUMP_IF_LOCAL_CONST: (OPERATOR_FUNCTIONS, None, program.constants),
+        SET_LOCAL_CONST: (OPERATOR_FUNCTIONS, None, program.constants),
+        BINARY: (OPERATOR_FUNCTIONS,),
+        BINARY_LOCAL_LOCAL: (OPERATOR_FUNCTIONS,),
+        BINARY_CONST: (OPERATOR_FUNCTIONS, program.constants),
+        CALL: (program.functions,),
+        UNARY: (OPERATOR_FUNCTIONS,),
+        CALL_BUILTIN: (builtins,),
+        FUNCTION: (program.functions,),
+        BUILTIN: (builtins,),
+    }
+    position = 0
+    while position < len(code):
+        opcode = code[position]
+        for i, table in enumerate(tables.get(opcode, ())):
+            if table is not None:
+                code[position + 1 + i] = table[code[position + 1 + i]]
+        position += 1 + OPERANDS[opcode]
+    return code
+
+class VM:
+    """
+    Runs bytecode with a single dispatch loop. Values are kept on one stack shared by every call, and each call gets
+    a frame list for its variables, so a call in the program is not a call in Python and recursion is only limited
+    by MAX_DEPTH. lines is the source's line index, which runtime errors use to point into the source
+    """
+    def __init__(self, program: Program, lines: LineIndex):
+        self.program = program
+        self.lines = lines
+        self.code = decode(program)
+
+    def error(self, position: int, message: str) -> evaluator.RunError:
+        return evaluator.RunError(self.program.error(position, message, self.lines))
+
+    def run(self, arguments: list[str] | None = None):
+        "Calls main, with the command line arguments if it takes one, and returns what it returned"
+        program = self.program
+        code = self.code
+        main = program.functions[program.main]
+        frame = [None] * main.size
+        if main.arity:
+            frame[0] = list(arguments or [])
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        calls: list[tuple[int, list, int]] = [] # The position to return to, the frame and the stack height of each caller
+        position = main.entry
+        a = b = None # The operands of the last operator, for error messages
+        values: list = []
+        try:
+            while True:
+                op = code[position]
+                if op == LOAD:
+                    push(frame[code[position + 1]])
+                    position += 2
+                elif op == CONST:
+                    push(code[position + 1])
+                    position += 2
+                elif op == BINARY_LOCAL_CONST:
+                    a = frame[code[position + 2]]
+                    b = code[position + 3]
+                    push(code[position + 1](a, b))
+                    position += 4
+                elif op == JUMP_UNLESS_LOCAL_CONST:
+                    a = frame[code[position + 2]]
+                    b = code[position + 3]
+                    position = position + 5 if code[position + 1](a, b) else code[position + 4]
+                elif op == JUMP_IF_LOCAL_CONST:
+                    a = frame[code[position + 2]]
+                    b = code[position + 3]
+                    position = code[position + 4] if code[position + 1](a, b) else position + 5
+                elif op == SET_LOCAL_CONST:
+                    a = frame[code[position + 2]]
+                    b = code[position + 3]
+                    frame[code[position + 4]] = code[position + 1](a, b)
+                    position += 5
+                elif op == JUMP_IF_FALSE:
+                    position = position + 2 if pop() else code[position + 1]
+                elif op == JUMP_IF_TRUE:
+                    position = code[position + 1] if pop() else position + 2
+                elif op == STORE:
+                    frame[code[position + 1]] = pop()
+                    position += 2
+                elif op == BINARY:
+                    b = pop()
+                    a = stack[-1]
+                    stack[-1] = code[position + 1](a, b)
+                    position += 2
+                elif op == BINARY_LOCAL_LOCAL:
+                    a = frame[code[position + 2]]
+                    b = frame[code[position + 3]]
+                    push(code[position + 1](a, b))
+                    position += 4
+                elif op == BINARY_CONST:
+                    a = stack[-1]
+                    b = code[position + 2]
+                    stack[-1] = code[position + 1](a, b)
+                    position += 3
+                elif op == JUMP:
+                    position = code[position + 1]
+                elif op == CALL:
+                    function = code[position + 1]
+                    count = code[position + 2]
+                    if len(calls) >= MAX_DEPTH:
+                        raise self.error(position, "Too many nested calls")
+                    callee = [None] * function.size
+                    if count:
+                        callee[:count] = stack[-count:]
+                        del stack[-count:]
+                    calls.append((position + 3, frame, len(stack)))
+                    frame = callee
+                    position = function.entry
+                elif op == RETURN or op == RETURN_NONE:
+                    value = pop() if op == RETURN else None
+                    if not calls:
+                        return value
+                    position, frame, height = calls.pop()
+                    del stack[height:] # Iterators of loops left by the return
+                    push(value)
+                elif op == FOR_ITER:
+                    value = next(stack[-1], DONE)
+                    if value is DONE:
+                        pop()
+                        position = code[position + 2]
+                    else:
+                        frame[code[position + 1]] = value
+                        position += 3
+                elif op == POP:
+                    pop()
+                    position += 1
+                elif op == CALL_VALUE:
+                    count = code[position + 1]
+                    values = stack[len(stack) - count:]
+                    del stack[len(stack) - count:]
+                    target = pop()
+                    if type(target) is Function:
+                        if count != target.arity:
+                            raise self.error(position, evaluator.arity_message(target.name, target.arity, count))
+                        if len(calls) >= MAX_DEPTH:
+                            raise self.error(position, "Too many nested calls")
+                        calls.append((position + 2, frame, len(stack)))
+                        frame = [None] * target.size
+                        frame[:count] = values
+                        position = target.entry
+                    else:
+                        push(self.call_value(position, target, values))
+                        position += 2
+                elif op == ASSIGN:
+                    frame[code[position + 1]] = stack[-1]
+                    position += 2
+                elif op == UNARY:
+                    a = stack[-1]
+                    stack[-1] = code[position + 1](a)
+                    position += 2
+                elif op == CALL_BUILTIN:
+                    count = code[position + 2]
+                    values = stack[len(stack) - count:]
+                    del stack[len(stack) - count:]
+                    push(code[position + 1](*values))
+                    position += 3
+                elif op == ARRAY:
+                    count = code[position + 1]
+                    value = stack[len(stack) - count:]
+                    del stack[len(stack) - count:]
+                    push(value)
+                    position += 2
+                elif op == FUNCTION:
+                    push(code[position + 1])
+                    position += 2
+                elif op == BUILTIN:
+                    push(code[position + 1])
+                    position += 2
+                elif op == GET_ITER:
+                    value = stack[-1]
+                    if type(value) is not list and type(value) is not str:
+                        raise self.error(position, f"Cannot iterate over {evaluator.type_name(value)}")
+                    stack[-1] = iter(value)
+                    position += 1
+                else:
+                    raise ValueError(f"Invalid opcode {op} at {position}")
+        except evaluator.OPERAND_ERRORS as error:
+            code = program.code
+            op = code[position]
+            if op == CALL_BUILTIN:
+                message = f"Cannot apply {BUILTIN_NAMES[code[position + 1]]} to {', '.join(evaluator.type_name(value) for value in values)}"
+            else:
+                message = evaluator.operand_message(Operator(code[position + 1]), (a,) if op == UNARY else (a, b), error)
+            raise self.error(position, message) from None
+
+    def call_value(self, position: int, target, arguments: list):
+        "Calls a value that is not a function of the program: indexes an array or string, or calls a builtin"
+        if type(target) is list or type(target) is str:
+            if len(arguments) != 1 or type(arguments[0]) is not int:
+                raise self.error(position, f"Expected one int index for {evaluator.type_name(target)}")
+            index = arguments[0]
+            if not 0 <= index < len(target):
+                raise self.error(position, f"Index {index} out of range for length {len(target)}")
+            return target[index]
+        elif callable(target):
+            try:
+                return target(*arguments)
+            except TypeError:
+                raise self.error(position, "Wrong arguments for builtin function") from None
+        raise self.error(position, f"Cannot call {evaluator.type_name(target)}")
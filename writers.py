@@ -0,0 +1,217 @@
+import json
+import struct
+from typing import BinaryIO, Iterable, Iterator, TextIO
+import nodes as n
+import types_
+from tokens import Token, TokenType
+from operators import Operator
+from pos import LineIndex
+from columnar import LAYOUTS, KINDS, KIND_CODES, INT_CODECS, encode_field, decode_field, encode_type
+from events import CHILDREN, NAMES
+
+FORMATS = {"text", "jsonl", "binary"}
+BUFFER_SIZE = 1 << 16 # Characters or bytes collected before each write
+
+TOKEN_MAGIC = b"JGLT"
+TREE_MAGIC = b"JGLA"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4sI") # magic, version
+TOKEN_RECORD = struct.Struct("<Bii") # token type, start, end; followed by the value
+NODE_RECORD = struct.Struct("<Biii") # kind, start, end, child slot count; followed by the value and extra fields
+MISSING = 255 # Kind of a child slot holding None
+LENGTH = struct.Struct("<I")
+NUMBER = struct.Struct("<i")
+NO_STRING = 0xFFFFFFFF # Length written for a value of None
+TOKEN_TYPES = list(TokenType)
+MISSING_FIELD = object() # Default for reading the slots of a node that are not set
+
+class BufferedWriter:
+    "Collects pieces of output and writes them to out in blocks of about BUFFER_SIZE"
+    def __init__(self, out: TextIO | BinaryIO, empty: str | bytes):
+        self.out = out
+        self.empty = empty
+        self.pieces: list = []
+        self.size = 0
+    def write(self, piece: str | bytes):
+        self.pieces.append(piece)
+        self.size += len(piece)
+        if self.size >= BUFFER_SIZE:
+            self.flush()
+    def flush(self):
+        if self.pieces:
+            self.out.write(self.empty.join(self.pieces))
+            self.pieces.clear()
+            self.size = 0
+
+def write_tokens(tokens: Iterable[Token], out: TextIO | BinaryIO, format: str = "text"):
+    """
+    Writes tokens to out as they are produced, so they can come straight from a lexer's iter_tokens. text is the
+    repr of the token list, jsonl has one object per token with the fields type, value, start and end, and binary
+    is a header followed by a record per token. binary needs out to be a binary file
+    """
+    if format == "binary":
+        writer = BufferedWriter(out, b"")
+        writer.write(BINARY_HEADER.pack(TOKEN_MAGIC, BINARY_VERSION))
+        for token in tokens:
+            writer.write(TOKEN_RECORD.pack(token.token_type.value, token.start, token.end))
+            writer.write(pack_string(token.value))
+    else:
+        writer = BufferedWriter(out, "")
+        if format == "jsonl":
+            for token in tokens:
+                writer.write(json.dumps({"type": token.token_type.name, "value": token.value, "start": token.start, "end": token.end}, allow_nan=False) + "\n")
+        else:
+            separator = "["
+            for token in tokens:
+                writer.write(separator)
+                writer.write(repr(token))
+                separator = ", "
+            writer.write("[]" if separator == "[" else "]")
+    writer.flush()
+
+def write_tree(tree: n.Node, out: TextIO | BinaryIO, format: str = "text"):
+    """
+    Writes a tree to out while walking it, without building its whole text. text is the node's repr. jsonl has
+    one object per node in source order, with its id, the id of its parent, the parent field it is in, its type,
+    start and end, and its other fields. binary is a header followed by a record per node in depth-first order, as
+    read by read_tree. binary needs out to be a binary file
+    """
+    if format == "binary":
+        writer = BufferedWriter(out, b"")
+        writer.write(BINARY_HEADER.pack(TREE_MAGIC, BINARY_VERSION))
+        stack: list[n.Node | None] = [tree]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                writer.write(bytes((MISSING,)))
+                continue
+            child_fields, list_field, value_field, extra_field = LAYOUTS[type(node)]
+            children = [getattr(node, field) for field in child_fields] + (getattr(node, list_field) if list_field else [])
+            writer.write(NODE_RECORD.pack(KIND_CODES[type(node)], node.start, node.end, len(children)))
+            for field in (value_field, extra_field):
+                if field is not None:
+                    data = encode_field(node, field)
+                    writer.write(NUMBER.pack(data) if type(data) is int else pack_string(data))
+            stack.extend(reversed(children))
+    else:
+        writer = BufferedWriter(out, "")
+        if format == "jsonl":
+            stack: list[tuple[n.Node, int | None, str | None]] = [(tree, None, None)]
+            count = 0
+            while stack:
+                node, parent, parent_field = stack.pop()
+                node_id = count
+                count += 1
+                fields = CHILDREN[type(node)]
+                children = []
+                for field in fields:
+                    child = getattr(node, field)
+                    if type(child) is list:
+                        children.extend((item, node_id, field) for item in child)
+                    elif child is not None:
+                        children.append((child, node_id, field))
+                record = {"id": node_id, "parent": parent, "field": parent_field, "type": NAMES[type(node)], "start": node.start, "end": node.end}
+                for name in type(node).__slots__:
+                    value = getattr(node, name, MISSING_FIELD)
+                    if name not in fields and value is not MISSING_FIELD:
+                        record[name] = json_value(value)
+                writer.write(json.dumps(record, allow_nan=False) + "\n")
+                stack.extend(reversed(children))
+        else:
+            for piece in tree.iter_repr():
+                writer.write(piece)
+    writer.flush()
+
+def json_value(value):
+    "Converts a node field that is not a child to JSON: operators by name and types the way they are declared"
+    if isinstance(value, Operator):
+        return value.name
+    elif isinstance(value, types_.Type):
+        return encode_type(value)
+    elif isinstance(value, dict):
+        return {name: encode_type(type_) for name, type_ in value.items()}
+    return value
+
+def pack_string(value: str | None) -> bytes:
+    if value is None:
+        return LENGTH.pack(NO_STRING)
+    data = value.encode("utf-8", "surrogatepass")
+    return LENGTH.pack(len(data)) + data
+
+class BinaryReader:
+    "Reads the records of a binary dump from a file, in blocks"
+    def __init__(self, file: BinaryIO, magic: bytes):
+        self.file = file
+        self.data = b""
+        self.offset = 0
+        found, version = BINARY_HEADER.unpack(self.read(BINARY_HEADER.size))
+        if found != magic:
+            raise ValueError("Not a binary " + ("token" if magic == TOKEN_MAGIC else "tree") + " dump")
+        if version != BINARY_VERSION:
+            raise ValueError(f"Unsupported binary dump version: {version}")
+    def read(self, size: int) -> bytes:
+        if self.offset + size > len(self.data):
+            self.data = self.data[self.offset:] + self.file.read(max(size, BUFFER_SIZE))
+            self.offset = 0
+            if size > len(self.data):
+                raise ValueError("Truncated binary dump")
+        piece = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return piece
+    def at_end(self) -> bool:
+        if self.offset == len(self.data):
+            self.data = self.file.read(BUFFER_SIZE)
+            self.offset = 0
+        return not self.data
+    def read_string(self) -> str | None:
+        length = LENGTH.unpack(self.read(LENGTH.size))[0]
+        if length == NO_STRING:
+            return None
+        return str(self.read(length), "utf-8", "surrogatepass")
+
+def read_tokens(file: BinaryIO, lines: LineIndex) -> Iterator[Token]:
+    "Yields the tokens of a binary dump written by write_tokens, with positions in lines"
+    reader = BinaryReader(file, TOKEN_MAGIC)
+    while not reader.at_end():
+        token_type, start, end = TOKEN_RECORD.unpack(reader.read(TOKEN_RECORD.size))
+        yield Token(TOKEN_TYPES[token_type - 1], reader.read_string(), start, end, lines)
+
+def read_tree(file: BinaryIO, lines: LineIndex) -> n.Node:
+    "Reads a binary dump written by write_tree, with positions in lines"
+    reader = BinaryReader(file, TREE_MAGIC)
+    # Each entry is a node whose children are still being read, with the number it has left and those read so far
+    pending: list[tuple[n.Node, int, list]] = []
+    while True:
+        kind = reader.read(1)[0]
+        if kind == MISSING:
+            node = None
+        else:
+            _, start, end, slots = NODE_RECORD.unpack(bytes((kind,)) + reader.read(NODE_RECORD.size - 1))
+            cls = KINDS[kind]
+            node = cls.__new__(cls)
+            node.start = start
+            node.end = end
+            node.lines = lines
+            for field in LAYOUTS[cls][2:]:
+                if field is not None:
+                    decode_field(node, field, NUMBER.unpack(reader.read(NUMBER.size))[0] if field[1] in INT_CODECS else reader.read_string())
+            if slots:
+                pending.append((node, slots, []))
+                continue
+            if LAYOUTS[cls][1]:
+                setattr(node, LAYOUTS[cls][1], [])
+        # The node is complete: give it to its parent, and complete every parent that it was the last child of
+        while pending:
+            parent, slots, children = pending[-1]
+            children.append(node)
+            if len(children) < slots:
+                break
+            pending.pop()
+            child_fields, list_field, _, _ = LAYOUTS[type(parent)]
+            for field, child in zip(child_fields, children):
+                setattr(parent, field, child)
+            if list_field:
+                setattr(parent, list_field, children[len(child_fields):])
+            node = parent
+        if not pending:
+            return node